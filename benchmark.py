@@ -0,0 +1,614 @@
+"""Performance benchmarks for the ToDo app.
+
+Run with ``python benchmark.py [startup] [queue] ...``. Each benchmark prints its timings
+and exits non-zero when a measured value is over its target, so it can be
+used to catch regressions.
+
+``--save-baseline FILE`` stores the median of every measurement, and a
+later run with ``--compare FILE`` also fails when a median grew by more
+than ``--tolerance`` (25% by default) over the stored one.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import date, datetime, timedelta
+
+from todo_core import TodoCore
+from todo_queue import TaskQueue
+from todo_schedule import PRIORITY, SCHEDULES, due_ordinal
+from todo_snapshot import write_snapshot
+from todo_stats import DailyCounts, EventLog, timestamp, timestamp_day
+from todo_storage import atomic_write_json, open_storage
+from todo_sync import SyncServer
+from todo_task import Task
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Median of every measurement of this run, by name, for --save-baseline/--compare
+RESULTS = {}
+
+# Differences below this (ms or MB) are noise, whatever the tolerance says
+NOISE_FLOOR = 0.1
+
+# Task counts for the app benchmark (--sizes), and GUI actions timed per size
+APP_SIZES = '1000,10000,100000'
+APP_OPS = 20
+
+# Weekly/monthly rollup over --events done/skip events (about 7 ms for a
+# million events)
+ROLLUP_TARGET_MS = 50
+
+# As-you-type search of --tasks tasks, per keystroke of a growing query
+SEARCH_TARGET_MS = 50
+
+# Cold start of ``import todo`` in a fresh interpreter. Measured at ~40 ms
+# with the plotting imports deferred (previously ~700 ms with matplotlib).
+STARTUP_TARGET_MS = 150
+
+STARTUP_SCRIPT = """
+import sys, time
+t = time.perf_counter()
+import todo
+elapsed = time.perf_counter() - t
+heavy = [m for m in ('matplotlib', 'numpy') if m in sys.modules]
+print(elapsed * 1000, ','.join(heavy))
+"""
+
+# Sync server with --clients connected clients: median time for a client's
+# action to be acknowledged, and for every other client to have merged it
+# (the app merges once a second)
+SYNC_ACK_TARGET_MS = 50
+SYNC_MERGE_TARGET_MS = 1000
+SYNC_TASKS = 1000
+
+# Cold ``todo_cli.py list`` of CLI_TASKS tasks in a fresh interpreter
+# (~40 ms); the CLI must not import numpy, tkinter or matplotlib
+CLI_TARGET_MS = 100
+CLI_TASKS = 1000
+
+CLI_SCRIPT = """
+import io, sys, time
+t = time.perf_counter()
+import todo_cli
+todo_cli.main(['--data', sys.argv[1], 'list'], out=io.StringIO())
+elapsed = time.perf_counter() - t
+heavy = [m for m in ('matplotlib', 'numpy', 'tkinter') if m in sys.modules]
+print(elapsed * 1000, ','.join(heavy))
+"""
+
+
+def run_python(script, *args):
+    """Run script in a fresh interpreter and return its stdout"""
+    result = subprocess.run([sys.executable, '-c', script, *args], cwd=BASE_DIR,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def report(name, samples, target=None):
+    """Print min/median/max (and p95/p99 for 20+ samples) in ms, record the median and check the target"""
+    median = statistics.median(samples)
+    RESULTS[name] = median
+    line = f"{name}: min {min(samples):.3f} ms, median {median:.3f} ms"
+    if len(samples) >= 20:
+        percentiles = statistics.quantiles(samples, n=100)
+        line += f", p95 {percentiles[94]:.3f} ms, p99 {percentiles[98]:.3f} ms"
+    line += f", max {max(samples):.3f} ms"
+    if target is not None:
+        line += f" (target {target} ms)"
+    print(line)
+    return target is None or median <= target
+
+
+def bench_startup(args):
+    """Cold import time of the GUI module, without drawing any chart"""
+    samples = []
+    for _ in range(args.repeat):
+        elapsed, heavy = (run_python(STARTUP_SCRIPT).split(' ') + [''])[:2]
+        if heavy:
+            print(f"startup imported {heavy} eagerly")
+            return False
+        samples.append(float(elapsed))
+    return report('import todo', samples, STARTUP_TARGET_MS)
+
+
+def bench_cli(args):
+    """Cold command-line call: load the data file and list the queue"""
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, 'todo_data.json')
+        with open(data_file, 'w') as f:
+            json.dump({'tasks': make_tasks(CLI_TASKS)}, f)
+        samples = []
+        for _ in range(args.repeat):
+            elapsed, heavy = (run_python(CLI_SCRIPT, data_file).split(' ') + [''])[:2]
+            if heavy:
+                print(f"todo_cli imported {heavy}")
+                return False
+            samples.append(float(elapsed))
+    return report(f"todo_cli list ({CLI_TASKS} tasks)", samples, CLI_TARGET_MS)
+
+
+def make_history(tasks, days, per_day=10):
+    """Random done/skip events over the last days days, counted into tasks
+
+    Returns statistics in the data file layout (daily counts, totals and
+    the event log), so the GUI has years of history to summarize.
+    """
+    rng = random.Random(0)
+    task_ids = [task['task_id'] for task in tasks]
+    today = timestamp(datetime.now()) // 86400
+    columns = {'task_ids': task_ids, 'time': [], 'task': [], 'outcome': []}
+    daily = {}
+    totals = [0, 0]
+    for day in range(today - days, today):
+        for seconds in sorted(rng.randrange(86400) for _ in range(rng.randrange(2 * per_day))):
+            code = rng.randrange(len(tasks))
+            outcome = 0 if rng.random() < 0.7 else 1  # Index into OUTCOMES: done, skip
+            columns['time'].append(day * 86400 + seconds)
+            columns['task'].append(code)
+            columns['outcome'].append(outcome)
+            totals[outcome] += 1
+            tasks[code]['completed_count' if outcome == 0 else 'skipped_count'] += 1
+            if outcome == 0:
+                key = timestamp_day(day * 86400)
+                daily[key] = daily.get(key, 0) + 1
+    return {'daily': daily, 'weekly': {}, 'monthly': {}, 'total_done': totals[0],
+            'total_skipped': totals[1], 'events': columns}
+
+
+def load_tk():
+    """(tkinter module, whether it is the headless stub)
+
+    The real tkinter when a display can be opened (for example under
+    xvfb-run), otherwise the stubs of benchmark_tk. Must run before todo is
+    imported.
+    """
+    import tkinter
+    if getattr(tkinter, 'headless', False):
+        return tkinter, True
+    try:
+        tkinter.Tk().destroy()
+        return tkinter, False
+    except tkinter.TclError:
+        import benchmark_tk
+        tkinter = benchmark_tk.install()
+        tkinter.headless = True
+        return tkinter, True
+
+
+def new_root(tkinter):
+    """A hidden Tk root and the function running its pending events"""
+    root = tkinter.Tk()
+    root.withdraw()
+    return root, getattr(root, 'run_idle', root.update)
+
+
+def time_action(action, pump, count, setup=None):
+    """Latency samples in ms of action() plus the redraw it schedules, after an untimed setup()"""
+    samples = []
+    for i in range(count):
+        if setup is not None:
+            setup()
+            pump()
+        t = time.perf_counter()
+        action()
+        pump()
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+def bench_app(args):
+    """TodoApp actions and redraws at --sizes tasks with --days of history, headless"""
+    tkinter, headless = load_tk()
+    import todo
+    todo.load_plotting()  # Import matplotlib outside the timings
+    print(f"app: {'stub tkinter, Agg charts' if headless else 'Tk ' + str(tkinter.TkVersion)}")
+    ops = APP_OPS * args.repeat
+    for size in (int(size) for size in args.sizes.split(',')):
+        tasks = make_tasks(size)
+        data = {'tasks': tasks, 'statistics': make_history(tasks, args.days)}
+        label = f"{size} tasks"
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, 'todo_data.json')
+            atomic_write_json(data_file, data, separators=(',', ':'))
+
+            report(f"app load_data ({label})",
+                   time_ops(lambda i: TodoCore(data_file).load_data(), args.repeat))
+
+            root, pump = new_root(tkinter)
+            tracemalloc.start()
+            t = time.perf_counter()
+            core = TodoCore(data_file)
+            core.load_data()
+            app = todo.TodoApp(root, core)
+            pump()
+            elapsed = (time.perf_counter() - t) * 1000
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            RESULTS[f"app memory MB ({label})"] = current / 1e6
+            print(f"app load + first draw ({label}): {elapsed:.3f} ms (traced), "
+                  f"memory {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB")
+
+            actions = (
+                ('mark_current_done', app.mark_current_done, None),
+                ('mark_current_skip', app.mark_current_skip, None),
+                ('undo', app.undo, None),
+                ('redo', app.redo, None),
+                ('update_displays', app.update_displays, None),
+                ('filter keystroke', lambda: app.filter_var.set(f"task {rng.randrange(size)}"), None),
+                ('clear filter', app.clear_filter, lambda: app.filter_var.set("task 1")),
+                ('save_data', core.save_data, app.mark_current_done),
+            )
+            rng = random.Random(0)
+            for name, action, setup in actions:
+                report(f"app {name} ({label})", time_action(action, pump, ops, setup))
+
+            t = time.perf_counter()
+            app.on_closing()
+            report(f"app on_closing ({label})", [(time.perf_counter() - t) * 1000])
+    return True
+
+
+def make_tasks(count):
+    """Synthetic task dicts in the data file layout"""
+    return [{
+        'task_id': f"Task{i + 1}",
+        'description': f"Synthetic task {i + 1}",
+        'created': '2024-01-01T00:00:00',
+        'completed_count': 0,
+        'skipped_count': 0
+    } for i in range(count)]
+
+
+def bench_load(args):
+    """load_data of --tasks tasks: JSON vs binary snapshot, then the first rows and all tasks"""
+    data = {'tasks': make_tasks(args.tasks), 'statistics': {'events': make_events(args.tasks)}}
+    medians = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, write in (('json', atomic_write_json), ('todo', write_snapshot)):
+            data_file = os.path.join(directory, f"todo_data.{name}")
+            write(data_file, data)
+            loads, first_rows, all_tasks = [], [], []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                core = TodoCore(data_file)
+                core.load_data()
+                loads.append((time.perf_counter() - t) * 1000)
+                list(core.tasks.iter_from(0, 40))
+                first_rows.append((time.perf_counter() - t) * 1000)
+                for _ in core.tasks:
+                    pass
+                all_tasks.append((time.perf_counter() - t) * 1000)
+            size = os.path.getsize(data_file) / 1e6
+            medians[name] = statistics.median(first_rows)
+            report(f"{name} load_data ({args.tasks} tasks, {size:.1f} MB)", loads)
+            report(f"{name} load + first 40 rows", first_rows)
+            report(f"{name} load + every task", all_tasks)
+    # Showing the first rows of a binary snapshot must beat parsing the JSON
+    return medians['todo'] <= medians['json']
+
+
+def bench_search(args):
+    """Search index build, as-you-type queries and re-indexing edits over --tasks tasks"""
+    rng = random.Random(0)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randrange(3, 10)))
+                  for _ in range(20000)]
+    tasks = make_tasks(args.tasks)
+    for task in tasks:
+        task['description'] = ' '.join(rng.choice(vocabulary) for _ in range(5))
+    with tempfile.TemporaryDirectory() as directory:
+        core = TodoCore(os.path.join(directory, 'todo_data.json'))
+        core.import_tasks(tasks)
+        t = time.perf_counter()
+        core.search_index
+        report(f"search index build ({args.tasks} tasks)", [(time.perf_counter() - t) * 1000])
+        ok = True
+        word = vocabulary[0]
+        # Each keystroke of a word, then a second word
+        for query in [word[:i] for i in range(1, len(word) + 1)] + [f"{word} {vocabulary[1][:2]}"]:
+            samples = time_ops(lambda i: core.search(query), args.repeat)
+            ok = report(f"search {query!r} ({len(core.search(query))} matches)", samples,
+                        SEARCH_TARGET_MS) and ok
+        report("edit + re-index", time_ops(lambda i: core.edit_task(i, f"{word} edited {i}"), 200 * args.repeat))
+    return ok
+
+
+def time_ops(op, count):
+    """Per-operation latency samples in ms for count calls of op(i)"""
+    samples = []
+    for i in range(count):
+        t = time.perf_counter()
+        op(i)
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+def bench_queue(args):
+    """Rotation and selected-task moves: plain list vs TaskQueue"""
+    size = args.tasks
+    ops = 2000 * args.repeat
+    rng = random.Random(0)
+    picks = [rng.randrange(size) for _ in range(ops)]
+    medians = {}
+    tasks = [Task.from_dict(task) for task in make_tasks(size)]
+    for name, container in (('list', list(tasks)), ('TaskQueue', TaskQueue(tasks))):
+        rotate = time_ops(lambda i: container.append(container.pop(0)), ops)
+        selected = time_ops(lambda i: container.append(container.pop(picks[i])), ops)
+        report(f"{name} rotate current ({size} tasks)", rotate)
+        report(f"{name} move selected ({size} tasks)", selected)
+        medians[name] = statistics.median(rotate)
+    # The queue must not lose to the list it replaced
+    return medians['TaskQueue'] <= medians['list']
+
+
+def bench_schedule(args):
+    """Choosing the current task by priority: heap vs a scan, and done/skip per schedule"""
+    rng = random.Random(0)
+    tasks = make_tasks(args.tasks)
+    for task in tasks:
+        if rng.random() < 0.3:
+            task['priority'] = rng.randrange(1, 4)
+        if rng.random() < 0.3:
+            task['due'] = date.fromordinal(date.today().toordinal() + rng.randrange(60)).isoformat()
+    ops = 200 * args.repeat
+    medians = {}
+    with tempfile.TemporaryDirectory() as directory:
+        core = TodoCore(os.path.join(directory, 'todo_data.json'), schedule=PRIORITY)
+        core.import_tasks(tasks)
+        t = time.perf_counter()
+        core.current_task
+        report(f"priority heap build ({args.tasks} tasks)", [(time.perf_counter() - t) * 1000])
+        scan = time_ops(lambda i: min(core.tasks, key=lambda task: (
+            -task.get('priority', 0), due_ordinal(task))), args.repeat)
+        report(f"scan for next task ({args.tasks} tasks)", scan)
+        for schedule in SCHEDULES:
+            core.set_schedule(schedule)
+            done = time_ops(lambda i: core.mark_done(), ops)
+            report(f"{schedule} mark_skip + next task ({args.tasks} tasks)",
+                   time_ops(lambda i: core.mark_skip() and core.current_task, ops))
+            report(f"{schedule} mark_done ({args.tasks} tasks)", done)
+            medians[schedule] = statistics.median(done)
+    # Done on the heap's choice must stay far below one scan of the tasks
+    return medians[PRIORITY] * 10 < statistics.median(scan)
+
+
+def make_daily(days):
+    """Synthetic {'YYYY-MM-DD': count} map covering the last days days"""
+    rng = random.Random(0)
+    today = date.today().toordinal()
+    return {date.fromordinal(today - i).isoformat(): rng.randrange(1, 10) for i in range(days)}
+
+
+def dict_statistics(daily):
+    """The statistics work of one redraw done on the string-keyed dict"""
+    now = datetime.now()
+    recent = [(now - timedelta(days=i)) for i in range(30)]
+    counts = [daily.get(day.strftime('%Y-%m-%d'), 0) for day in recent]
+    average = sum(counts) / max(sum(1 for count in counts if count), 1)
+    for day in recent[:7]:
+        daily.get(day.strftime('%Y-%m-%d'), 0)
+    return average
+
+
+def store_statistics(store):
+    """The same work on DailyCounts"""
+    total, active = store.window(30)
+    store.recent(7).tolist()
+    return total / max(active, 1)
+
+
+def bench_stats(args):
+    """Daily averages and recent days: string-keyed dict vs DailyCounts"""
+    daily = make_daily(args.days)
+    DailyCounts()  # Import numpy outside the timing
+    t = time.perf_counter()
+    store = DailyCounts(daily)
+    report(f"DailyCounts load ({args.days} days)", [(time.perf_counter() - t) * 1000])
+    ops = 2000 * args.repeat
+    today = date.today().toordinal()
+    medians = {}
+    for name, op in (('dict', lambda i: dict_statistics(daily)),
+                     ('DailyCounts', lambda i: store_statistics(store))):
+        samples = time_ops(op, ops)
+        report(f"{name} average + recent days", samples)
+        medians[name] = statistics.median(samples)
+    report("DailyCounts add", time_ops(lambda i: store.add(today - i % 400, 1), ops))
+    return medians['DailyCounts'] <= medians['dict']
+
+
+def make_events(count, tasks=500, days=3650):
+    """Synthetic EventLog columns spread over the last days days"""
+    rng = random.Random(0)
+    start = int(time.time()) - days * 86400
+    return {
+        'task_ids': [f"Task{i + 1}" for i in range(tasks)],
+        'time': sorted(start + rng.randrange(days * 86400) for _ in range(count)),
+        'task': [rng.randrange(tasks) for _ in range(count)],
+        'outcome': [rng.randrange(2) for _ in range(count)]
+    }
+
+
+def traced_bytes(build):
+    """Bytes still allocated by what build() returns, per tracemalloc"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return allocated
+
+
+def bench_tasks(args):
+    """Memory per task and conversion cost: JSON-layout dicts vs Task records"""
+    start = datetime(2024, 1, 1, 9)
+    tasks = make_tasks(args.tasks)
+    for i, task in enumerate(tasks):
+        task['created'] = (start + timedelta(seconds=i, microseconds=i % 1000)).isoformat()
+    text = json.dumps(tasks)
+    # Parse inside the trace, so every task has its own strings like after a load
+    per_dict = traced_bytes(lambda: json.loads(text)) / args.tasks
+    per_task = traced_bytes(lambda: [Task.from_dict(task) for task in json.loads(text)]) / args.tasks
+    records = [Task.from_dict(task) for task in tasks]
+    # Snapshots for the background writer copy every task
+    per_dict_copy = traced_bytes(lambda: [dict(task) for task in tasks]) / args.tasks
+    per_copy = traced_bytes(lambda: [task.copy() for task in records]) / args.tasks
+    for name, value in (('dict', per_dict), ('Task', per_task), ('dict copy', per_dict_copy),
+                        ('Task copy', per_copy)):
+        RESULTS[f"{name} bytes per task"] = value
+        print(f"{name}: {value:.0f} bytes per task")
+    report(f"Task.from_dict ({args.tasks} tasks)",
+           time_ops(lambda i: [Task.from_dict(task) for task in tasks], args.repeat))
+    report(f"Task.to_dict ({args.tasks} tasks)",
+           time_ops(lambda i: [task.to_dict() for task in records], args.repeat))
+    lossless = [task.to_dict() for task in records] == tasks
+    if not lossless:
+        print("Task records do not convert back to the same dicts")
+    # Both include the description and ID strings, which take the same either way
+    return lossless and per_task < per_dict * 0.8
+
+
+def bench_sync(args):
+    """--clients clients of one sync server on localhost: connect, act, and merge each other's actions"""
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, 'todo_data.json')
+        atomic_write_json(data_file, {'tasks': make_tasks(SYNC_TASKS)})
+        core = TodoCore(data_file, storage=open_storage(data_file, sync_every=float('inf')))
+        core.load_data()
+        server = SyncServer(core)
+        url = server.start_thread()
+        clients = []
+        connects = []
+        for _ in range(args.clients):
+            t = time.perf_counter()
+            client = TodoCore(url)
+            client.load_data()
+            connects.append((time.perf_counter() - t) * 1000)
+            clients.append(client)
+        report(f"sync connect + snapshot ({SYNC_TASKS} tasks)", connects)
+
+        rng = random.Random(0)
+        acks, merges = [], []
+        for i in range(args.repeat * 4):
+            client = rng.choice(clients)
+            t = time.perf_counter()
+            client.mark_done(rng.randrange(SYNC_TASKS))  # Sent and acknowledged
+            acks.append((time.perf_counter() - t) * 1000)
+            for other in clients:
+                if other is not client:
+                    while not other.refresh():
+                        pass
+            merges.append((time.perf_counter() - t) * 1000)
+        ok = report(f"sync action acknowledged ({args.clients} clients)", acks, SYNC_ACK_TARGET_MS)
+        ok = report(f"sync action merged by every client ({args.clients} clients)", merges,
+                    SYNC_MERGE_TARGET_MS) and ok
+
+        # Every client acting at once, one batch each
+        t = time.perf_counter()
+        for client in clients:
+            client.storage.sync_every = float('inf')
+            client.mark_skip(rng.randrange(SYNC_TASKS))
+        for client in clients:
+            client.save_data()
+        for client in clients:
+            client.storage.wait()  # Everything pushed so far has arrived
+            client.refresh()
+        elapsed = time.perf_counter() - t
+        RESULTS[f"sync burst ({args.clients} clients)"] = elapsed * 1000
+        print(f"sync burst: {args.clients} actions sent, applied and merged by all in {elapsed * 1000:.1f} ms")
+
+        skipped = core.statistics['total_skipped']
+        converged = all(client.statistics['total_skipped'] == skipped for client in clients)
+        if skipped != args.clients or not converged:
+            print(f"sync clients disagree: server has {skipped} skips")
+        for client in clients:
+            client.storage.close()
+        server.stop_thread()
+        core.storage.close()
+    return ok and skipped == args.clients and converged
+
+
+def bench_events(args):
+    """Event log rollups into day/week/month buckets and a per-task trend"""
+    log = EventLog(make_events(args.events))
+    ok = True
+    for period in ('day', 'week', 'month'):
+        samples = time_ops(lambda i: log.summary(period), args.repeat)
+        ok = report(f"{period} rollup ({args.events} events)", samples, ROLLUP_TARGET_MS) and ok
+    report("task trend", time_ops(lambda i: log.trend('Task1', 'week'), args.repeat))
+    report("append", time_ops(lambda i: log.append(int(time.time()), 'Task1', 'done'), 2000 * args.repeat))
+    return ok
+
+
+BENCHMARKS = {
+    'cli': bench_cli,
+    'app': bench_app,
+    'events': bench_events,
+    'load': bench_load,
+    'queue': bench_queue,
+    'schedule': bench_schedule,
+    'search': bench_search,
+    'startup': bench_startup,
+    'stats': bench_stats,
+    'sync': bench_sync,
+    'tasks': bench_tasks,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ToDo app benchmarks")
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    parser.add_argument('--repeat', type=int, default=5, help="samples per benchmark")
+    parser.add_argument('--tasks', type=int, default=100000, help="task count for data structure benchmarks")
+    parser.add_argument('--events', type=int, default=1000000, help="done/skip events for event log benchmarks")
+    parser.add_argument('--clients', type=int, default=200, help="connected clients for the sync benchmark")
+    parser.add_argument('--days', type=int, default=3650, help="days of history for statistics benchmarks")
+    parser.add_argument('--sizes', default=APP_SIZES,
+                        help="comma-separated task counts for the app benchmark (up to 1000000)")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store the median of every measurement in FILE")
+    parser.add_argument('--compare', metavar='FILE', help="fail when a median regressed against FILE")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed growth over the baseline")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(map(repr, unknown))} (choose from {', '.join(sorted(BENCHMARKS))})")
+
+    ok = True
+    for name in args.names or sorted(BENCHMARKS):
+        ok = BENCHMARKS[name](args) and ok
+    if args.compare:
+        ok = compare_baseline(args.compare, args.tolerance) and ok
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(RESULTS, f, indent=2, sort_keys=True)
+        print(f"Saved {len(RESULTS)} baseline values to {args.save_baseline}")
+    return 0 if ok else 1
+
+
+def compare_baseline(path, tolerance):
+    """Check the medians of this run against a saved baseline"""
+    with open(path) as f:
+        baseline = json.load(f)
+    ok = True
+    for name, value in sorted(RESULTS.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if value > base * (1 + tolerance) and value - base > NOISE_FLOOR:
+            print(f"REGRESSION {name}: {value:.3f} vs baseline {base:.3f} (+{(value / base - 1) * 100:.0f}%)")
+            ok = False
+    print(f"Compared {sum(name in baseline for name in RESULTS)} values with {path}: "
+          f"{'ok' if ok else 'regressions found'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(main())
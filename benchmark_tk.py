@@ -0,0 +1,145 @@
+"""Headless stand-in for tkinter, used by ``benchmark.py app``
+
+install() puts stub tkinter modules (and a TkAgg backend that renders with
+Agg only) in sys.modules, so TodoApp can be built and driven without a
+display. Widgets accept every call and do nothing, variables keep their
+value, and StubRoot queues after/after_idle callbacks until run_idle().
+The timings therefore cover the app's own work (core, formatting, the
+diffing of rows and lines, matplotlib rendering) but not Tk's drawing.
+"""
+import sys
+import types
+
+
+class StubWidget:
+    """Any tkinter widget: every method call is accepted and ignored"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        return None
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __getitem__(self, key):
+        return None
+
+
+class StubVar:
+    """StringVar/IntVar/... keeping the value and calling write traces"""
+
+    def __init__(self, master=None, value='', name=None):
+        self.value = value
+        self.traces = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in self.traces:
+            callback('', '', 'write')
+
+    def trace_add(self, mode, callback):
+        self.traces.append(callback)
+
+
+class StubRoot(StubWidget):
+    """Tk root whose event loop is run_idle()
+
+    after_idle and short after() callbacks run on the next run_idle();
+    timers of 100 ms and more (status polling) are kept but never run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.idle = []
+        self.timers = []
+
+    def after_idle(self, callback, *args):
+        self.idle.append((callback, args))
+        return f"after#{len(self.idle)}"
+
+    def after(self, ms, callback=None, *args):
+        if callback is not None:
+            (self.timers if ms >= 100 else self.idle).append((callback, args))
+        return f"after#{len(self.idle)}"
+
+    def after_cancel(self, after_id):
+        pass
+
+    def run_idle(self):
+        """Run queued callbacks, including those they queue, until none are left"""
+        while self.idle:
+            callback, args = self.idle.pop(0)
+            callback(*args)
+
+    def destroy(self):
+        self.idle = []
+        self.timers = []
+
+
+class StubModule(types.ModuleType):
+    """Module whose unknown capitalized names are widgets and other names constants"""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name[0].isupper() and not name.isupper():
+            return StubWidget
+        return name.lower()
+
+
+def headless_canvas():
+    """FigureCanvasTkAgg replacement drawing into an Agg buffer"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    class HeadlessCanvas(FigureCanvasAgg):
+        def __init__(self, figure=None, master=None):
+            super().__init__(figure)
+
+        def get_tk_widget(self):
+            return StubWidget()
+
+    return HeadlessCanvas
+
+
+def install():
+    """Replace tkinter (and the TkAgg backend) in sys.modules with the stubs"""
+    tk = StubModule('tkinter')
+    tk.Tk = StubRoot
+    tk.Toplevel = StubWidget
+    tk.StringVar = tk.IntVar = tk.DoubleVar = tk.BooleanVar = StubVar
+    tk.TclError = type('TclError', (Exception,), {})
+
+    ttk = StubModule('tkinter.ttk')
+    font = StubModule('tkinter.font')
+    dialogs = {}
+    for name in ('messagebox', 'simpledialog', 'filedialog'):
+        dialogs[name] = StubModule(f'tkinter.{name}')
+        setattr(tk, name, dialogs[name])
+    # Dialogs are answered with None (cancel) or yes
+    for module in dialogs.values():
+        for function in ('showinfo', 'showerror', 'showwarning', 'askstring', 'askinteger',
+                         'askopenfilename', 'asksaveasfilename'):
+            setattr(module, function, lambda *args, **kwargs: None)
+    dialogs['messagebox'].askyesno = lambda *args, **kwargs: True
+    tk.ttk = ttk
+    tk.font = font
+
+    sys.modules['tkinter'] = tk
+    sys.modules['tkinter.ttk'] = ttk
+    sys.modules['tkinter.font'] = font
+    for name, module in dialogs.items():
+        sys.modules[f'tkinter.{name}'] = module
+
+    import matplotlib
+    matplotlib.use('Agg')
+    backend = types.ModuleType('matplotlib.backends.backend_tkagg')
+    backend.FigureCanvasTkAgg = headless_canvas()
+    sys.modules['matplotlib.backends.backend_tkagg'] = backend
+    return tk
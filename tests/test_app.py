@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip('matplotlib')
+import benchmark_tk
+
+tk = benchmark_tk.install()  # Headless tkinter and an Agg canvas
+import todo
+from todo_core import TodoCore
+
+
+class Listbox:
+    """The parts of tk.Listbox the task list uses, keeping its rows and selection"""
+
+    def __init__(self):
+        self.rows = []
+        self.selected = set()
+        self.edits = 0
+
+    def insert(self, index, text):
+        self.edits += 1
+        self.rows.insert(len(self.rows) if index == tk.END else index, text)
+
+    def delete(self, first, last=None):
+        self.edits += 1
+        stop = first + 1 if last is None else len(self.rows) if last == tk.END else last + 1
+        del self.rows[first:stop]
+
+    def selection_clear(self, first, last=None):
+        self.selected.clear()
+
+    def selection_set(self, first, last=None):
+        stop = first + 1 if last is None else len(self.rows) if last == tk.END else last + 1
+        self.selected.update(range(first, stop))
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+@pytest.fixture
+def app(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    for i in range(100):
+        core.add_task(f'Task {i}')
+    root = tk.Tk()
+    app = todo.TodoApp(root, core)
+    root.run_idle()
+    app.task_listbox = Listbox()
+    app.row_texts = []
+    app.render_task_rows()
+    yield app
+    app.on_closing()
+
+
+def shown(app):
+    """Rows the task list should show"""
+    return [app.format_task_row(task) for task in app.tasks.iter_from(app.view_top, app.visible_rows)]
+
+
+def test_task_list_holds_only_the_visible_rows(app):
+    listbox = app.task_listbox
+    assert len(listbox.rows) == app.visible_rows < len(app.tasks)
+    assert listbox.rows == shown(app)
+    app.selected_task_ids = {app.tasks[2]['task_id']}
+    listbox.edits = 0
+
+    app.mark_current_done()
+    app.root.run_idle()
+    # The done task left the window at the top, the next one came in at the bottom
+    assert listbox.edits == 2
+    assert listbox.rows == shown(app)
+    # The selection followed the task, not the row
+    assert listbox.curselection() == (1,)
+
+    app.scroll_task_list('scroll', 1, 'pages')
+    assert app.view_top == app.visible_rows
+    assert listbox.rows == shown(app)
+    assert not listbox.selected
+
+
+def test_burst_of_actions_is_drawn_once(app):
+    renderer = app.renderer
+    requested, performed, drawn = renderer.requested, renderer.performed, dict(renderer.drawn)
+    for _ in range(20):
+        app.mark_current_skip()
+    assert renderer.performed == performed
+    app.root.run_idle()
+    assert renderer.requested == requested + 20
+    assert renderer.performed == performed + 1
+    # A skip leaves the daily done chart alone
+    assert renderer.drawn == dict(drawn, **{name: drawn[name] + 1 for name in (todo.QUEUE, todo.STATS, todo.TASK_CHART)})
+    app.root.run_idle()
+    assert renderer.performed == performed + 1
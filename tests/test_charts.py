@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+pytest.importorskip('matplotlib')
+import benchmark_tk
+
+benchmark_tk.install()  # Headless tkinter and an Agg canvas
+import numpy as np
+import todo_charts
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def blitted_and_full(chart):
+    """The canvas pixels after a blit, and after a full draw of the same state"""
+    blitted = np.asarray(chart.canvas.buffer_rgba()).copy()
+    chart.canvas.draw()
+    return blitted, np.asarray(chart.canvas.buffer_rgba())
+
+
+def count_calls(monkeypatch, chart, name):
+    calls = []
+    method = getattr(chart, name)
+    monkeypatch.setattr(chart, name, lambda *args: (calls.append(args), method(*args)))
+    return calls
+
+
+def test_headroom_limit_steps():
+    assert [todo_charts.headroom_limit(count) for count in (0, 1, 3, 6, 13, 33, 66)] == \
+        [2, 5, 10, 20, 50, 100, 200]
+    assert todo_charts.headroom_limit(25, 50) == 50
+    assert todo_charts.headroom_limit(5, 50) == 10
+
+
+def test_daily_chart_blit_matches_full_draw(monkeypatch):
+    chart = todo_charts.DailyChart(None)
+    counts = [6, 8, 5, 9, 7, 4, 0]
+    chart.update(DAYS, list(counts))
+    builds = count_calls(monkeypatch, chart, 'build')
+    rng = random.Random(8)
+    for step in range(40):
+        day = rng.randrange(7) if step % 3 == 0 else 6
+        counts[day] = max(0, counts[day] + rng.choice((1, 1, 1, -1)))
+        chart.update(DAYS, list(counts))
+        blitted, full = blitted_and_full(chart)
+        assert (blitted == full).all(), step
+    assert not builds
+
+
+def test_task_chart_blit_matches_full_draw(monkeypatch):
+    chart = todo_charts.TaskChart(None)
+    task_ids = [f'Task{i}' for i in range(12)]
+    rng = random.Random(8)
+    done = [rng.randrange(10) for _ in task_ids]
+    skipped = [rng.randrange(5) for _ in task_ids]
+    chart.update(task_ids, done, skipped)
+    builds = count_calls(monkeypatch, chart, 'build')
+    rescales = count_calls(monkeypatch, chart, 'rescale')
+    for step in range(40):
+        (done if rng.random() < 0.6 else skipped)[rng.randrange(12)] += 1
+        chart.update(task_ids, list(done), list(skipped))
+        blitted, full = blitted_and_full(chart)
+        assert (blitted == full).all(), step
+    assert not builds
+    assert len(rescales) <= 1
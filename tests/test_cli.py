@@ -0,0 +1,63 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import todo_cli
+from todo_core import TodoCore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch):
+    """Run a todo_cli command line (with text for stdin) on one data file, return (exit code, output)"""
+    path = str(tmp_path / 'data.json')
+
+    def run(*argv, stdin=''):
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(stdin))
+        out = io.StringIO()
+        code = todo_cli.main(['--data', path, *argv], out)
+        return code, out.getvalue()
+    run.path = path
+    return run
+
+
+def test_commands_share_the_data_file_with_the_app(cli):
+    assert cli('add', 'Water', 'the', 'plants') == (0, "Added A: Water the plants (✓0, ✗0)\n")
+    assert cli('add', '-', stdin='Read\n\nCook\n')[0] == 0
+    assert cli('done')[1] == "Done: A: Water the plants (✓1, ✗0)\n"
+    assert cli('skip', '-', stdin='B\nC\n')[1] == "Skip: 2 tasks\n"
+    assert cli('-', stdin='done C\nundo\nplan B --priority 2\n')[0] == 0
+    assert cli('list')[1].splitlines() == ["A: Water the plants (✓1, ✗0)", "B: Read (✓0, ✗1) [priority 2]",
+                                           "C: Cook (✓0, ✗1)"]
+    assert cli('done', 'Z') == (1, "")
+
+    core = TodoCore(cli.path)
+    core.load_data()
+    assert [(task['task_id'], task['completed_count'], task['skipped_count']) for task in core.tasks] == \
+        [('A', 1, 0), ('B', 0, 1), ('C', 0, 1)]
+    assert core.statistics['total_done'] == 1
+    # The CLI's actions stay undoable in the next session
+    assert core.undo() and core.get_task('B').get('priority') is None
+    core.storage.close()
+
+
+def test_never_imports_the_gui_libraries(cli):
+    cli('add', 'Task')
+    script = (f"import sys, todo_cli\n"
+              f"todo_cli.main(['--data', {cli.path!r}, 'done'])\n"
+              f"todo_cli.main(['--data', {cli.path!r}, 'list'])\n"
+              f"print(sorted({{'tkinter', 'matplotlib'}} & set(sys.modules)))\n")
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == '[]'
+
+
+@pytest.mark.parametrize('line', ['--data other.json add Task', '--schedule priority done'])
+def test_script_lines_cannot_pick_their_own_data_file(cli, line):
+    with pytest.raises(SystemExit):
+        cli('-', stdin=f'add First\n{line}\n')
+    # Nothing ran
+    assert cli('list') == (0, "")
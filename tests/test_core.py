@@ -0,0 +1,241 @@
+import json
+import random
+
+import pytest
+
+from todo_core import TodoCore
+from todo_storage import BackgroundWriter, open_storage
+from todo_task import json_default
+
+FORMATS = ('.json', '.todo', '.db')
+
+
+def state(core):
+    """Queue order, counts and edits, plus the statistics"""
+    statistics = core.statistics
+    return ([(task['task_id'], task['description'], task['completed_count'], task['skipped_count'],
+              task.get('priority', 0)) for task in core.tasks],
+            statistics['total_done'], statistics['total_skipped'], dict(statistics['daily']))
+
+
+def fresh(path):
+    core = TodoCore(path)
+    core.load_data()
+    result = state(core)
+    core.storage.close()
+    return result
+
+
+@pytest.fixture(params=[False, True], ids=['direct', 'background'])
+def instances(request, tmp_path):
+    """Factory of cores on one data file, each with its own storage"""
+    opened = []
+
+    def make(extension):
+        path = str(tmp_path / f'data{extension}')
+        storage = open_storage(path)
+        if request.param:
+            storage = BackgroundWriter(storage, poll_every=None)
+        core = TodoCore(path, storage=storage)
+        core.load_data()
+        opened.append(core)
+        return core
+
+    yield make
+    for core in opened:
+        core.storage.close()
+
+
+def merge(*cores):
+    """Write what each core did and merge it into the others"""
+    for core in cores:
+        core.storage.wait()
+        core.save_data()
+    for core in cores:
+        core.storage.wait()
+        core.refresh()
+
+
+def pair(instances, extension, count=4):
+    first = instances(extension)
+    for i in range(count):
+        first.add_task(f'Task {i}')
+    second = instances(extension)
+    merge(first, second)
+    return first, second
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_queue_order_follows_the_journal(instances, extension):
+    first, second = pair(instances, extension)
+    first.mark_done(0)
+    first.save_data()
+    # Before merging the first instance's done
+    second.mark_done(1)
+    merge(first, second)
+    assert state(first) == state(second) == fresh(first.data_file)
+    assert [task['task_id'] for task in first.tasks] == ['C', 'D', 'A', 'B']
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_done_on_a_task_deleted_elsewhere_still_counts(instances, extension):
+    first, second = pair(instances, extension)
+    first.delete_task(first.index_of('B'))
+    first.save_data()
+    second.mark_done(second.index_of('B'))
+    merge(first, second)
+    assert state(first) == state(second) == fresh(first.data_file)
+    assert 'B' not in first.tasks
+    assert first.statistics['total_done'] == 1
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_later_edit_wins_everywhere(instances, extension):
+    first, second = pair(instances, extension)
+    first.edit_task(first.index_of('C'), 'From the first')
+    first.save_data()
+    second.edit_task(second.index_of('C'), 'From the second')
+    merge(first, second)
+    assert first.get_task('C')['description'] == second.get_task('C')['description'] == 'From the second'
+    assert state(first) == fresh(first.data_file)
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_same_new_id_is_given_once(instances, extension):
+    first, second = pair(instances, extension)
+    added = first.add_task('From the first')
+    first.save_data()
+    second.add_task('From the second')
+    merge(first, second)
+    assert state(first) == state(second) == fresh(first.data_file)
+    assert len({task['task_id'] for task in first.tasks}) == len(first.tasks) == 6
+    assert first.get_task(added['task_id'])['description'] == 'From the first'
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_undo_after_merging_others(instances, extension):
+    first, second = pair(instances, extension)
+    second.mark_skip(0)
+    second.undo()
+    first.mark_done(2)
+    merge(second, first)
+    second.mark_done(0)
+    second.undo()
+    merge(first, second)
+    assert state(first) == state(second) == fresh(first.data_file)
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+@pytest.mark.parametrize('seed', range(3))
+def test_interleaved_actions_end_up_alike(instances, extension, seed):
+    cores = pair(instances, extension, count=6)
+    rng = random.Random(seed)
+    for step in range(150):
+        core = rng.choice(cores)
+        count = len(core.tasks)
+        action = rng.choice(('done', 'skip', 'add', 'edit', 'delete', 'move', 'plan', 'undo', 'merge'))
+        if action == 'done' and count:
+            core.mark_done(rng.randrange(count))
+        elif action == 'skip' and count:
+            core.mark_skip(rng.randrange(count))
+        elif action == 'add':
+            core.add_task(f'Added {step}')
+        elif action == 'edit' and count:
+            core.edit_task(rng.randrange(count), f'Edited {step}')
+        elif action == 'delete' and count > 3:
+            core.delete_task(rng.randrange(count))
+        elif action == 'move' and count > 1:
+            core.move_task(rng.randrange(count), rng.randrange(count))
+        elif action == 'plan' and count:
+            core.plan_tasks([core.tasks[rng.randrange(count)]['task_id']], rng.randrange(3), None)
+        elif action == 'undo':
+            core.undo()
+        elif action == 'merge':
+            merge(core)
+        core.save_data()
+        if step % 50 == 49:
+            core.compact()
+    merge(*cores)
+    merge(*cores)
+    assert state(cores[0]) == state(cores[1]) == fresh(cores[0].data_file)
+
+
+@pytest.mark.parametrize('extension', ('.json', '.todo'))
+def test_undo_of_a_done_on_a_deleted_task(instances, extension):
+    first, second = pair(instances, extension)
+    first.delete_task(first.index_of('B'))
+    first.save_data()
+    second.mark_done(second.index_of('B'))
+    merge(first, second)
+    reopened = instances(extension)
+    assert reopened.statistics['total_done'] == 1
+    # The done is the last action in the journal, so the reopened instance can undo it
+    assert reopened.undo()
+    merge(reopened, first, second)
+    assert state(first) == state(second) == state(reopened) == fresh(first.data_file)
+    assert first.statistics['total_done'] == 0
+
+
+@pytest.mark.parametrize('extension', ('.json', '.todo'))
+def test_frozen_snapshot_is_the_data_as_it_was_taken(instances, extension):
+    core, _ = pair(instances, extension)
+    core.mark_done(0)
+    expected = json.dumps(core.snapshot(), default=json_default)
+    frozen = core.frozen_snapshot()
+    core.edit_task(core.index_of('C'), 'Edited')
+    core.mark_skip(0)
+    core.plan_tasks(['D'], 2, None)
+    core.delete_task(core.index_of('A'))
+    core.add_task('Added')
+    assert json.dumps(frozen, default=json_default) == expected
+
+
+def counted(core):
+    """state() plus the event log"""
+    return state(core), core.events.rows()
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+@pytest.mark.parametrize('mark', ['mark_done', 'mark_skip'])
+def test_undo_of_done_and_skip_restores_counts(instances, extension, mark):
+    core, _ = pair(instances, extension)
+    core.mark_done(1)
+    before = counted(core)
+    getattr(core, mark)(0)
+    after = counted(core)
+    assert after != before
+    assert core.undo()
+    assert counted(core) == before
+    assert core.tasks[0]['task_id'] == 'A'
+    assert core.redo()
+    assert counted(core) == after
+    assert core.undo()
+    core.save_data()
+    reopened = instances(extension)
+    assert counted(reopened) == before
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_bulk_actions_are_one_undo_step_and_one_record(instances, extension, monkeypatch):
+    core, other = pair(instances, extension, count=8)
+    records = []
+    append = core.storage.append
+    monkeypatch.setattr(core.storage, 'append', lambda record: (records.append(record), append(record)))
+    before = counted(core)
+
+    assert core.mark_done_tasks(['G', 'B', 'E', 'missing']) == 3
+    assert [task['task_id'] for task in core.tasks][-3:] == ['B', 'E', 'G']
+    assert core.mark_skip_tasks(['A', 'C']) == 2
+    assert core.prefix_tasks(['D', 'H'], 'Urgent: ') == 2
+    assert core.get_task('D')['description'] == 'Urgent: Task 3'
+    assert core.delete_tasks(['F', 'H']) == 2
+    assert len(records) == 4
+
+    merge(core, other)
+    assert state(other) == state(core)
+    for _ in range(4):
+        assert core.undo()
+    assert counted(core) == before
+    # The next undo is the add before them
+    assert core.undo()
+    assert len(core.tasks) == 7
@@ -0,0 +1,76 @@
+import pytest
+
+import todo_io
+from todo_core import TodoCore
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    core.add_task('Existing')
+    return core
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_csv_import_renames_taken_ids(core, tmp_path):
+    path = write(tmp_path / 'in.csv',
+                 'type,task_id,description,created,completed_count,skipped_count,time,outcome\n'
+                 'task,A,Water the plants,,3,1,,\n'
+                 'task,Task5,Read,2024-01-01T09:00:00,0,0,,\n'
+                 'event,A,,,,,2024-01-02T08:15:00,done\n')
+    assert todo_io.run(todo_io.import_file(core, path)) == (2, 1.0)
+    imported = core.tasks[1]
+    assert imported['task_id'] == 'B' and imported['completed_count'] == 3
+    assert 'created' not in imported.to_dict()
+    assert core.tasks[2]['created'] == '2024-01-01T09:00:00'
+    assert core.events.rows() == [(1704183300, 'B', 'done')]
+
+
+@pytest.mark.parametrize('bad_row', [
+    '{"type":"event","task_id":"A","outcome":"maybe","time":"2024-01-02T08:15:00"}',
+    '{"type":"task","task_id":"C","completed_count":"many"}',
+    '{"type":"note"}',
+    '{not json',
+    '{"type":"task","task_id":"C","completed_count":null}',
+    '{"type":"task","task_id":["C"]}',
+    '{"type":"event","task_id":"A","outcome":"done","time":1704183300.5}',
+    '[1]',
+    '"x"',
+])
+def test_bad_row_imports_nothing(core, tmp_path, monkeypatch, bad_row):
+    monkeypatch.setattr(todo_io, 'CHUNK_SIZE', 2)
+    rows = [f'{{"type":"task","task_id":"T{i}","description":"t{i}"}}' for i in range(5)]
+    path = write(tmp_path / 'in.jsonl', '\n'.join(rows + [bad_row]) + '\n')
+    core.add_task('Undoable')
+    with pytest.raises(ValueError):
+        todo_io.run(todo_io.import_file(core, path))
+    assert [task['description'] for task in core.tasks] == ['Existing', 'Undoable']
+    assert core.undo()
+
+
+@pytest.mark.parametrize('name, text', [
+    ('in.jsonl', '{"task_id":"T1"}\n\n{"task_id":"T2","priority":true}\n'),
+    ('in.csv', 'type,task_id,time,outcome\ntask,T1,,\n"event",A,"2024-01-02\nT08:15",done\n'),
+])
+def test_bad_row_error_names_its_line(core, tmp_path, name, text):
+    with pytest.raises(ValueError, match='^line 3: '):
+        todo_io.run(todo_io.import_file(core, write(tmp_path / name, text)))
+
+
+def test_export_then_import_round_trips(core, tmp_path):
+    core.add_task('Second')
+    core.mark_done(0)
+    core.mark_skip(0)
+    for name in ('out.csv', 'out.jsonl'):
+        path = str(tmp_path / name)
+        todo_io.run(todo_io.export_file(core, path))
+        other = TodoCore(str(tmp_path / f'{name}.json'))
+        other.load_data()
+        todo_io.run(todo_io.import_file(other, path))
+        assert [task.to_dict() for task in other.tasks] == [task.to_dict() for task in core.tasks]
+        assert other.events.rows() == core.events.rows()
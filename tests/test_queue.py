@@ -0,0 +1,127 @@
+import random
+import time
+
+from todo_queue import LETTER_IDS, TaskIdAllocator, TaskQueue
+from todo_task import Task
+
+
+def lowest_free(used):
+    """The ID the baseline's linear probe picked"""
+    for task_id in LETTER_IDS:
+        if task_id not in used:
+            return task_id
+    number = 1
+    while f"Task{number}" in used:
+        number += 1
+    return f"Task{number}"
+
+
+def test_letters_then_numbers():
+    ids = TaskIdAllocator()
+    assert [ids.allocate() for _ in range(28)] == LETTER_IDS + ['Task1', 'Task2']
+
+
+def test_lowest_free_id_first():
+    ids = TaskIdAllocator(LETTER_IDS + ['Task1', 'Task3', 'Task4'])
+    assert ids.allocate() == 'Task2'
+    assert ids.allocate() == 'Task5'
+    ids.release('Task3')
+    ids.release('C')
+    assert ids.allocate() == 'C'
+    assert ids.allocate() == 'Task3'
+    assert ids.allocate() == 'Task6'
+
+
+def test_large_numbers_do_not_fill_gaps():
+    start = time.perf_counter()
+    ids = TaskIdAllocator(LETTER_IDS + ['Task10000000'])
+    assert ids.allocate() == 'Task1'
+    ids.claim('Task20000000')
+    assert ids.allocate() == 'Task2'
+    assert time.perf_counter() - start < 0.5
+
+
+def test_claim_and_release_round_trip():
+    ids = TaskIdAllocator(LETTER_IDS)
+    ids.claim('Task1')
+    ids.claim('Task1')
+    assert ids.allocate() == 'Task2'
+    ids.release('Task1')
+    ids.release('Task1')
+    ids.claim('Task1')
+    assert ids.allocate() == 'Task3'
+    ids.release('Task1')
+    assert ids.allocate() == 'Task1'
+    assert ids.allocate() == 'Task4'
+
+
+def test_other_ids_are_ignored():
+    ids = TaskIdAllocator(LETTER_IDS + ['Task01', 'Groceries', 'Task'])
+    ids.claim('Task007')
+    ids.release('Groceries')
+    assert [ids.allocate() for _ in range(2)] == ['Task1', 'Task2']
+
+
+def test_matches_linear_probe():
+    rng = random.Random(6)
+    used = set(rng.sample(LETTER_IDS, 20)) | {f"Task{rng.randrange(1, 60)}" for _ in range(30)}
+    ids = TaskIdAllocator(used)
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.4:
+            task_id = ids.allocate()
+            assert task_id == lowest_free(used)
+            used.add(task_id)
+        elif op < 0.8 and used:
+            task_id = rng.choice(sorted(used))
+            ids.release(task_id)
+            used.discard(task_id)
+        else:
+            task_id = rng.choice(LETTER_IDS + [f"Task{rng.randrange(1, 120)}"])
+            ids.claim(task_id)
+            used.add(task_id)
+
+
+def test_queue_matches_a_list():
+    """Rotation, inserts and removals agree with a plain list, across block splits and merges"""
+    rng = random.Random(5)
+    tasks = [Task(f'T{i}', '') for i in range(50)]
+    queue = TaskQueue(tasks[:20], block_size=4)
+    expected = tasks[:20]
+    unused = tasks[20:]
+    for step in range(2000):
+        action = rng.random()
+        if action < 0.4 and expected:
+            # Done/skip of the current task: to the back of the line
+            queue.append(queue.pop(0))
+            expected.append(expected.pop(0))
+        elif action < 0.6 and unused:
+            index = rng.randrange(len(expected) + 1)
+            task = unused.pop()
+            queue.insert(index, task)
+            expected.insert(index, task)
+        elif expected:
+            task = expected.pop(rng.randrange(len(expected)))
+            assert queue.remove(task.task_id) is task
+            unused.append(task)
+        assert len(queue) == len(expected), step
+    assert list(queue) == expected
+    assert queue[3:7] == expected[3:7]
+    # Handles follow a task wherever it moved
+    for index, task in enumerate(expected):
+        assert queue.index_of(task.task_id) == index and queue.get(task.task_id) is task
+    assert all(task.task_id not in queue for task in unused)
+
+
+def test_lazy_blocks_load_only_when_touched():
+    loaded = []
+
+    def load(start, stop):
+        loaded.append((start, stop))
+        return [Task(f'T{i}', '') for i in range(start, stop)]
+    queue = TaskQueue(block_size=4)
+    queue.extend_lazy([f'T{i}' for i in range(10)], load)
+    assert len(queue) == 10 and 'T9' in queue and not loaded
+    assert queue.index_of('T5') == 5
+    assert loaded == [(4, 8)]
+    assert [task.task_id for task in queue] == [f'T{i}' for i in range(10)]
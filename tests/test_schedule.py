@@ -0,0 +1,65 @@
+import random
+
+from todo_core import TodoCore
+from todo_schedule import PRIORITY, ROTATION, due_ordinal
+
+
+def rank(task):
+    return -task.get('priority', 0), due_ordinal(task)
+
+
+def test_rotation_stays_the_default(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    for i in range(3):
+        core.add_task(f'Task {i}')
+    core.plan_tasks(['C'], 5, '2030-01-01')
+    assert core.schedule == ROTATION
+    assert core.current_task['task_id'] == 'A'
+
+
+def test_priority_schedule_picks_by_priority_then_due_day(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'), schedule=PRIORITY)
+    core.load_data()
+    rng = random.Random(22)
+    for i in range(30):
+        core.add_task(f'Task {i}')
+    for step in range(300):
+        task_id = core.tasks[rng.randrange(len(core.tasks))]['task_id']
+        action = rng.choice(('done', 'skip', 'plan', 'add', 'delete', 'undo'))
+        if action == 'done':
+            current = core.current_task['task_id']
+            peers = [task for task in core.tasks if rank(task) == rank(core.current_task)]
+            core.mark_done()
+            if len(peers) > 1:
+                # Behind the others of its class, not straight back
+                assert core.current_task['task_id'] != current
+        elif action == 'skip':
+            core.mark_skip()
+        elif action == 'plan':
+            due = rng.choice((None, '2030-01-01', '2030-02-01'))
+            core.plan_tasks([task_id], rng.randrange(3), due)
+        elif action == 'add':
+            core.add_task(f'Added {step}')
+        elif action == 'delete' and len(core.tasks) > 5:
+            core.delete_task(core.index_of(task_id))
+        elif action == 'undo':
+            core.undo()
+        scheduled = core.scheduled_tasks()
+        assert sorted(task['task_id'] for task in scheduled) == sorted(task['task_id'] for task in core.tasks)
+        assert [rank(task) for task in scheduled] == sorted(rank(task) for task in core.tasks), step
+        assert core.current_task is scheduled[0]
+        assert core.tasks[core.current_index()] is scheduled[0]
+
+
+def test_undone_done_is_current_again(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'), schedule=PRIORITY)
+    core.load_data()
+    for i in range(4):
+        core.add_task(f'Task {i}')
+    core.plan_tasks(['B', 'C'], 2, None)
+    assert core.current_task['task_id'] == 'B'
+    core.mark_done()
+    assert core.current_task['task_id'] == 'C'
+    assert core.undo()
+    assert core.current_task['task_id'] == 'B'
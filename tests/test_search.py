@@ -0,0 +1,53 @@
+import random
+
+from todo_core import TodoCore
+from todo_search import words
+
+VOCABULARY = ['water', 'wash', 'washing', 'plants', 'plan', 'read', 'ready', 'cook', 'Cookies']
+
+
+def matches(core, query):
+    """Task IDs in queue order whose words start with every word of query, found by a scan"""
+    wanted = words(query)
+    return [task['task_id'] for task in core.tasks
+            if all(any(word.startswith(prefix) for word in words(task['description'])) for prefix in wanted)]
+
+
+def test_search_follows_every_change(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    rng = random.Random(19)
+
+    def description():
+        return ' '.join(rng.sample(VOCABULARY, 2))
+    for _ in range(40):
+        core.add_task(description())
+    core.search_index
+    for step in range(300):
+        action = rng.choice(('add', 'edit', 'delete', 'undo', 'redo'))
+        index = rng.randrange(len(core.tasks))
+        if action == 'add':
+            core.add_task(description())
+        elif action == 'edit':
+            core.edit_task(index, description())
+        elif action == 'delete' and len(core.tasks) > 5:
+            core.delete_task(index)
+        elif action == 'undo':
+            core.undo()
+        elif action == 'redo':
+            core.redo()
+        for query in ('wa', 'wash', 'plan', 'PLANTS', 'read co', 'cookie', 'x'):
+            assert core.search(query) == matches(core, query), (step, query)
+    assert core.search('  ') is None
+
+
+def test_done_on_the_matches(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    for text in ('Water the plants', 'Read', 'Wash the car', 'Plan the week'):
+        core.add_task(text)
+    found = core.search('the')
+    assert found == ['A', 'C', 'D']
+    assert core.mark_done_tasks(found) == 3
+    assert [task['task_id'] for task in core.tasks] == ['B', 'A', 'C', 'D']
+    assert core.search('the') == ['A', 'C', 'D']
@@ -0,0 +1,58 @@
+import pytest
+
+import todo_snapshot
+from todo_snapshot import read_snapshot, write_snapshot
+
+DATA = {
+    'tasks': [
+        {'task_id': 'A', 'description': 'Water the plants', 'created': '2024-01-02 03:04:05',
+         'completed_count': 3, 'skipped_count': 1},
+        {'task_id': 'B', 'description': 'Read', 'completed_count': 10 ** 12, 'skipped_count': -1},
+        {'task_id': 'Task7', 'description': 'Plan', 'created': None, 'completed_count': 0,
+         'skipped_count': 2 ** 40, 'priority': 2, 'due': '2024-01-05'},
+    ],
+    'statistics': {
+        'daily': {'2024-01-02': 3, '2024-01-03': 2 ** 33},
+        'total_done': 10 ** 12 + 3,
+        'total_skipped': 2 ** 40,
+        'events': {'task_ids': ['A', 'B'], 'time': [1704164645, 1704251045], 'task': [0, 1],
+                   'outcome': [1, 0]},
+    },
+    'journal_seq': 7,
+}
+
+
+def plain(data):
+    """data with its tasks and event columns as plain lists and dicts"""
+    statistics = dict(data['statistics'])
+    statistics['events'] = {key: list(column) for key, column in statistics['events'].items()}
+    return {'tasks': [task.to_dict() if hasattr(task, 'to_dict') else dict(task) for task in data['tasks']],
+            'statistics': statistics, 'journal_seq': data['journal_seq']}
+
+
+def test_round_trip_with_large_and_negative_counts(tmp_path):
+    path = tmp_path / 'data.todo'
+    write_snapshot(path, DATA)
+    assert plain(read_snapshot(path)) == DATA
+
+
+def test_counts_that_do_not_fit_raise_value_error(tmp_path):
+    data = {'tasks': [{'task_id': 'A', 'description': 'x', 'completed_count': 2 ** 64,
+                       'skipped_count': 0}]}
+    with pytest.raises(ValueError, match='Task A'):
+        write_snapshot(tmp_path / 'data.todo', data)
+    assert not (tmp_path / 'data.todo').exists()
+
+
+def test_reads_version_1(tmp_path, monkeypatch):
+    task_record, daily_record = todo_snapshot.RECORDS[1]
+    monkeypatch.setattr(todo_snapshot, 'VERSION', 1)
+    monkeypatch.setattr(todo_snapshot, 'TASK_RECORD', task_record)
+    monkeypatch.setattr(todo_snapshot, 'DAILY_RECORD', daily_record)
+    data = {'tasks': [{'task_id': 'A', 'description': 'x', 'completed_count': 5, 'skipped_count': 6}],
+            'statistics': {'daily': {'2024-01-02': 5}, 'total_done': 5, 'total_skipped': 6,
+                           'events': {'task_ids': [], 'time': [], 'task': [], 'outcome': []}},
+            'journal_seq': 0}
+    write_snapshot(tmp_path / 'old.todo', data)
+    monkeypatch.undo()
+    assert plain(read_snapshot(tmp_path / 'old.todo')) == data
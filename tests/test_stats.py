@@ -0,0 +1,154 @@
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from todo_core import TodoCore
+from todo_stats import OUTCOMES, WINDOWS, DailyCounts, EventLog, TaskStats, day_date, week_key
+from todo_task import Task
+
+
+def recount(daily, today, days):
+    """(total, active days) of a window, counted the slow way"""
+    counts = [daily.get(today - age, 0) for age in range(days)]
+    return sum(counts), sum(1 for count in counts if count)
+
+
+def test_rolling_windows_match_a_recount():
+    today = date.today().toordinal()
+    rng = random.Random(3)
+    daily = {today - rng.randrange(500): rng.randrange(1, 5) for _ in range(100)}
+    counts = DailyCounts({day_date(ordinal).isoformat(): count for ordinal, count in daily.items()})
+    for action in range(1000):
+        ordinal = today - rng.randrange(-2, 600)
+        step = rng.choice((1, 1, -1))
+        counts.add(ordinal, step)
+        daily[ordinal] = max(daily.get(ordinal, 0) + step, 0)
+        for days in WINDOWS + (14,):
+            assert counts.window(days) == recount(daily, today, days), (action, days)
+    assert counts.recent(10).tolist() == [daily.get(today - age, 0) for age in range(9, -1, -1)]
+    assert counts.get(today - 1000) == 0
+
+    # A new day moves every window along (window() would roll back to the real today)
+    counts.roll(today + 1)
+    for days in WINDOWS:
+        assert (counts.totals[days], counts.active[days]) == recount(daily, today + 1, days)
+
+
+def label(seconds, period):
+    """Bucket label of an event time, worked out with datetime"""
+    moment = datetime.fromtimestamp(seconds, timezone.utc)
+    if period == 'hour':
+        return moment.strftime('%Y-%m-%dT%H')
+    if period == 'week':
+        return (moment.date() - timedelta(days=moment.weekday())).isoformat()
+    return moment.strftime('%Y-%m' if period == 'month' else '%Y-%m-%d')
+
+
+@pytest.mark.parametrize('period', ['hour', 'day', 'week', 'month'])
+def test_rollups_match_a_recount(period):
+    rng = random.Random(11)
+    start = 1_600_000_000
+    rows = sorted((start + rng.randrange(400 * 86400), rng.choice(['A', 'B', None]), rng.choice(OUTCOMES))
+                  for _ in range(3000))
+    log = EventLog()
+    for row in rows:
+        log.append(*row)
+    # An undone action drops its event
+    log.remove(*rows[100])
+    del rows[100]
+    assert log.rows() == rows
+
+    since = start + 100 * 86400
+    for task_id in (None, 'A'):
+        expected = Counter((label(time, period), outcome) for time, event_task, outcome in rows
+                           if time >= since and task_id in (None, event_task))
+        labels = sorted({key for key, _ in expected})
+        assert log.summary(period, task_id, since)[0] == labels
+        assert log.rollup(period, 'done', task_id, since) == {
+            key: expected[key, 'done'] for key in labels if expected[key, 'done']}
+        assert log.rollup(period, 'skip', task_id, since) == {
+            key: expected[key, 'skip'] for key in labels if expected[key, 'skip']}
+
+
+def test_dones_fill_the_weekly_and_monthly_buckets(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    core.add_task('Task')
+    core.mark_done(0)
+    core.events  # Indexing the log rolls the buckets up, after that each done adds to them
+    core.mark_done(0)
+    core.mark_skip(0)
+    today = date.today()
+    assert core.statistics['weekly'] == {week_key(today.toordinal()): 2}
+    assert core.statistics['monthly'] == {today.isoformat()[:7]: 2}
+    assert core.undo()
+    assert core.undo()
+    assert core.statistics['weekly'] == {week_key(today.toordinal()): 1}
+    assert core.skip_rates('week') == {week_key(today.toordinal()): 0.0}
+
+
+def test_task_stats_follow_every_action(tmp_path):
+    core = TodoCore(str(tmp_path / 'data.json'))
+    core.load_data()
+    for i in range(30):
+        core.add_task(f'Task {i}')
+    stats = core.task_stats
+    rng = random.Random(12)
+    for step in range(300):
+        stats.take_changes()
+        task_id = core.tasks[rng.randrange(len(core.tasks))]['task_id']
+        action = rng.choice(('done', 'skip', 'edit', 'delete', 'add', 'undo'))
+        if action == 'done':
+            core.mark_done(core.index_of(task_id))
+        elif action == 'skip':
+            core.mark_skip(core.index_of(task_id))
+        elif action == 'edit':
+            core.edit_task(core.index_of(task_id), f'Edited {step}')
+        elif action == 'delete' and len(core.tasks) > 5:
+            core.delete_task(core.index_of(task_id))
+        elif action == 'add':
+            task_id = core.add_task(f'Added {step}')['task_id']
+        elif action == 'undo':
+            core.undo()
+        reloaded, changed = stats.take_changes()
+        assert not reloaded
+        if action in ('done', 'skip', 'edit', 'add'):
+            assert changed == {task_id}
+        rebuilt = TaskStats(core.tasks)
+        assert stats.ids == rebuilt.ids == sorted(task['task_id'] for task in core.tasks), step
+        assert stats.rows == rebuilt.rows, step
+
+
+@pytest.mark.parametrize('key', ['done', 'skip_rate'])
+@pytest.mark.parametrize('largest', [True, False])
+def test_task_chart_rankings_match_a_sort(key, largest):
+    rng = random.Random(13)
+    tasks = [Task(f'Task{i}', '', completed_count=rng.randrange(5), skipped_count=rng.randrange(3))
+             for i in range(500)]
+    stats = TaskStats(tasks)
+    for task in tasks[:50]:
+        stats.remove(task.task_id)
+    tasks = tasks[50:]
+
+    def value(task):
+        total = task.completed_count + task.skipped_count
+        return task.completed_count if key == 'done' else task.skipped_count / total
+    ranked = [task for task in tasks if key == 'done' or task.completed_count + task.skipped_count]
+    # Ties go by task ID
+    ranked.sort(key=lambda task: (-value(task) if largest else value(task), task.task_id))
+    assert stats.top(30, key, largest) == [task.task_id for task in ranked[:30]]
+
+
+def test_success_rate_histogram_counts_every_task():
+    rng = random.Random(13)
+    tasks = [Task(f'Task{i}', '', completed_count=rng.randrange(4), skipped_count=rng.randrange(4))
+             for i in range(1000)]
+    labels, counts = TaskStats(tasks).rate_histogram(bins=4)
+    assert labels == ['0-25%', '25-50%', '50-75%', '75-100%', 'none']
+    expected = [0] * 5
+    for task in tasks:
+        total = task.completed_count + task.skipped_count
+        expected[min(int(task.completed_count / total * 4), 3) if total else 4] += 1
+    assert counts == expected
@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+
+import pytest
+
+from todo_core import TodoCore
+from todo_storage import BackgroundWriter, JournalStorage, migrate, open_storage
+
+FORMATS = ('.json', '.todo', '.db')
+
+DATA = {
+    'tasks': [
+        {'task_id': 'A', 'description': 'Water the plants', 'created': '2024-01-02 03:04:05',
+         'completed_count': 2, 'skipped_count': 1},
+        {'task_id': 'B', 'description': 'No created time', 'completed_count': 10 ** 12, 'skipped_count': 0},
+        {'task_id': 'Task7', 'description': 'Planned', 'created': '2024-01-03 00:00:00',
+         'completed_count': 0, 'skipped_count': 1, 'priority': 2, 'due': '2024-01-05'},
+    ],
+    'statistics': {
+        # 2023-12-30 predates the event log and only has a daily count
+        'daily': {'2023-12-30': 4, '2024-01-02': 2},
+        'total_done': 9,
+        'total_skipped': 2,
+        'events': {'task_ids': ['A', 'Task7'], 'time': [1704164645, 1704164700, 1704251045, 1704251100],
+                   'task': [0, 0, 0, 1], 'outcome': [0, 0, 1, 1]},
+    },
+}
+
+
+def load(path):
+    core = TodoCore(str(path))
+    core.load_data()
+    return core
+
+
+def saved(core):
+    """core's data as the plain lists and dicts of the JSON data file"""
+    snapshot = core.snapshot()
+    statistics = snapshot['statistics']
+    return {'tasks': [task.to_dict() for task in snapshot['tasks']],
+            'statistics': {key: statistics[key] for key in
+                           ('daily', 'weekly', 'monthly', 'total_done', 'total_skipped', 'events')}}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.json'
+    path.write_text(json.dumps(DATA))
+    return path
+
+
+@pytest.mark.parametrize('first', FORMATS)
+@pytest.mark.parametrize('second', FORMATS)
+def test_migration_round_trips(tmp_path, source, first, second):
+    expected = saved(load(source))
+    assert 'created' not in expected['tasks'][1]
+    path = source
+    for step, extension in enumerate((first, second, '.json')):
+        destination = tmp_path / f'step{step}{extension}'
+        assert migrate(str(path), str(destination)) == len(DATA['tasks'])
+        path = destination
+        core = load(path)
+        assert saved(core) == expected, (step, extension)
+        core.storage.close()
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_actions_survive_reopening(tmp_path, source, extension):
+    path = tmp_path / f'data{extension}'
+    migrate(str(source), str(path))
+    core = load(path)
+    core.mark_done(0)
+    core.mark_skip(0)
+    core.add_task('New')
+    core.edit_task(0, 'Edited')
+    core.plan_tasks(['A'], 3, '2030-01-01')
+    expected = saved(core)
+    core.close()
+    assert saved(load(path)) == expected
+
+
+def state(core):
+    return sorted((task['task_id'], task['description'], task['completed_count'], task['skipped_count'])
+                  for task in core.tasks)
+
+
+@pytest.mark.parametrize('extension', FORMATS)
+def test_background_writer_reads_changes_on_its_thread(tmp_path, source, extension, monkeypatch):
+    path = tmp_path / f'data{extension}'
+    migrate(str(source), str(path))
+    app = TodoCore(str(path), storage=BackgroundWriter(open_storage(str(path)), poll_every=0.01))
+    app.load_data()
+    other = load(path)
+
+    threads = []
+    storage_changes = app.storage.storage.changes
+
+    def changes():
+        threads.append(threading.current_thread())
+        return storage_changes()
+    monkeypatch.setattr(app.storage.storage, 'changes', changes)
+
+    other.mark_done(0)
+    other.add_task('From the other instance')
+    other.save_data()
+    deadline = time.monotonic() + 10
+    while state(app) != state(other) and time.monotonic() < deadline:
+        time.sleep(0.01)
+        app.refresh()
+    assert state(app) == state(other)
+    assert threads and set(threads) == {app.storage.thread}
+
+    # wait() reads what was saved before it, so a refresh right after sees it
+    other.mark_skip(1)
+    other.save_data()
+    app.storage.wait()
+    app.refresh()
+    assert state(app) == state(other)
+    app.close()
+    other.close()
+    assert state(load(path)) == state(other)
+
+
+@pytest.mark.parametrize('extension', ('.json', '.todo'))
+def test_torn_journal_line_is_dropped(tmp_path, source, extension):
+    path = tmp_path / f'data{extension}'
+    migrate(str(source), str(path))
+    core = load(path)
+    core.mark_done(0)
+    core.save_data()
+    expected = state(core)
+    core.storage.close()
+    journal = tmp_path / 'data.journal'
+    with open(journal, 'a') as f:
+        f.write('{"a":"done","i":0,')  # A crash halfway through a record
+
+    core = load(path)
+    assert state(core) == expected
+    core.mark_skip(0)
+    core.save_data()
+    expected = state(core)
+    core.storage.close()
+    assert state(load(path)) == expected
+
+
+def test_actions_stay_undoable_after_reopening(tmp_path, source):
+    path = tmp_path / 'data.json'
+    migrate(str(source), str(path))
+    core = load(path)
+    before = state(core)
+    core.mark_done(0)
+    core.add_task('New')
+    core.storage.close()  # No compaction, the journal holds both
+
+    core = load(path)
+    assert core.undo() and core.undo()
+    assert state(core) == before
+    core.storage.close()
+    assert state(load(path)) == before
+
+
+@pytest.mark.parametrize('extension', ('.json', '.todo'))
+def test_compaction_waits_for_records_not_merged(tmp_path, source, extension):
+    path = tmp_path / f'data{extension}'
+    migrate(str(source), str(path))
+    first, second = load(path), load(path)
+    second.mark_done(0)
+    second.save_data()
+    snapshot = path.read_bytes()
+    first.compact(background=False)
+    # The snapshot would have lost the second instance's done
+    assert path.read_bytes() == snapshot
+    first.refresh()
+    first.compact(background=False)
+    assert path.read_bytes() != snapshot
+    assert state(load(path)) == state(first) == state(second)
+    first.storage.close()
+    second.storage.close()
+
+
+@pytest.mark.parametrize('extension', ('.json', '.todo'))
+def test_instances_read_on_across_compactions(tmp_path, source, extension):
+    path = tmp_path / f'data{extension}'
+    migrate(str(source), str(path))
+    first, second, third = load(path), load(path), load(path)
+    second.mark_done(0)
+    second.save_data()
+    first.refresh()
+    first.compact(background=False)
+    # The third has not read the second's done; it is in the kept journal
+    assert (tmp_path / 'data.journal.old').exists()
+    assert third.refresh()
+    assert state(third) == state(first) == state(second)
+
+    # Two compactions later the kept journal no longer holds what the third has not read
+    for mark in (second.mark_skip, second.mark_done):
+        mark(1)
+        second.save_data()
+        first.refresh()
+        first.compact(background=False)
+    assert third.storage.changes() is None
+    third.load_data()
+    second.refresh()
+    assert state(first) == state(second) == state(third) == state(load(path))
+    for core in (first, second, third):
+        core.storage.close()
+
+
+def test_instance_without_a_journal_reads_on_after_a_compaction(tmp_path):
+    path = str(tmp_path / 'data.json')
+    first, second = (TodoCore(path, storage=JournalStorage(path, compact_every=5)) for _ in range(2))
+    for core in (first, second):
+        core.load_data()  # Neither finds a journal
+    for i in range(3):
+        first.add_task(f'First {i}')
+    second.refresh()
+    for i in range(5):
+        second.add_task(f'Second {i}')  # The fifth compacts
+        second.refresh()
+    first.refresh()
+    assert len(first.tasks) == 8
+    assert state(first) == state(second) == state(load(path))
+    first.storage.close()
+    second.storage.close()
@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+import todo_sync
+from todo_core import TodoCore
+from todo_storage import open_storage
+from todo_sync import parse_address, SyncServer
+
+
+def state(core):
+    return [(task['task_id'], task['description'], task['completed_count'], task['skipped_count'])
+            for task in core.tasks]
+
+
+class Server:
+    """A SyncServer on its own thread, on a data file that outlives restarts"""
+
+    def __init__(self, path):
+        self.path = path
+        self.port = 0
+        self.server = None
+
+    def start(self):
+        core = TodoCore(self.path, storage=open_storage(self.path, sync_every=float('inf')))
+        core.load_data()
+        self.server = SyncServer(core, sync_delay=0.01)
+        url = self.server.start_thread(port=self.port)
+        self.port = parse_address(url)[1]
+        return url
+
+    def stop(self):
+        self.server.stop_thread()
+        self.server.core.close()
+
+    @property
+    def core(self):
+        return self.server.core
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = Server(str(tmp_path / 'data.json'))
+    server.url = server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def clients(server):
+    opened = []
+
+    def connect(background=False):
+        core = TodoCore(server.url)
+        core.load_data()
+        if background:
+            core.write_in_background(delay=0.01)
+        opened.append(core)
+        return core
+
+    yield connect
+    for core in opened:
+        core.close()
+
+
+def merge(*cores):
+    for core in cores:
+        core.save_data()
+    for core in cores:
+        core.storage.wait()
+        core.refresh()
+
+
+def until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_clients_end_up_with_the_servers_queue(clients, server, background):
+    first, second = clients(), clients(background)
+    for i in range(4):
+        first.add_task(f'Task {i}')
+    merge(first, second)
+    first.mark_done(0)
+    second.mark_done(1)  # Before it has the first client's done
+    second.edit_task(second.index_of('C'), 'Edited')
+    merge(first, second)
+    assert state(first) == state(second) == state(server.core)
+    assert [task['task_id'] for task in first.tasks] == ['C', 'D', 'A', 'B']
+
+
+def test_changes_never_wait_on_the_server(clients, monkeypatch):
+    client = clients()
+
+    def no_network(*args):
+        raise AssertionError("changes() used the connection")
+    monkeypatch.setattr(client.storage, '_send', no_network)
+    monkeypatch.setattr(client.storage, '_open', no_network)
+    assert client.storage.changes() == []
+    client.storage.connected = False
+    assert client.storage.changes() == []
+
+
+def test_reconnects_on_its_own_thread(clients, server, monkeypatch):
+    monkeypatch.setattr(todo_sync, 'RECONNECT_INTERVAL', 0.05)
+    client = clients(background=True)
+    client.add_task('Before')
+    client.save_data()
+    server.stop()
+    until(lambda: not client.storage.storage.connected)
+
+    started = time.monotonic()
+    assert not client.refresh()
+    assert time.monotonic() - started < 0.5
+    client.mark_done(0)
+    with pytest.raises(OSError):
+        client.save_data()
+
+    server.start()
+    other = clients()
+    other.add_task('While away')
+    until(lambda: client.refresh())
+    client.save_data()
+    merge(client, other)
+    assert state(client) == state(other) == state(server.core)
+    assert client.get_task('A')['completed_count'] == 1  # The done made while away was sent
+
+
+def test_wait_brings_in_what_was_pushed_before(clients):
+    first, second = clients(), clients()
+    first.add_task('From the first')
+    second.storage.wait()
+    assert second.refresh()
+    assert state(second) == state(first)
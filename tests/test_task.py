@@ -0,0 +1,52 @@
+import json
+import sys
+
+import pytest
+
+from todo_task import Task, json_default
+
+CREATED = [
+    '2024-01-01T09:00:00',
+    '2024-01-01T09:00:00.123456',
+    # Would not come back the same from microseconds, so they are kept as they are
+    '2024-01-01T09:00:00.000000',
+    '2024-01-01 09:00:00',
+    '2024-01-01T09:00:00+02:00',
+    '2024-01-01',
+    None,
+    12345,
+]
+
+
+@pytest.mark.parametrize('created', CREATED)
+def test_json_layout_round_trips(created):
+    data = {'task_id': 'Task12', 'description': 'Water the plants', 'created': created,
+            'completed_count': 3, 'skipped_count': 1, 'priority': 2, 'due': '2024-01-05', 'newer': {'x': [1]}}
+    task = Task.from_dict(data)
+    assert task.to_dict() == dict(task) == data
+    assert json.loads(json.dumps(task, default=json_default)) == data
+    assert task.copy().to_dict() == data
+    assert (task.created_time is not None) == (created in CREATED[:2])
+
+
+def test_reads_and_writes_like_a_dict():
+    task = Task.from_dict({'task_id': ''.join(['T', '1']), 'description': 'Read'})
+    assert task.task_id is sys.intern('T1')
+    assert task.to_dict() == {'task_id': 'T1', 'description': 'Read', 'completed_count': 0, 'skipped_count': 0}
+    task['completed_count'] += 1
+    task['due'] = '2024-01-05'
+    task['created'] = '2024-01-01T09:00:00'
+    assert task['completed_count'] == 1 and task.get('due') == '2024-01-05' and 'created' in task
+    assert task.pop('due') == '2024-01-05' and task.pop('due', None) is None
+    assert task.extra is None
+    with pytest.raises(KeyError):
+        task['priority']
+    assert len(task) == len(task.to_dict()) == 5
+
+
+def test_smaller_than_the_dict_it_replaces():
+    data = {'task_id': 'A', 'description': 'Water the plants', 'created': '2024-01-01T09:00:00.123456',
+            'completed_count': 3, 'skipped_count': 1}
+    task = Task.from_dict(data)
+    assert not hasattr(task, '__dict__')
+    assert sys.getsizeof(task) < sys.getsizeof(data) / 2
@@ -1,626 +1,1025 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import json
-import os
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-# Set data file path relative to script location
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_FILE = os.path.join(BASE_DIR, 'todo_data.json')
-
-
-class TodoApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Advanced ToDo List Application")
-        self.root.geometry("1200x800")
-        
-        # Data structures
-        self.tasks = []
-        self.history = []  # For undo/redo functionality
-        self.history_index = -1
-        self.statistics = {
-            'daily': {},
-            'weekly': {},
-            'monthly': {},
-            'total_done': 0,
-            'total_skipped': 0
-        }
-        
-        # Load saved data
-        self.load_data()
-        
-        # Create main frame
-        self.main_frame = ttk.Frame(root, padding="10")
-        self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Configure grid weights
-        root.columnconfigure(0, weight=1)
-        root.rowconfigure(0, weight=1)
-        self.main_frame.columnconfigure(0, weight=1)
-        self.main_frame.columnconfigure(1, weight=1)
-        self.main_frame.rowconfigure(0, weight=1)
-        self.main_frame.rowconfigure(1, weight=1)
-        
-        # Create four sections
-        self.create_task_section()
-        self.create_statistics_section()
-        self.create_daily_chart_section()
-        self.create_radar_chart_section()
-        
-        # Save data when closing
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        
-        # Update displays
-        self.update_displays()
-    
-    def create_task_section(self):
-        """First section: Task management"""
-        task_frame = ttk.LabelFrame(self.main_frame, text="Tasks Management", padding="10")
-        task_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
-        task_frame.columnconfigure(0, weight=1)
-        
-        # Current task display
-        current_task_frame = ttk.Frame(task_frame)
-        current_task_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=5)
-        current_task_frame.columnconfigure(1, weight=1)
-        
-        ttk.Label(current_task_frame, text="Current Task:").grid(row=0, column=0, sticky=tk.W)
-        self.current_task_var = tk.StringVar()
-        self.current_task_label = ttk.Label(current_task_frame, textvariable=self.current_task_var, 
-                                          font=('Arial', 12, 'bold'))
-        self.current_task_label.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=10)
-        
-        # Task action buttons
-        action_frame = ttk.Frame(task_frame)
-        action_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=10)
-        
-        self.done_btn = ttk.Button(action_frame, text="Done (Current)", command=self.mark_current_done)
-        self.done_btn.grid(row=0, column=0, padx=5)
-        
-        self.skip_btn = ttk.Button(action_frame, text="Skip (Current)", command=self.mark_current_skip)
-        self.skip_btn.grid(row=0, column=1, padx=5)
-        
-        # NEW: Buttons for selected task
-        self.done_selected_btn = ttk.Button(action_frame, text="Done (Selected)", command=self.mark_selected_done)
-        self.done_selected_btn.grid(row=0, column=2, padx=5)
-        
-        self.skip_selected_btn = ttk.Button(action_frame, text="Skip (Selected)", command=self.mark_selected_skip)
-        self.skip_selected_btn.grid(row=0, column=3, padx=5)
-        
-        # Task list
-        list_frame = ttk.Frame(task_frame)
-        list_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
-        list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
-        
-        self.task_listbox = tk.Listbox(list_frame, height=8)
-        self.task_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Bind selection event to update button states
-        self.task_listbox.bind('<<ListboxSelect>>', self.on_task_select)
-        
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.task_listbox.yview)
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.task_listbox.config(yscrollcommand=scrollbar.set)
-        
-        # Management buttons
-        mgmt_frame = ttk.Frame(task_frame)
-        mgmt_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=5)
-        
-        ttk.Button(mgmt_frame, text="Add Task", command=self.add_task).grid(row=0, column=0, padx=2)
-        ttk.Button(mgmt_frame, text="Edit Task", command=self.edit_task).grid(row=0, column=1, padx=2)
-        ttk.Button(mgmt_frame, text="Delete Task", command=self.delete_task).grid(row=0, column=2, padx=2)
-        ttk.Button(mgmt_frame, text="Undo", command=self.undo).grid(row=0, column=3, padx=2)
-        ttk.Button(mgmt_frame, text="Redo", command=self.redo).grid(row=0, column=4, padx=2)
-        ttk.Button(mgmt_frame, text="Save Progress", command=self.save_data).grid(row=0, column=5, padx=2)
-        
-        task_frame.rowconfigure(2, weight=1)
-    
-    def create_statistics_section(self):
-        """Second section: Statistics"""
-        stats_frame = ttk.LabelFrame(self.main_frame, text="Statistics", padding="10")
-        stats_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
-        
-        self.stats_text = tk.Text(stats_frame, height=15, width=30)
-        self.stats_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        stats_scrollbar = ttk.Scrollbar(stats_frame, orient=tk.VERTICAL, command=self.stats_text.yview)
-        stats_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.stats_text.config(yscrollcommand=stats_scrollbar.set)
-        
-        stats_frame.columnconfigure(0, weight=1)
-        stats_frame.rowconfigure(0, weight=1)
-    
-    def create_daily_chart_section(self):
-        """Third section: 7-day chart"""
-        chart_frame = ttk.LabelFrame(self.main_frame, text="7-Day Performance Chart", padding="10")
-        chart_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
-        
-        self.fig1, self.ax1 = plt.subplots(figsize=(6, 3))
-        self.canvas1 = FigureCanvasTkAgg(self.fig1, chart_frame)
-        self.canvas1.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        chart_frame.columnconfigure(0, weight=1)
-        chart_frame.rowconfigure(0, weight=1)
-    
-    def create_radar_chart_section(self):
-        """Fourth section: Radar chart"""
-        radar_frame = ttk.LabelFrame(self.main_frame, text="Task Performance Radar", padding="10")
-        radar_frame.grid(row=1, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
-        
-        self.fig2, self.ax2 = plt.subplots(figsize=(6, 3), subplot_kw=dict(projection='polar'))
-        self.canvas2 = FigureCanvasTkAgg(self.fig2, radar_frame)
-        self.canvas2.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        radar_frame.columnconfigure(0, weight=1)
-        radar_frame.rowconfigure(0, weight=1)
-    
-    def on_task_select(self, event):
-        """Handle task selection in listbox"""
-        selection = self.task_listbox.curselection()
-        if selection:
-            self.done_selected_btn.config(state='normal')
-            self.skip_selected_btn.config(state='normal')
-        else:
-            self.done_selected_btn.config(state='disabled')
-            self.skip_selected_btn.config(state='disabled')
-    
-    def save_state(self):
-        """Save current state for undo/redo"""
-        state = {
-            'tasks': self.tasks.copy(),
-            'statistics': self.statistics.copy()
-        }
-        
-        if self.history_index < len(self.history) - 1:
-            self.history = self.history[:self.history_index + 1]
-        
-        self.history.append(state)
-        self.history_index += 1
-        
-        # Limit history size
-        if len(self.history) > 50:
-            self.history.pop(0)
-            self.history_index -= 1
-    
-    def add_task(self):
-        """Add new task"""
-        task = simpledialog.askstring("Add Task", "Enter task description:")
-        if task:
-            self.save_state()
-            # Find the next available task ID (A, B, C, etc.)
-            existing_ids = set()
-            for t in self.tasks:
-                if 'task_id' in t:
-                    existing_ids.add(t['task_id'])
-            
-            # Find first available letter
-            task_id = None
-            for i in range(26):  # A-Z
-                candidate_id = chr(65 + i)  # A, B, C, ...
-                if candidate_id not in existing_ids:
-                    task_id = candidate_id
-                    break
-            
-            # If all letters used, use Task1, Task2, etc.
-            if task_id is None:
-                counter = 1
-                while f"Task{counter}" in existing_ids:
-                    counter += 1
-                task_id = f"Task{counter}"
-            
-            task_data = {
-                'task_id': task_id,
-                'description': task,
-                'created': datetime.now().isoformat(),
-                'completed_count': 0,
-                'skipped_count': 0
-            }
-            self.tasks.append(task_data)
-            self.update_displays()
-    
-    def edit_task(self):
-        """Edit selected task"""
-        selection = self.task_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a task to edit")
-            return
-        
-        index = selection[0]
-        current_desc = self.tasks[index]['description']
-        new_desc = simpledialog.askstring("Edit Task", "Enter new description:", initialvalue=current_desc)
-        
-        if new_desc:
-            self.save_state()
-            self.tasks[index]['description'] = new_desc
-            self.update_displays()
-    
-    def delete_task(self):
-        """Delete selected task"""
-        selection = self.task_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a task to delete")
-            return
-        
-        if messagebox.askyesno("Confirm", "Are you sure you want to delete this task?"):
-            self.save_state()
-            index = selection[0]
-            self.tasks.pop(index)
-            self.update_displays()
-    
-    def mark_current_done(self):
-        """Mark current (first) task as done and move to end"""
-        if not self.tasks:
-            return
-        
-        self.save_state()
-        task = self.tasks.pop(0)
-        task['completed_count'] += 1
-        self.tasks.append(task)
-        
-        # Update statistics
-        today = datetime.now().strftime('%Y-%m-%d')
-        self.statistics['daily'][today] = self.statistics['daily'].get(today, 0) + 1
-        self.statistics['total_done'] += 1
-        
-        self.update_displays()
-    
-    def mark_current_skip(self):
-        """Mark current (first) task as skipped and move to end"""
-        if not self.tasks:
-            return
-        
-        self.save_state()
-        task = self.tasks.pop(0)
-        task['skipped_count'] += 1
-        self.tasks.append(task)
-        
-        # Update statistics
-        self.statistics['total_skipped'] += 1
-        
-        self.update_displays()
-    
-    def mark_selected_done(self):
-        """Mark selected task as done and move to end"""
-        selection = self.task_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a task to mark as done")
-            return
-        
-        self.save_state()
-        index = selection[0]
-        task = self.tasks.pop(index)
-        task['completed_count'] += 1
-        self.tasks.append(task)
-        
-        # Update statistics
-        today = datetime.now().strftime('%Y-%m-%d')
-        self.statistics['daily'][today] = self.statistics['daily'].get(today, 0) + 1
-        self.statistics['total_done'] += 1
-        
-        self.update_displays()
-    
-    def mark_selected_skip(self):
-        """Mark selected task as skipped and move to end"""
-        selection = self.task_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a task to mark as skipped")
-            return
-        
-        self.save_state()
-        index = selection[0]
-        task = self.tasks.pop(index)
-        task['skipped_count'] += 1
-        self.tasks.append(task)
-        
-        # Update statistics
-        self.statistics['total_skipped'] += 1
-        
-        self.update_displays()
-    
-    # Keep the old methods for backward compatibility
-    def mark_done(self):
-        """Alias for mark_current_done"""
-        self.mark_current_done()
-    
-    def mark_skip(self):
-        """Alias for mark_current_skip"""
-        self.mark_current_skip()
-    
-    def undo(self):
-        """Undo last action"""
-        if self.history_index > 0:
-            self.history_index -= 1
-            state = self.history[self.history_index]
-            self.tasks = state['tasks'].copy()
-            self.statistics = state['statistics'].copy()
-            self.update_displays()
-    
-    def redo(self):
-        """Redo last undone action"""
-        if self.history_index < len(self.history) - 1:
-            self.history_index += 1
-            state = self.history[self.history_index]
-            self.tasks = state['tasks'].copy()
-            self.statistics = state['statistics'].copy()
-            self.update_displays()
-    
-    def update_displays(self):
-        """Update all display elements"""
-        self.update_task_display()
-        self.update_statistics_display()
-        self.update_daily_chart()
-        self.update_individual_task_chart()
-    
-    def update_task_display(self):
-        """Update task list and current task"""
-        # Update current task
-        if self.tasks:
-            current_task = self.tasks[0]
-            task_id = current_task.get('task_id', 'Unknown')
-            completed = current_task.get('completed_count', 0)
-            self.current_task_var.set(f"{task_id} - {current_task['description']} (Done: {completed})")
-            self.done_btn.config(state='normal')
-            self.skip_btn.config(state='normal')
-        else:
-            self.current_task_var.set("No tasks available")
-            self.done_btn.config(state='disabled')
-            self.skip_btn.config(state='disabled')
-        
-        # Update task list
-        self.task_listbox.delete(0, tk.END)
-        for task in self.tasks:
-            task_id = task.get('task_id', 'Unknown')
-            completed = task.get('completed_count', 0)
-            skipped = task.get('skipped_count', 0)
-            self.task_listbox.insert(tk.END, f"{task_id}: {task['description']} (✓{completed}, ✗{skipped})")
-        
-        # Update selected task button states
-        selection = self.task_listbox.curselection()
-        if selection and self.tasks:
-            self.done_selected_btn.config(state='normal')
-            self.skip_selected_btn.config(state='normal')
-        else:
-            self.done_selected_btn.config(state='disabled')
-            self.skip_selected_btn.config(state='disabled')
-    
-    def update_statistics_display(self):
-        """Update statistics text"""
-        self.stats_text.delete(1.0, tk.END)
-        
-        # Calculate averages
-        daily_avg = self.calculate_daily_average()
-        weekly_avg = self.calculate_weekly_average()
-        monthly_avg = self.calculate_monthly_average()
-        
-        stats_text = f"""STATISTICS (Done Tasks Only)
-
-Daily Average: {daily_avg:.2f} tasks/day
-Weekly Average: {weekly_avg:.2f} tasks/week
-Monthly Average: {monthly_avg:.2f} tasks/month
-
-Total Completed: {self.statistics['total_done']}
-Total Skipped: {self.statistics['total_skipped']}
-
-INDIVIDUAL TASK COMPLETION COUNTS:
-"""
-        
-        # Show individual task completion counts (sorted by task_id)
-        sorted_tasks = sorted(self.tasks, key=lambda x: x.get('task_id', 'ZZZ'))
-        for task in sorted_tasks:
-            task_id = task.get('task_id', 'Unknown')
-            completed = task['completed_count']
-            skipped = task['skipped_count']
-            total = completed + skipped
-            rate = (completed / total * 100) if total > 0 else 0
-            stats_text += f"{task_id} ({task['description'][:20]}...): {completed} done, {skipped} skip ({rate:.0f}% success)\n"
-        
-        stats_text += f"""
-Recent Daily Counts:
-"""
-        
-        # Show last 7 days
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            count = self.statistics['daily'].get(date, 0)
-            day_name = (datetime.now() - timedelta(days=i)).strftime('%A')
-            stats_text += f"{day_name} ({date}): {count} tasks\n"
-        
-        self.stats_text.insert(1.0, stats_text)
-    
-    def calculate_daily_average(self):
-        """Calculate daily average for last 30 days"""
-        if not self.statistics['daily']:
-            return 0.0
-        
-        total = 0
-        days = 0
-        for i in range(30):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            if date in self.statistics['daily']:
-                total += self.statistics['daily'][date]
-                days += 1
-        
-        return total / max(days, 1)
-    
-    def calculate_weekly_average(self):
-        """Calculate weekly average"""
-        return self.calculate_daily_average() * 7
-    
-    def calculate_monthly_average(self):
-        """Calculate monthly average"""
-        return self.calculate_daily_average() * 30
-    
-    def update_daily_chart(self):
-        """Update 7-day performance chart"""
-        self.ax1.clear()
-        
-        days = []
-        counts = []
-        
-        for i in range(6, -1, -1):  # Last 7 days
-            date = datetime.now() - timedelta(days=i)
-            day_name = date.strftime('%a')
-            date_str = date.strftime('%Y-%m-%d')
-            count = self.statistics['daily'].get(date_str, 0)
-            
-            days.append(day_name)
-            counts.append(count)
-        
-        if counts:
-            max_count = max(counts)
-            min_count = min(counts)
-            avg_count = sum(counts) / len(counts)
-            
-            colors = []
-            for count in counts:
-                if count == max_count and max_count > 0:
-                    colors.append('green')
-                elif count == min_count:
-                    colors.append('red')
-                else:
-                    colors.append('blue')
-            
-            bars = self.ax1.bar(days, counts, color=colors)
-            self.ax1.axhline(y=avg_count, color='blue', linestyle='--', alpha=0.7, label=f'Avg: {avg_count:.1f}')
-            
-            self.ax1.set_title('7-Day Task Completion')
-            self.ax1.set_ylabel('Tasks Completed')
-            self.ax1.legend()
-            
-            # Add value labels on bars
-            for bar, count in zip(bars, counts):
-                height = bar.get_height()
-                self.ax1.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                             f'{int(count)}', ha='center', va='bottom')
-        
-        self.fig1.tight_layout()
-        self.canvas1.draw()
-    
-    def update_individual_task_chart(self):
-        """Update individual task completion chart (bar chart instead of radar)"""
-        self.ax2.clear()
-        
-        if not self.tasks:
-            self.ax2.text(0.5, 0.5, 'No tasks available', transform=self.ax2.transAxes, 
-                         ha='center', va='center')
-            self.canvas2.draw()
-            return
-        
-        # Sort tasks by task_id for consistent order (A, B, C, D...)
-        sorted_tasks = sorted(self.tasks, key=lambda x: x.get('task_id', 'ZZZ'))
-        
-        # Prepare data for bar chart
-        task_ids = []
-        completion_counts = []
-        skip_counts = []
-        
-        for task in sorted_tasks:
-            task_ids.append(task.get('task_id', 'Unknown'))
-            completion_counts.append(task['completed_count'])
-            skip_counts.append(task['skipped_count'])
-        
-        if len(task_ids) > 0:
-            x = np.arange(len(task_ids))
-            width = 0.35
-            
-            # Create bars
-            bars1 = self.ax2.bar(x - width/2, completion_counts, width, 
-                               label='Completed', color='green', alpha=0.7)
-            bars2 = self.ax2.bar(x + width/2, skip_counts, width, 
-                               label='Skipped', color='red', alpha=0.7)
-            
-            # Add value labels on bars
-            for bar in bars1:
-                height = bar.get_height()
-                if height > 0:
-                    self.ax2.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                                 f'{int(height)}', ha='center', va='bottom', fontsize=9)
-            
-            for bar in bars2:
-                height = bar.get_height()
-                if height > 0:
-                    self.ax2.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                                 f'{int(height)}', ha='center', va='bottom', fontsize=9)
-            
-            self.ax2.set_xlabel('Tasks')
-            self.ax2.set_ylabel('Count')
-            self.ax2.set_title('Individual Task Completion Counts')
-            self.ax2.set_xticks(x)
-            self.ax2.set_xticklabels(task_ids)
-            self.ax2.legend()
-            self.ax2.grid(axis='y', alpha=0.3)
-            
-            # Set y-axis to start from 0
-            max_val = max(max(completion_counts) if completion_counts else 0, 
-                         max(skip_counts) if skip_counts else 0)
-            self.ax2.set_ylim(0, max_val + 1)
-        
-        self.fig2.tight_layout()
-        self.canvas2.draw()
-    
-    def save_data(self):
-        """Save data to file"""
-        data = {
-            'tasks': self.tasks,
-            'statistics': self.statistics
-        }
-        
-        try:
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
-            messagebox.showinfo("Success", "Data saved successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save data: {str(e)}")
-    
-    def load_data(self):
-        """Load data from file"""
-        try:
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.tasks = data.get('tasks', [])
-                    self.statistics = data.get('statistics', {
-                        'daily': {},
-                        'weekly': {},
-                        'monthly': {},
-                        'total_done': 0,
-                        'total_skipped': 0
-                    })
-                    
-                    # Ensure existing tasks have task_id and completion counts (for backward compatibility)
-                    for i, task in enumerate(self.tasks):
-                        if 'task_id' not in task:
-                            task_id = chr(65 + i) if i < 26 else f"Task{i+1}"
-                            task['task_id'] = task_id
-                        if 'completed_count' not in task:
-                            task['completed_count'] = 0
-                        if 'skipped_count' not in task:
-                            task['skipped_count'] = 0
-                            
-        except Exception as e:
-            print(f"Failed to load data: {str(e)}")
-            self.tasks = []
-            self.statistics = {
-                'daily': {},
-                'weekly': {},
-                'monthly': {},
-                'total_done': 0,
-                'total_skipped': 0
-            }
-    
-    def on_closing(self):
-        """Handle application closing"""
-        self.save_data()
-        self.root.destroy()
-
-def main():
-    root = tk.Tk()
-    app = TodoApp(root)
-    root.mainloop()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import bisect
+import sys
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from tkinter import font as tkfont
+import todo_io
+from todo_core import DATA_FILE, TodoCore
+from todo_profile import Profiler
+from todo_schedule import PRIORITY, ROTATION, plan_label
+from todo_stats import format_day
+
+# matplotlib and numpy add several hundred milliseconds to startup, so the
+# chart module is imported the first time a chart is drawn
+_charts = None
+
+
+def load_plotting():
+    """Import the chart module (and with it matplotlib) on first use"""
+    global _charts
+    if _charts is None:
+        import todo_charts
+        _charts = todo_charts
+    return _charts
+
+
+# Display panels the render scheduler can redraw
+QUEUE = 'queue'
+STATS = 'stats'
+DAILY_CHART = 'daily_chart'
+TASK_CHART = 'task_chart'
+ALL_PANELS = (QUEUE, STATS, DAILY_CHART, TASK_CHART)
+
+# File types offered by the import/export dialogs
+TRANSFER_FILETYPES = [("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")]
+
+# Milliseconds between status bar checks on the background writer
+SAVE_STATUS_INTERVAL = 250
+
+# Milliseconds between merges of actions other instances (windows, the command line) saved;
+# the background writer reads them from disk, so a check without any is cheap
+REFRESH_INTERVAL = 250
+
+# TodoApp methods the profiler times as user actions; every update_* method
+# but the status bar ticks, render_task_rows and patch_stats_lines are timed
+# as updates
+PROFILED_ACTIONS = ('add_task', 'edit_task', 'delete_task', 'mark_current_done', 'mark_current_skip',
+                    'mark_selected_done', 'mark_selected_skip', 'undo', 'redo', 'save_data',
+                    'import_tasks', 'export_tasks', 'on_task_select', 'select_all_tasks',
+                    'on_filter_change', 'clear_filter', 'on_task_list_resize', 'on_task_list_wheel',
+                    'scroll_task_list', 'change_task_chart_page', 'plan_task', 'change_schedule')
+
+# update_* methods run on a timer rather than by a redraw, left out of the frames
+UNPROFILED_UPDATES = ('update_save_status',)
+
+# Milliseconds between refreshes of the performance panel while it is shown
+PROFILE_PANEL_INTERVAL = 500
+
+# How the current task is chosen: label -> todo_schedule schedule
+SCHEDULE_LABELS = {'Rotation': ROTATION, 'Priority': PRIORITY}
+
+# Most tasks the per-task chart draws bars for; beyond that "Auto" shows a histogram
+TASK_CHART_BARS = 30
+
+# Per-task chart views: label -> (mode, ranking key, largest first)
+TASK_CHART_MODES = {
+    'Auto': ('auto', None, None),
+    'By task ID': ('pages', None, None),
+    'Most completed': ('top', 'done', True),
+    'Least completed': ('top', 'done', False),
+    'Highest skip rate': ('top', 'skip_rate', True),
+    'Lowest skip rate': ('top', 'skip_rate', False),
+    'Success rate histogram': ('histogram', None, None),
+}
+
+
+class RenderScheduler:
+    """Coalesces display updates into one redraw pass per idle period
+
+    Actions call invalidate() with the panels they made stale. The first
+    call schedules a pass with after_idle; further calls before it runs only
+    add to the dirty set, so a burst of actions (key repeat, bulk edits)
+    costs one redraw of each affected panel. ``requested`` counts invalidate
+    calls, ``performed`` the passes actually run and ``drawn`` the redraws
+    per panel.
+    """
+
+    def __init__(self, root, panels):
+        self.root = root
+        self.panels = panels  # Panel name -> redraw callable, in drawing order
+        self.dirty = set()
+        self.pending = None
+        self.requested = 0
+        self.performed = 0
+        self.drawn = dict.fromkeys(panels, 0)
+
+    def invalidate(self, *names):
+        """Mark panels (all if none given) stale and schedule a redraw pass"""
+        self.requested += 1
+        self.dirty.update(names or self.panels)
+        if self.pending is None:
+            self.pending = self.root.after_idle(self.flush)
+
+    def flush(self):
+        """Redraw the stale panels now"""
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+        dirty, self.dirty = self.dirty, set()
+        if not dirty:
+            return
+        self.performed += 1
+        for name, redraw in self.panels.items():
+            if name in dirty:
+                self.drawn[name] += 1
+                redraw()
+
+
+class TodoApp:
+    def __init__(self, root, core=None):
+        self.root = root
+        self.root.title("Advanced ToDo List Application")
+        self.root.geometry("1200x800")
+
+        # Actions and redraws are wrapped before any widget binds them; the
+        # wrappers only time calls while profiling is on (F12 or TODO_PROFILE)
+        self.profiler = Profiler()
+        self.profile_always = self.profiler.start_from_environment()
+        updates = [name for name in dir(self)
+                   if name.startswith('update_') and name not in UNPROFILED_UPDATES]
+        self.profiler.instrument(self, PROFILED_ACTIONS, 'action')
+        self.profiler.instrument(self, updates + ['render_task_rows', 'patch_stats_lines'], 'update')
+
+        # Task queue, statistics and persistence live in the GUI-free core
+        self.core = core if core is not None else TodoCore()
+
+        # Load saved data
+        if core is None:
+            self.core.load_data()
+
+        # Every action is saved by a worker thread, so the UI never waits on the disk
+        self.writer = self.core.write_in_background()
+        self.profiler.instrument(self.core, ('snapshot', 'search'), 'core', 'core.')
+        # Runs on the writer thread, so shows as its own track in the trace
+        self.profiler.instrument(self.writer.storage, ('append', 'flush', 'compact'), 'io', 'storage.')
+
+        # Create main frame
+        self.main_frame = ttk.Frame(root, padding="10")
+        self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # Configure grid weights
+        root.columnconfigure(0, weight=1)
+        root.rowconfigure(0, weight=1)
+        self.main_frame.columnconfigure(0, weight=1)
+        self.main_frame.columnconfigure(1, weight=1)
+        self.main_frame.rowconfigure(0, weight=1)
+        self.main_frame.rowconfigure(1, weight=1)
+
+        # Create four sections
+        self.create_task_section()
+        self.create_statistics_section()
+        self.create_daily_chart_section()
+        self.create_radar_chart_section()
+        self.create_status_bar()
+        self.profile_frame = None
+        self.profile_refresh = None  # Pending panel refresh, None while the panel is hidden
+        self.root.bind('<F12>', self.toggle_profile_panel)
+
+        # Save data when closing
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Redraws are batched; the queue is shown now, statistics and charts once
+        # the window is up (they read every task, which a binary data file
+        # decodes on first use)
+        self.renderer = RenderScheduler(root, {
+            QUEUE: self.update_task_display,
+            STATS: self.update_statistics_display,
+            DAILY_CHART: self.update_daily_chart,
+            TASK_CHART: self.update_individual_task_chart,
+        })
+        self.profiler.instrument(self.renderer, ('flush',), 'frame', 'renderer.')
+        self.update_task_display()
+        self.renderer.invalidate(STATS, DAILY_CHART, TASK_CHART)
+        self.root.after(REFRESH_INTERVAL, self.poll_external_changes)
+
+    @property
+    def tasks(self):
+        return self.core.tasks
+
+    @property
+    def statistics(self):
+        return self.core.statistics
+
+    def create_status_bar(self):
+        """Save status line below the four sections"""
+        self.save_status = tk.StringVar(value="All changes saved")
+        ttk.Label(self.root, textvariable=self.save_status, anchor=tk.W,
+                  padding=(10, 0, 10, 5)).grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.root.after(SAVE_STATUS_INTERVAL, self.update_save_status)
+
+    def create_task_section(self):
+        """First section: Task management"""
+        task_frame = ttk.LabelFrame(self.main_frame, text="Tasks Management", padding="10")
+        task_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
+        task_frame.columnconfigure(0, weight=1)
+
+        # Current task display
+        current_task_frame = ttk.Frame(task_frame)
+        current_task_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=5)
+        current_task_frame.columnconfigure(1, weight=1)
+
+        ttk.Label(current_task_frame, text="Current Task:").grid(row=0, column=0, sticky=tk.W)
+        self.current_task_var = tk.StringVar()
+        self.current_task_label = ttk.Label(current_task_frame, textvariable=self.current_task_var,
+                                          font=('Arial', 12, 'bold'))
+        self.current_task_label.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=10)
+
+        ttk.Label(current_task_frame, text="Order:").grid(row=0, column=2, sticky=tk.E)
+        self.schedule_var = tk.StringVar(value=next(
+            label for label, schedule in SCHEDULE_LABELS.items() if schedule == self.core.schedule))
+        schedule_box = ttk.Combobox(current_task_frame, textvariable=self.schedule_var,
+                                    values=list(SCHEDULE_LABELS), state='readonly', width=9)
+        schedule_box.grid(row=0, column=3, padx=2)
+        schedule_box.bind('<<ComboboxSelected>>', self.change_schedule)
+
+        # Task action buttons
+        action_frame = ttk.Frame(task_frame)
+        action_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=10)
+
+        self.done_btn = ttk.Button(action_frame, text="Done (Current)", command=self.mark_current_done)
+        self.done_btn.grid(row=0, column=0, padx=5)
+
+        self.skip_btn = ttk.Button(action_frame, text="Skip (Current)", command=self.mark_current_skip)
+        self.skip_btn.grid(row=0, column=1, padx=5)
+
+        # NEW: Buttons for selected task
+        self.done_selected_btn = ttk.Button(action_frame, text="Done (Selected)", command=self.mark_selected_done)
+        self.done_selected_btn.grid(row=0, column=2, padx=5)
+
+        self.skip_selected_btn = ttk.Button(action_frame, text="Skip (Selected)", command=self.mark_selected_skip)
+        self.skip_selected_btn.grid(row=0, column=3, padx=5)
+
+        # Search box; the list shows only matching tasks while it holds a query
+        filter_frame = ttk.Frame(task_frame)
+        filter_frame.grid(row=2, column=0, sticky=(tk.W, tk.E))
+        filter_frame.columnconfigure(1, weight=1)
+        ttk.Label(filter_frame, text="Filter:").grid(row=0, column=0, sticky=tk.W)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', self.on_filter_change)
+        self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var)
+        self.filter_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Button(filter_frame, text="Clear", command=self.clear_filter).grid(row=0, column=2, padx=2)
+        self.filter_caption = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.filter_caption).grid(row=0, column=3, sticky=tk.W, padx=5)
+        self.filter_ids = None  # Matching task IDs in queue order, None when not filtering
+        self.filter_query = ''
+
+        # Task list
+        list_frame = ttk.Frame(task_frame)
+        list_frame.grid(row=3, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+
+        # The listbox only ever holds the visible rows; the scrollbar pages
+        # through the whole queue (see render_task_rows)
+        self.task_listbox = tk.Listbox(list_frame, height=8, exportselection=False, selectmode=tk.EXTENDED)
+        self.task_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.view_top = 0
+        self.visible_rows = 8
+        self.row_texts = []
+        self.row_task_ids = []
+        self.selected_task_ids = set()
+        self.extend_selection = False
+
+        # Bind selection event to update button states
+        self.task_listbox.bind('<<ListboxSelect>>', self.on_task_select)
+        self.task_listbox.bind('<ButtonPress-1>', self.on_task_list_click)
+        self.task_listbox.bind('<Control-a>', self.select_all_tasks)
+        self.task_listbox.bind('<Configure>', self.on_task_list_resize)
+        self.task_listbox.bind('<MouseWheel>', self.on_task_list_wheel)
+        self.task_listbox.bind('<Button-4>', self.on_task_list_wheel)
+        self.task_listbox.bind('<Button-5>', self.on_task_list_wheel)
+
+        self.task_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.scroll_task_list)
+        self.task_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        # Management buttons
+        mgmt_frame = ttk.Frame(task_frame)
+        mgmt_frame.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=5)
+
+        ttk.Button(mgmt_frame, text="Add Task", command=self.add_task).grid(row=0, column=0, padx=2)
+        ttk.Button(mgmt_frame, text="Edit Task", command=self.edit_task).grid(row=0, column=1, padx=2)
+        ttk.Button(mgmt_frame, text="Delete Task", command=self.delete_task).grid(row=0, column=2, padx=2)
+        ttk.Button(mgmt_frame, text="Undo", command=self.undo).grid(row=0, column=3, padx=2)
+        ttk.Button(mgmt_frame, text="Redo", command=self.redo).grid(row=0, column=4, padx=2)
+        ttk.Button(mgmt_frame, text="Save Progress", command=self.save_data).grid(row=0, column=5, padx=2)
+        ttk.Button(mgmt_frame, text="Import...", command=self.import_tasks).grid(row=0, column=6, padx=2)
+        ttk.Button(mgmt_frame, text="Export...", command=self.export_tasks).grid(row=0, column=7, padx=2)
+        ttk.Button(mgmt_frame, text="Priority...", command=self.plan_task).grid(row=0, column=8, padx=2)
+
+        task_frame.rowconfigure(3, weight=1)
+
+    def create_statistics_section(self):
+        """Second section: Statistics"""
+        stats_frame = ttk.LabelFrame(self.main_frame, text="Statistics", padding="10")
+        stats_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
+
+        self.stats_text = tk.Text(stats_frame, height=15, width=30)
+        self.stats_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        stats_scrollbar = ttk.Scrollbar(stats_frame, orient=tk.VERTICAL, command=self.stats_text.yview)
+        stats_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.stats_text.config(yscrollcommand=stats_scrollbar.set)
+        self.stats_header = None  # Lines shown last time, see update_statistics_display
+        self.stats_footer = None
+        self.stats_ids = []
+
+        stats_frame.columnconfigure(0, weight=1)
+        stats_frame.rowconfigure(0, weight=1)
+
+    def create_daily_chart_section(self):
+        """Third section: 7-day chart (figure is created on first draw)"""
+        self.daily_chart_frame = ttk.LabelFrame(self.main_frame, text="7-Day Performance Chart", padding="10")
+        self.daily_chart_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
+        self.daily_chart_frame.columnconfigure(0, weight=1)
+        self.daily_chart_frame.rowconfigure(0, weight=1)
+        self.daily_chart = None
+
+    def create_radar_chart_section(self):
+        """Fourth section: Radar chart (figure is created on first draw)"""
+        self.radar_frame = ttk.LabelFrame(self.main_frame, text="Task Performance Radar", padding="10")
+        self.radar_frame.grid(row=1, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5, pady=5)
+        self.radar_frame.columnconfigure(0, weight=1)
+        self.radar_frame.rowconfigure(0, weight=1)
+        self.task_chart = None
+
+        # View controls: which tasks to show and paging through them by ID
+        controls = ttk.Frame(self.radar_frame)
+        controls.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        controls.columnconfigure(3, weight=1)
+
+        self.task_chart_mode = tk.StringVar(value='Auto')
+        mode_box = ttk.Combobox(controls, textvariable=self.task_chart_mode, values=list(TASK_CHART_MODES),
+                                state='readonly', width=22)
+        mode_box.grid(row=0, column=0, padx=2)
+        mode_box.bind('<<ComboboxSelected>>', lambda event: self.renderer.invalidate(TASK_CHART))
+
+        self.task_chart_page = 0
+        self.prev_page_btn = ttk.Button(controls, text="<", width=3, command=lambda: self.change_task_chart_page(-1))
+        self.prev_page_btn.grid(row=0, column=1, padx=2)
+        self.next_page_btn = ttk.Button(controls, text=">", width=3, command=lambda: self.change_task_chart_page(1))
+        self.next_page_btn.grid(row=0, column=2, padx=2)
+
+        self.task_chart_caption = tk.StringVar()
+        ttk.Label(controls, textvariable=self.task_chart_caption).grid(row=0, column=3, sticky=tk.W, padx=5)
+
+    def on_task_list_click(self, event):
+        """Remember whether Shift or Control was held, i.e. the click adds to the selection"""
+        self.extend_selection = bool(event.state & 0x0005)
+
+    def on_task_select(self, event):
+        """Handle task selection in listbox
+
+        Only the visible rows are in the listbox, so tasks selected further
+        up or down the queue are kept when the click extends the selection.
+        """
+        selected = {self.row_task_ids[row] for row in self.task_listbox.curselection()}
+        if self.extend_selection:
+            selected |= self.selected_task_ids - set(self.row_task_ids)
+        self.selected_task_ids = selected
+        self.update_selection_buttons()
+
+    def select_all_tasks(self, event=None):
+        """Select every task in the queue, or every match while filtering (Ctrl+A)"""
+        if self.filter_ids is not None:
+            self.selected_task_ids = set(self.filter_ids)
+        else:
+            self.selected_task_ids = {task['task_id'] for task in self.tasks}
+        self.task_listbox.selection_set(0, tk.END)
+        self.update_selection_buttons()
+        return 'break'
+
+    def update_selection_buttons(self):
+        state = 'normal' if self.selected_task_ids else 'disabled'
+        self.done_selected_btn.config(state=state)
+        self.skip_selected_btn.config(state=state)
+
+    def on_filter_change(self, *args):
+        """Show the tasks matching the filter box, from the top; redrawn once per keystroke burst"""
+        self.view_top = 0
+        self.renderer.invalidate(QUEUE)
+
+    def clear_filter(self):
+        self.filter_var.set('')
+
+    def on_task_list_resize(self, event):
+        """Show as many rows as fit in the listbox"""
+        row_height = tkfont.Font(font=self.task_listbox.cget('font')).metrics('linespace') + 1
+        rows = max(1, event.height // row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.render_task_rows()
+
+    def on_task_list_wheel(self, event):
+        """Scroll the virtual task list with the mouse wheel"""
+        direction = -1 if event.num == 4 or event.delta > 0 else 1
+        self.scroll_task_list('scroll', direction * 3, 'units')
+        return 'break'
+
+    def scroll_task_list(self, *args):
+        """Scrollbar command: move the window of rendered rows"""
+        if args[0] == 'moveto':
+            total = len(self.tasks) if self.filter_ids is None else len(self.filter_ids)
+            self.view_top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.view_top += int(args[1]) * step
+        self.render_task_rows()
+
+    def selected_index(self):
+        """Current queue position of the selected task when exactly one is selected, or None
+
+        The selection is kept as task IDs, so the right task is used even if
+        the queue order changed since the list was drawn or it scrolled away.
+        """
+        if len(self.selected_task_ids) != 1:
+            return None
+        task_id = next(iter(self.selected_task_ids))
+        if self.core.get_task(task_id) is None:
+            return None
+        return self.core.index_of(task_id)
+
+    def still_queued(self, task_id):
+        """Whether the task is still in the queue after a dialog, with a warning if not
+
+        Other instances' changes are merged while a dialog is open, so the
+        task may have moved (use its ID, not its old position) or been deleted.
+        """
+        if task_id in self.core.tasks:
+            return True
+        messagebox.showwarning("Warning", "The task was deleted in another window")
+        return False
+
+    def add_task(self):
+        """Add new task"""
+        task = simpledialog.askstring("Add Task", "Enter task description:")
+        if task:
+            # Shows the other instances' new tasks too, whose IDs the new task must not take
+            self.merge_external_changes()
+            self.core.add_task(task)
+            self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+
+    def edit_task(self):
+        """Edit selected task, or prefix the descriptions of several selected tasks"""
+        if len(self.selected_task_ids) > 1:
+            prefix = simpledialog.askstring(
+                "Edit Tasks", f"Enter a prefix for the {len(self.selected_task_ids)} selected tasks:")
+            if prefix:
+                self.core.prefix_tasks(self.selected_task_ids, prefix)
+                self.renderer.invalidate(QUEUE, STATS)
+            return
+
+        index = self.selected_index()
+        if index is None:
+            messagebox.showwarning("Warning", "Please select a task to edit")
+            return
+
+        task_id = self.tasks[index]['task_id']
+        current_desc = self.tasks[index]['description']
+        new_desc = simpledialog.askstring("Edit Task", "Enter new description:", initialvalue=current_desc)
+
+        if new_desc and self.still_queued(task_id):
+            self.core.edit_task(self.core.index_of(task_id), new_desc)
+            self.renderer.invalidate(QUEUE, STATS)
+
+    def plan_task(self):
+        """Set the priority and due day of the selected task(s)"""
+        if not self.selected_task_ids:
+            messagebox.showwarning("Warning", "Please select a task to prioritize")
+            return
+
+        # A single task starts from its current values
+        task = self.core.get_task(next(iter(self.selected_task_ids))) if len(self.selected_task_ids) == 1 else {}
+        priority = simpledialog.askinteger("Priority", "Priority (higher comes first):",
+                                           initialvalue=task.get('priority', 0))
+        if priority is None:
+            return
+        due = simpledialog.askstring("Priority", "Due day (YYYY-MM-DD, blank for none):",
+                                     initialvalue=task.get('due') or '')
+        if due is None:
+            return
+        try:
+            self.core.plan_tasks(self.selected_task_ids, priority, due.strip() or None)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.renderer.invalidate(QUEUE)
+
+    def change_schedule(self, event=None):
+        """Choose the current task by rotation or by priority"""
+        self.core.set_schedule(SCHEDULE_LABELS[self.schedule_var.get()])
+        self.renderer.invalidate(QUEUE)
+
+    def delete_task(self):
+        """Delete selected task(s)"""
+        if len(self.selected_task_ids) > 1:
+            if messagebox.askyesno("Confirm", f"Are you sure you want to delete these {len(self.selected_task_ids)} tasks?"):
+                self.core.delete_tasks(self.selected_task_ids)
+                self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+            return
+
+        index = self.selected_index()
+        if index is None:
+            messagebox.showwarning("Warning", "Please select a task to delete")
+            return
+
+        task_id = self.tasks[index]['task_id']
+        if messagebox.askyesno("Confirm", "Are you sure you want to delete this task?") and self.still_queued(task_id):
+            self.core.delete_task(self.core.index_of(task_id))
+            self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+
+    def mark_current_done(self):
+        """Mark the current task as done and move it to the end"""
+        if self.core.mark_done():
+            self.renderer.invalidate()
+
+    def mark_current_skip(self):
+        """Mark the current task as skipped and move it to the end"""
+        if self.core.mark_skip():
+            self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+
+    def mark_selected_done(self):
+        """Mark selected task(s) as done and move to end"""
+        if len(self.selected_task_ids) > 1:
+            self.core.mark_done_tasks(self.selected_task_ids)
+            self.renderer.invalidate()
+            return
+
+        index = self.selected_index()
+        if index is None:
+            messagebox.showwarning("Warning", "Please select a task to mark as done")
+            return
+
+        self.core.mark_done(index)
+        self.renderer.invalidate()
+
+    def mark_selected_skip(self):
+        """Mark selected task(s) as skipped and move to end"""
+        if len(self.selected_task_ids) > 1:
+            self.core.mark_skip_tasks(self.selected_task_ids)
+            self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+            return
+
+        index = self.selected_index()
+        if index is None:
+            messagebox.showwarning("Warning", "Please select a task to mark as skipped")
+            return
+
+        self.core.mark_skip(index)
+        self.renderer.invalidate(QUEUE, STATS, TASK_CHART)
+
+    # Keep the old methods for backward compatibility
+    def mark_done(self):
+        """Alias for mark_current_done"""
+        self.mark_current_done()
+
+    def mark_skip(self):
+        """Alias for mark_current_skip"""
+        self.mark_current_skip()
+
+    def undo(self):
+        """Undo last action"""
+        if self.core.undo():
+            self.renderer.invalidate()
+
+    def redo(self):
+        """Redo last undone action"""
+        if self.core.redo():
+            self.renderer.invalidate()
+
+    def update_displays(self):
+        """Schedule a redraw of all display elements"""
+        self.renderer.invalidate()
+
+    def update_charts(self):
+        """Update both charts"""
+        self.update_daily_chart()
+        self.update_individual_task_chart()
+
+    def update_task_display(self):
+        """Update task list and current task"""
+        # Update current task
+        current_task = self.core.current_task
+        if current_task:
+            task_id = current_task.get('task_id', 'Unknown')
+            completed = current_task.get('completed_count', 0)
+            header = f"{task_id} - {current_task['description']} (Done: {completed}){plan_label(current_task)}"
+            state = 'normal'
+        else:
+            header = "No tasks available"
+            state = 'disabled'
+        if header != self.current_task_var.get():
+            self.current_task_var.set(header)
+        self.done_btn.config(state=state)
+        self.skip_btn.config(state=state)
+
+        # Update task list
+        self.render_task_rows()
+
+    def format_task_row(self, task):
+        """Listbox text for one task"""
+        task_id = task.get('task_id', 'Unknown')
+        completed = task.get('completed_count', 0)
+        skipped = task.get('skipped_count', 0)
+        return f"{task_id}: {task['description']} (✓{completed}, ✗{skipped}){plan_label(task)}"
+
+    def render_task_rows(self):
+        """Show the visible window of the queue, touching only rows that changed
+
+        Only visible_rows tasks are formatted and inserted, so the cost does
+        not depend on the number of tasks. Rotating the current task to the
+        back is applied as one delete plus one insert, and the selection
+        follows the selected task ID rather than the row number. With a
+        query in the filter box the rows are the matching tasks, looked up
+        in the core's search index on every redraw.
+        """
+        query = self.filter_var.get()
+        self.filter_ids = self.core.search(query)
+        if query != self.filter_query:
+            # Actions on the selection only apply to tasks that can be seen
+            self.filter_query = query
+            if self.filter_ids is not None and self.selected_task_ids:
+                self.selected_task_ids &= set(self.filter_ids)
+        if self.filter_ids is None:
+            total = len(self.tasks)
+            self.filter_caption.set("")
+        else:
+            total = len(self.filter_ids)
+            self.filter_caption.set(f"{total} of {len(self.tasks)} tasks")
+        self.view_top = max(0, min(self.view_top, total - self.visible_rows))
+        if self.filter_ids is None:
+            tasks = list(self.tasks.iter_from(self.view_top, self.visible_rows))
+        else:
+            tasks = [self.core.get_task(task_id)
+                     for task_id in self.filter_ids[self.view_top:self.view_top + self.visible_rows]]
+        texts = [self.format_task_row(task) for task in tasks]
+        old_texts = self.row_texts
+
+        if texts != old_texts:
+            if len(texts) == len(old_texts) and texts[:-1] == old_texts[1:]:
+                # Everything moved up by one row
+                self.task_listbox.delete(0)
+                self.task_listbox.insert(tk.END, texts[-1])
+            else:
+                for row, text in enumerate(texts):
+                    if row >= len(old_texts):
+                        self.task_listbox.insert(tk.END, text)
+                    elif text != old_texts[row]:
+                        self.task_listbox.delete(row)
+                        self.task_listbox.insert(row, text)
+                if len(old_texts) > len(texts):
+                    self.task_listbox.delete(len(texts), tk.END)
+        self.row_texts = texts
+        self.row_task_ids = [task['task_id'] for task in tasks]
+
+        # Keep the selected tasks selected wherever they moved, forget deleted ones
+        self.task_listbox.selection_clear(0, tk.END)
+        if self.selected_task_ids:
+            self.selected_task_ids = {task_id for task_id in self.selected_task_ids if task_id in self.tasks}
+            for row, task_id in enumerate(self.row_task_ids):
+                if task_id in self.selected_task_ids:
+                    self.task_listbox.selection_set(row)
+
+        if total:
+            self.task_scrollbar.set(self.view_top / total, (self.view_top + len(tasks)) / total)
+        else:
+            self.task_scrollbar.set(0, 1)
+
+        # Update selected task button states
+        self.update_selection_buttons()
+
+    def update_statistics_display(self):
+        """Update statistics text, rewriting only the lines that changed
+
+        The text is a header, one line per task in task ID order and a
+        footer. Task lines are patched from the changes collected by
+        core.task_stats, so a done/skip rewrites one task line plus the few
+        summary lines whose numbers moved.
+        """
+        header = self.statistics_header()
+        footer = self.statistics_footer()
+        reloaded, changed = self.core.task_stats.take_changes()
+
+        if reloaded or self.stats_header is None:
+            self.stats_ids = list(self.core.task_stats.ids)
+            lines = header + [self.format_task_stats(task_id) for task_id in self.stats_ids] + footer
+            self.stats_text.delete(1.0, tk.END)
+            self.stats_text.insert(1.0, '\n'.join(lines) + '\n')
+        else:
+            self.patch_stats_lines(0, self.stats_header, header)
+            # Task lines start right after the header
+            rows = self.core.task_stats.rows
+            for task_id in sorted(changed):
+                index = bisect.bisect_left(self.stats_ids, task_id)
+                shown = index < len(self.stats_ids) and self.stats_ids[index] == task_id
+                line = len(header) + index + 1
+                if task_id not in rows:
+                    if shown:
+                        self.stats_text.delete(f"{line}.0", f"{line + 1}.0")
+                        del self.stats_ids[index]
+                elif shown:
+                    self.stats_text.delete(f"{line}.0", f"{line}.end")
+                    self.stats_text.insert(f"{line}.0", self.format_task_stats(task_id))
+                else:
+                    self.stats_text.insert(f"{line}.0", self.format_task_stats(task_id) + '\n')
+                    self.stats_ids.insert(index, task_id)
+            self.patch_stats_lines(len(header) + len(self.stats_ids), self.stats_footer, footer)
+
+        self.stats_header = header
+        self.stats_footer = footer
+
+    def patch_stats_lines(self, start, old_lines, new_lines):
+        """Rewrite the block of lines after line start that changed from old_lines to new_lines"""
+        if len(old_lines) != len(new_lines):
+            self.stats_text.delete(f"{start + 1}.0", f"{start + len(old_lines) + 1}.0")
+            self.stats_text.insert(f"{start + 1}.0", ''.join(line + '\n' for line in new_lines))
+            return
+        for offset, (old, new) in enumerate(zip(old_lines, new_lines)):
+            if old != new:
+                line = start + offset + 1
+                self.stats_text.delete(f"{line}.0", f"{line}.end")
+                self.stats_text.insert(f"{line}.0", new)
+
+    def statistics_header(self):
+        """Summary lines above the per-task counts"""
+        # Calculate averages
+        daily_avg = self.core.calculate_daily_average()
+        weekly_avg = self.core.calculate_weekly_average()
+        monthly_avg = self.core.calculate_monthly_average()
+
+        return [
+            "STATISTICS (Done Tasks Only)",
+            "",
+            f"Daily Average: {daily_avg:.2f} tasks/day",
+            f"Weekly Average: {weekly_avg:.2f} tasks/week",
+            f"Monthly Average: {monthly_avg:.2f} tasks/month",
+            "",
+            f"Total Completed: {self.statistics['total_done']}",
+            f"Total Skipped: {self.statistics['total_skipped']}",
+            "",
+            "INDIVIDUAL TASK COMPLETION COUNTS:"
+        ]
+
+    def format_task_stats(self, task_id):
+        """Statistics line for one task, from the cached per-task row"""
+        description, completed, skipped, rate = self.core.task_stats.rows[task_id]
+        return f"{task_id} ({description[:20]}...): {completed} done, {skipped} skip ({rate:.0f}% success)"
+
+    def statistics_footer(self):
+        """Recent days and months below the per-task counts"""
+        lines = ["", "Recent Daily Counts:"]
+
+        # Show last 7 days
+        for date, count in self.core.recent_days(7):
+            lines.append(f"{format_day(date, '%A')} ({format_day(date, '%Y-%m-%d')}): {count} tasks")
+
+        lines += ["", "Recent Months:"]
+
+        # Done/skip totals and skip rate of the last 3 months
+        for month, done, skipped in self.core.recent_months(3):
+            lines.append(f"{month}: {done} done, {skipped} skip ({skipped / (done + skipped) * 100:.0f}% skipped)")
+        return lines
+
+    def update_daily_chart(self):
+        """Update 7-day performance chart"""
+        if self.daily_chart is None:
+            self.daily_chart = load_plotting().DailyChart(self.daily_chart_frame)
+            self.profile_chart(self.daily_chart, 'daily_chart.')
+
+        days = []
+        counts = []
+
+        for date, count in reversed(self.core.recent_days(7)):  # Last 7 days
+            days.append(format_day(date, '%a'))
+            counts.append(count)
+
+        self.daily_chart.update(days, counts)
+
+    def change_task_chart_page(self, step):
+        """Show the previous/next page of tasks in the per-task chart"""
+        self.task_chart_page += step
+        self.renderer.invalidate(TASK_CHART)
+
+    def update_individual_task_chart(self):
+        """Update individual task completion chart (bar chart instead of radar)
+
+        At most TASK_CHART_BARS tasks get bars: a page of tasks in ID order,
+        or the top/bottom tasks of a ranking. "Auto" switches to a histogram
+        of success rates when there are more tasks than that.
+        """
+        if self.task_chart is None:
+            self.task_chart = load_plotting().TaskChart(self.radar_frame)
+            self.profile_chart(self.task_chart, 'task_chart.')
+
+        stats = self.core.task_stats
+        total = len(stats.ids)
+        label = self.task_chart_mode.get()
+        mode, key, largest = TASK_CHART_MODES.get(label, TASK_CHART_MODES['Auto'])
+        if mode == 'auto':
+            mode = 'pages' if total <= TASK_CHART_BARS else 'histogram'
+
+        paging = 'normal' if mode == 'pages' and total > TASK_CHART_BARS else 'disabled'
+        self.prev_page_btn.config(state=paging)
+        self.next_page_btn.config(state=paging)
+
+        if mode == 'histogram':
+            bins, counts = stats.rate_histogram()
+            self.task_chart.update_histogram(bins, counts)
+            self.task_chart_caption.set(f"{total} tasks")
+            return
+
+        if mode == 'pages':
+            # Tasks sorted by task_id for consistent order (A, B, C, D...)
+            pages = max(1, -(-total // TASK_CHART_BARS))
+            self.task_chart_page = max(0, min(self.task_chart_page, pages - 1))
+            start = self.task_chart_page * TASK_CHART_BARS
+            task_ids = stats.ids[start:start + TASK_CHART_BARS]
+            caption = f"Tasks {start + 1}-{start + len(task_ids)} of {total}" if task_ids else ""
+        else:
+            task_ids = stats.top(TASK_CHART_BARS, key, largest)
+            caption = f"{label}: {len(task_ids)} of {total} tasks"
+
+        completion_counts, skip_counts = stats.counts(task_ids)
+        self.task_chart.update(task_ids, completion_counts, skip_counts)
+        self.task_chart_caption.set(caption)
+
+    def profile_chart(self, chart, prefix):
+        """Time a chart's full and blitted draws, and the layout and rendering inside them"""
+        self.profiler.instrument(chart, ('redraw', 'blit'), 'chart', prefix)
+        self.profiler.instrument(chart.fig, ('tight_layout',), 'chart', prefix + 'fig.')
+        self.profiler.instrument(chart.canvas, ('draw',), 'chart', prefix + 'canvas.')
+
+    def toggle_profile_panel(self, event=None):
+        """Show or hide the performance panel below the status bar (F12)
+
+        Profiling runs while the panel is shown, or all the time when
+        started with TODO_PROFILE set.
+        """
+        if self.profile_frame is None:
+            self.create_profile_panel()
+        elif self.profile_refresh is not None:
+            self.root.after_cancel(self.profile_refresh)
+            self.profile_refresh = None
+            self.profile_frame.grid_remove()
+            if not self.profile_always:
+                self.profiler.stop()
+                self.profile_allocations.set(False)
+            return
+        else:
+            self.profile_frame.grid()
+        if not self.profiler.enabled:
+            self.profiler.start(self.profile_allocations.get())
+        self.refresh_profile_panel()
+
+    def create_profile_panel(self):
+        """Recent frame and action times and the slowest methods, with trace export"""
+        self.profile_frame = ttk.LabelFrame(self.root, text="Performance (F12 to hide)", padding="5")
+        self.profile_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), padx=10, pady=(0, 5))
+        self.profile_frame.columnconfigure(0, weight=1)
+
+        self.profile_text = tk.Text(self.profile_frame, height=14, font=('Courier', 9), state='disabled')
+        self.profile_text.grid(row=0, column=0, columnspan=4, sticky=(tk.W, tk.E))
+
+        self.profile_allocations = tk.BooleanVar(value=self.profiler.allocations)
+        ttk.Checkbutton(self.profile_frame, text="Track allocations", variable=self.profile_allocations,
+                        command=lambda: self.profiler.track_allocations(self.profile_allocations.get())
+                        ).grid(row=1, column=1, padx=2, pady=(5, 0))
+        ttk.Button(self.profile_frame, text="Reset", command=self.profiler.reset).grid(
+            row=1, column=2, padx=2, pady=(5, 0))
+        ttk.Button(self.profile_frame, text="Export Trace...", command=self.export_trace).grid(
+            row=1, column=3, padx=2, pady=(5, 0))
+
+    def refresh_profile_panel(self):
+        """Redraw the panel text, every PROFILE_PANEL_INTERVAL while the panel is shown"""
+        lines = []
+        frames = [ms for name, ms in self.profiler.recent_spans('frame')]
+        if frames:
+            lines.append(f"Frames: last {frames[-1]:.1f} ms, mean {sum(frames) / len(frames):.1f} ms, "
+                         f"max {max(frames):.1f} ms over {len(frames)}")
+            lines.append("  " + " ".join(f"{ms:.1f}" for ms in frames[-16:]))
+        else:
+            lines.append("Frames: none yet")
+
+        lines.append("Recent actions:")
+        for name, ms in reversed(self.profiler.recent_spans('action')[-3:]):
+            lines.append(f"  {name:<32}{ms:9.1f} ms")
+
+        lines.append(f"  {'Slowest (total)':<32}{'calls':>7}{'total ms':>10}{'mean':>8}{'max':>8}{'net KB':>9}")
+        for name, calls, total, mean, longest, allocated in self.profiler.summary()[:6]:
+            lines.append(f"  {name:<32}{calls:>7}{total:>10.1f}{mean:>8.2f}{longest:>8.1f}{allocated:>9.1f}")
+
+        self.profile_text.config(state='normal')
+        self.profile_text.delete('1.0', tk.END)
+        self.profile_text.insert('1.0', "\n".join(lines))
+        self.profile_text.config(state='disabled')
+        self.profile_refresh = self.root.after(PROFILE_PANEL_INTERVAL, self.refresh_profile_panel)
+
+    def export_trace(self):
+        """Write the recorded spans as a Chrome trace for chrome://tracing or Perfetto"""
+        path = filedialog.asksaveasfilename(title="Export Trace", filetypes=[("Chrome trace", "*.json")],
+                                            defaultextension='.json')
+        if not path:
+            return
+        try:
+            count = self.profiler.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export trace: {str(e)}")
+            return
+        messagebox.showinfo("Success", f"Exported {count} spans to {path}")
+
+    def save_data(self):
+        """Write pending changes to disk now instead of after the autosave delay"""
+        self.writer.sync()
+        self.save_status.set("Saving...")
+
+    def update_save_status(self):
+        """Show what the background writer is doing, checked every SAVE_STATUS_INTERVAL"""
+        pending, saved_at, error = self.writer.status()
+        if error is not None:
+            status = f"Save failed: {error}"
+        elif pending:
+            status = "Saving..."
+        elif saved_at is not None:
+            status = f"All changes saved at {saved_at:%H:%M:%S}"
+        else:
+            status = "All changes saved"
+        if status != self.save_status.get():
+            self.save_status.set(status)
+        self.root.after(SAVE_STATUS_INTERVAL, self.update_save_status)
+
+    def merge_external_changes(self):
+        """Apply what other instances saved to the data file and redraw if anything changed"""
+        if self.core.refresh():
+            self.renderer.invalidate()
+
+    def poll_external_changes(self):
+        """merge_external_changes every REFRESH_INTERVAL"""
+        self.merge_external_changes()
+        self.root.after(REFRESH_INTERVAL, self.poll_external_changes)
+
+    def import_tasks(self):
+        """Append the tasks and history of a CSV or JSON Lines file"""
+        path = filedialog.askopenfilename(title="Import Tasks", filetypes=TRANSFER_FILETYPES)
+        if path:
+            self.run_transfer("Import", todo_io.import_file(self.core, path),
+                              lambda count: f"Imported {count} tasks")
+
+    def export_tasks(self):
+        """Write all tasks and their history to a CSV or JSON Lines file"""
+        path = filedialog.asksaveasfilename(title="Export Tasks", filetypes=TRANSFER_FILETYPES,
+                                            defaultextension='.csv')
+        if path:
+            self.run_transfer("Export", todo_io.export_file(self.core, path),
+                              lambda count: f"Exported {count} rows to {path}")
+
+    def run_transfer(self, title, steps, summary):
+        """Run an import/export generator one chunk per event loop turn, with a progress bar
+
+        The dialog grabs input, so no action changes the queue halfway
+        through, while the window keeps redrawing between chunks.
+        """
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.transient(self.root)
+        status = tk.StringVar(value=f"{title} in progress...")
+        ttk.Label(dialog, textvariable=status, padding="10").grid(row=0, column=0, sticky=tk.W)
+        progress = ttk.Progressbar(dialog, length=300, maximum=1.0)
+        progress.grid(row=1, column=0, padx=10, pady=(0, 10))
+        dialog.grab_set()
+        count = 0
+
+        def step():
+            nonlocal count
+            try:
+                count, fraction = next(steps)
+            except StopIteration:
+                dialog.destroy()
+                self.renderer.invalidate()
+                messagebox.showinfo("Success", summary(count))
+                return
+            except (OSError, ValueError) as e:
+                dialog.destroy()
+                self.renderer.invalidate()
+                messagebox.showerror("Error", f"{title} failed: {str(e)}")
+                return
+            progress['value'] = fraction
+            status.set(f"{title} in progress... {fraction:.0%}")
+            self.root.after(1, step)
+
+        self.root.after(1, step)
+
+    def load_data(self):
+        """Load data from file"""
+        self.core.load_data()
+
+    def on_closing(self):
+        """Handle application closing"""
+        # Writes what the background writer still has queued, then a final snapshot
+        try:
+            self.core.close()
+        except Exception as e:
+            print(f"Failed to save data: {str(e)}")
+        self.root.destroy()
+
+def main():
+    # Optional data file argument; a .db file uses the SQLite backend, todo://host:port a todo_sync server
+    data_file = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    core = TodoCore(data_file)
+    core.load_data()
+
+    root = tk.Tk()
+    app = TodoApp(root, core)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""matplotlib charts for the ToDo app.
+
+This module is imported on the first chart draw (see todo.load_plotting),
+so matplotlib and numpy stay out of the startup path.
+"""
+import tkinter as tk
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+
+def headroom_limit(max_value, current=None):
+    """Upper y limit leaving room for value labels
+
+    Limits step through 2, 5, 10, 20, 50, ... with at least half the data
+    again above it, and only change when the data outgrows the limit or
+    shrinks to less than a third of it, so most updates keep the same axis
+    range and a change of range is rare.
+    """
+    needed = max_value + 1
+    if current is not None and needed <= current and needed * 3 > current:
+        return current
+    target = needed * 1.5
+    scale = 1
+    while True:
+        for step in (2, 5, 10):
+            if step * scale >= target:
+                return step * scale
+        scale *= 10
+
+
+def pixel_box(extent):
+    """extent padded by 2 pixels and grown to whole pixels
+
+    Regions made of these share no pixel unless they overlap, and the
+    restored area and the clip boxes line up exactly.
+    """
+    extent = extent.padded(2)
+    return Bbox.from_extents(*np.floor(extent.p0), *np.ceil(extent.p1))
+
+
+def merge_boxes(boxes):
+    """Union of the boxes as a list of boxes that do not overlap"""
+    merged = []
+    for box in boxes:
+        overlapping = [other for other in merged if other.overlaps(box)]
+        while overlapping:
+            merged = [other for other in merged if other not in overlapping]
+            box = Bbox.union([box] + overlapping)
+            overlapping = [other for other in merged if other.overlaps(box)]
+        merged.append(box)
+    return merged
+
+
+class BlitChart:
+    """Figure in a Tk frame that redraws only its changing artists
+
+    Static parts (axes, ticks, titles) are rendered by a full draw, which
+    also captures the background. Artists registered with ``animate`` are
+    left out of the full draw and drawn on top of the saved background.
+    ``blit(changed)`` restores the background only under the changed
+    artists and redraws just the animated artists in that region, so a bar
+    height change neither re-renders the figure nor runs ``tight_layout``.
+    """
+
+    def __init__(self, master, **subplot_kw):
+        self.fig = Figure(figsize=(6, 3))
+        self.ax = self.fig.add_subplot(**subplot_kw)
+        self.canvas = FigureCanvasTkAgg(self.fig, master)
+        self.canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.animated = []
+        self.extents = {}  # Last drawn window extent of each visible animated artist
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def animate(self, *artists):
+        """Exclude artists from full draws and redraw them on blit"""
+        for artist in artists:
+            artist.set_animated(True)
+            self.animated.append(artist)
+
+    def reset(self):
+        """Clear the axes before rebuilding all artists"""
+        self.ax.clear()
+        self.animated = []
+        self.extents = {}
+
+    def on_draw(self, event):
+        """After a full draw (including resizes) save the background"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        renderer = self.canvas.get_renderer()
+        for artist in self.animated:
+            self.fig.draw_artist(artist)
+            if artist.get_visible():
+                self.extents[artist] = artist.get_window_extent(renderer)
+
+    def redraw(self, relayout=False):
+        """Full draw, optionally recomputing the layout first"""
+        if relayout:
+            self.fig.tight_layout()
+        self.canvas.draw()
+
+    def rescale(self, ylim, old_ylim):
+        """Full draw with a new y limit, keeping the artists
+
+        The layout is only recomputed when the tick labels got wider.
+        """
+        self.ax.set_ylim(0, ylim)
+        self.redraw(relayout=len(str(int(ylim))) != len(str(int(old_ylim))))
+
+    def draw_clipped(self, artist, region):
+        """Draw an unchanged artist only inside region, where the background was restored"""
+        clip_box, clip_on = artist.get_clip_box(), artist.get_clip_on()
+        if clip_on and clip_box is not None:
+            # Still clipped to the axes, as in a full draw
+            region = Bbox.intersection(region, clip_box)
+            if region is None:
+                return
+        artist.set_clip_box(region)
+        artist.set_clip_on(True)
+        self.fig.draw_artist(artist)
+        artist.set_clip_box(clip_box)
+        artist.set_clip_on(clip_on)
+
+    def blit(self, changed):
+        """Redraw the changed animated artists over the saved background
+
+        Only the area covered by their old and new extents is restored, as
+        separate regions where those do not overlap (a bar and a line
+        across the chart are two strips, not the rectangle around both);
+        other animated artists overlapping a region, text included, are
+        redrawn clipped to it. Keep legends static: they draw their parts
+        without the clip box.
+        """
+        if self.background is None:
+            self.redraw()
+            return
+        renderer = self.canvas.get_renderer()
+        changed = set(changed)
+        new_extents = {artist: artist.get_window_extent(renderer)
+                       for artist in changed if artist.get_visible()}
+        boxes = {}
+        for artist in changed:
+            extents = [extent for extent in (self.extents.get(artist), new_extents.get(artist)) if extent is not None]
+            if extents:
+                boxes[artist] = pixel_box(Bbox.union(extents))
+        regions = merge_boxes(boxes.values())
+
+        # The saved background uses a top-left origin, window extents a bottom-left
+        # one, and restore_region takes the last row and column inclusive
+        height = self.fig.bbox.height
+        for region in regions:
+            clipped = Bbox.intersection(region, self.fig.bbox)
+            if clipped is None:
+                continue
+            x0, y0, x1, y1 = clipped.extents
+            self.canvas.restore_region(self.background, bbox=(x0, height - y1, x1 - 1, height - y0 - 1), xy=(0, 0))
+            for artist in self.animated:
+                if artist in boxes and boxes[artist].overlaps(region):
+                    self.fig.draw_artist(artist)
+                elif artist in self.extents and self.extents[artist].overlaps(clipped):
+                    self.draw_clipped(artist, clipped)
+            self.canvas.blit(clipped)
+        for artist in changed:
+            if artist in new_extents:
+                self.extents[artist] = new_extents[artist]
+            else:
+                self.extents.pop(artist, None)
+
+
+class DailyChart(BlitChart):
+    """7-day completion bars with value labels and an average line
+
+    The legend and titles are static; the average's value is a small
+    label on its line, so a done redraws the bars, their labels and the
+    line but never the legend.
+    """
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.days = None
+        self.ylim = None
+
+    def update(self, days, counts):
+        """Show counts for the day names in days (oldest first)"""
+        max_count = max(counts)
+        min_count = min(counts)
+        avg_count = sum(counts) / len(counts)
+
+        colors = []
+        for count in counts:
+            if count == max_count and max_count > 0:
+                colors.append('green')
+            elif count == min_count:
+                colors.append('red')
+            else:
+                colors.append('blue')
+
+        ylim = headroom_limit(max_count, self.ylim)
+        if days != self.days:
+            self.build(days, counts, colors, avg_count, ylim)
+            return
+
+        changed = []
+        for i, (count, color) in enumerate(zip(counts, colors)):
+            if count != self.counts[i] or color != self.colors[i]:
+                bar, label = self.bars[i], self.labels[i]
+                bar.set_height(count)
+                bar.set_color(color)
+                label.set_y(count + 0.1)
+                label.set_text(f'{int(count)}')
+                changed += [bar, label]
+        if avg_count != self.avg_count:
+            self.avg_line.set_ydata([avg_count, avg_count])
+            self.avg_label.set_y(avg_count)
+            self.avg_label.set_text(f'{avg_count:.1f}')
+            changed += [self.avg_line, self.avg_label]
+        self.counts, self.colors, self.avg_count = counts, colors, avg_count
+        if ylim != self.ylim:
+            self.rescale(ylim, self.ylim)
+            self.ylim = ylim
+        elif changed:
+            self.blit(changed)
+
+    def build(self, days, counts, colors, avg_count, ylim):
+        self.reset()
+        self.days = days
+        self.ylim = ylim
+        self.counts, self.colors, self.avg_count = counts, colors, avg_count
+
+        self.bars = self.ax.bar(days, counts, color=colors)
+        self.avg_line = self.ax.axhline(y=avg_count, color='blue', linestyle='--', alpha=0.7,
+                                        label='7-day average')
+        # x in axes coordinates, y in data coordinates: rides on the line's left end
+        self.avg_label = self.ax.text(0.01, avg_count, f'{avg_count:.1f}', transform=self.ax.get_yaxis_transform(),
+                                      ha='left', va='bottom', fontsize=8, color='blue')
+
+        self.ax.set_title('7-Day Task Completion')
+        self.ax.set_ylabel('Tasks Completed')
+        self.ax.set_ylim(0, ylim)
+        # A fixed location keeps the legend still while the average changes
+        self.legend = self.ax.legend(loc='upper left')
+
+        # Add value labels on bars
+        self.labels = []
+        for bar, count in zip(self.bars, counts):
+            self.labels.append(self.ax.text(bar.get_x() + bar.get_width()/2., count + 0.1,
+                                            f'{int(count)}', ha='center', va='bottom'))
+
+        self.animate(*self.bars, *self.labels, self.avg_line, self.avg_label)
+        self.redraw(relayout=True)
+
+
+class TaskChart(BlitChart):
+    """Per-task completed/skipped bars (shown in the radar section)
+
+    Shows at most a page of tasks; with many tasks the app either picks
+    which tasks to show or switches to a histogram of success rates
+    (update_histogram), so drawing cost does not grow with the task count.
+    """
+
+    width = 0.35
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.task_ids = None
+        self.bins = None
+        self.ylim = None
+
+    def update(self, task_ids, completion_counts, skip_counts):
+        """Show counts for task_ids (already in display order)"""
+        if not task_ids:
+            if self.task_ids != []:
+                self.reset()
+                self.task_ids = []
+                self.bins = None
+                self.ax.text(0.5, 0.5, 'No tasks available', transform=self.ax.transAxes,
+                             ha='center', va='center')
+                self.redraw()
+            return
+
+        done = np.asarray(completion_counts)
+        skipped = np.asarray(skip_counts)
+        ylim = headroom_limit(max(done.max(), skipped.max()), self.ylim)
+        if task_ids != self.task_ids:
+            self.build(task_ids, done, skipped, ylim)
+            return
+
+        # Only touch the bars whose counts changed
+        changed = []
+        for counts, old_counts, bars, labels in ((done, self.done, self.done_bars, self.done_labels),
+                                                 (skipped, self.skipped, self.skip_bars, self.skip_labels)):
+            for i in np.flatnonzero(counts != old_counts):
+                height = counts[i]
+                bars[i].set_height(height)
+                labels[i].set_y(height + 0.1)
+                labels[i].set_text(f'{int(height)}')
+                labels[i].set_visible(height > 0)
+                changed += [bars[i], labels[i]]
+        self.done, self.skipped = done, skipped
+        if ylim != self.ylim:
+            self.rescale(ylim, self.ylim)
+            self.ylim = ylim
+        elif changed:
+            self.blit(changed)
+
+    def build(self, task_ids, done, skipped, ylim):
+        self.reset()
+        self.task_ids = task_ids
+        self.bins = None
+        self.ylim = ylim
+        self.done, self.skipped = done, skipped
+
+        x = np.arange(len(task_ids))
+        width = self.width
+
+        # Create bars
+        self.done_bars = self.ax.bar(x - width/2, done, width,
+                                     label='Completed', color='green', alpha=0.7)
+        self.skip_bars = self.ax.bar(x + width/2, skipped, width,
+                                     label='Skipped', color='red', alpha=0.7)
+
+        # Add value labels on bars (hidden while the count is 0)
+        self.done_labels = []
+        self.skip_labels = []
+        for bars, labels in ((self.done_bars, self.done_labels), (self.skip_bars, self.skip_labels)):
+            for bar in bars:
+                height = bar.get_height()
+                labels.append(self.ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                                           f'{int(height)}', ha='center', va='bottom', fontsize=9,
+                                           visible=height > 0))
+
+        self.ax.set_xlabel('Tasks')
+        self.ax.set_ylabel('Count')
+        self.ax.set_title('Individual Task Completion Counts')
+        self.ax.set_xticks(x)
+        if len(task_ids) > 12:
+            self.ax.set_xticklabels(task_ids, rotation=45, ha='right', fontsize=8)
+        else:
+            self.ax.set_xticklabels(task_ids)
+        self.ax.legend()
+        self.ax.grid(axis='y', alpha=0.3)
+
+        # Set y-axis to start from 0
+        self.ax.set_ylim(0, ylim)
+
+        self.animate(*self.done_bars, *self.skip_bars, *self.done_labels, *self.skip_labels)
+        self.redraw(relayout=True)
+
+    def update_histogram(self, bins, counts):
+        """Show how many tasks fall in each success-rate bin"""
+        counts = np.asarray(counts)
+        ylim = headroom_limit(counts.max(), self.ylim)
+        if bins != self.bins:
+            self.build_histogram(bins, counts, ylim)
+            return
+
+        changed = []
+        for i in np.flatnonzero(counts != self.bin_counts):
+            self.bin_bars[i].set_height(counts[i])
+            self.bin_labels[i].set_y(counts[i] + 0.1)
+            self.bin_labels[i].set_text(f'{int(counts[i])}')
+            self.bin_labels[i].set_visible(counts[i] > 0)
+            changed += [self.bin_bars[i], self.bin_labels[i]]
+        self.bin_counts = counts
+        if ylim != self.ylim:
+            self.rescale(ylim, self.ylim)
+            self.ylim = ylim
+        elif changed:
+            self.blit(changed)
+
+    def build_histogram(self, bins, counts, ylim):
+        self.reset()
+        self.task_ids = None
+        self.bins = bins
+        self.bin_counts = counts
+        self.ylim = ylim
+
+        self.bin_bars = self.ax.bar(bins, counts, color='green', alpha=0.7)
+        self.bin_bars[-1].set_color('gray')  # Tasks never done or skipped
+        self.bin_labels = [self.ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 0.1,
+                                        f'{int(bar.get_height())}', ha='center', va='bottom', fontsize=9,
+                                        visible=bar.get_height() > 0)
+                           for bar in self.bin_bars]
+
+        self.ax.set_xlabel('Success rate')
+        self.ax.set_ylabel('Tasks')
+        self.ax.set_title('Tasks by Success Rate')
+        self.ax.tick_params(axis='x', labelsize=8)
+        self.ax.grid(axis='y', alpha=0.3)
+        self.ax.set_ylim(0, ylim)
+
+        self.animate(*self.bin_bars, *self.bin_labels)
+        self.redraw(relayout=True)
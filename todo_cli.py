@@ -0,0 +1,246 @@
+"""Command-line interface for the ToDo app
+
+Works on the same data file as the GUI through ``todo_core.TodoCore`` and
+never imports tkinter or matplotlib, so it can be used from scripts and
+cron jobs:
+
+    python todo_cli.py add Water the plants
+    python todo_cli.py done            # current task
+    python todo_cli.py skip B Task7    # several tasks, one undo step
+    python todo_cli.py list
+    python todo_cli.py --data todo_data.db stats
+    python todo_cli.py import tasks.csv
+    python todo_cli.py plan B --priority 2 --due 2024-01-05
+    python todo_cli.py --schedule priority done
+    python todo_cli.py --data todo://127.0.0.1:8765 list   # see todo_sync
+
+``add -``, ``done -`` and ``skip -`` read one description or task ID per
+line from stdin, and ``-`` alone reads one command per line, so bulk input
+is applied in a single process with one write at the end. Actions made
+here can be undone from the next session (CLI or GUI) until the journal is
+compacted into the data file.
+"""
+import argparse
+import json
+import os
+import shlex
+import sys
+
+import todo_io
+from todo_core import DATA_FILE, TodoCore
+from todo_schedule import ROTATION, SCHEDULES, plan_label
+from todo_stats import format_day
+from todo_task import json_default
+
+
+class CommandError(Exception):
+    """A command that cannot be carried out (unknown task, nothing to undo, ...)"""
+
+
+def format_task(task):
+    """One line per task, like the GUI task list"""
+    return (f"{task['task_id']}: {task['description']} (✓{task['completed_count']}, ✗{task['skipped_count']})"
+            f"{plan_label(task)}")
+
+
+def read_lines(stream):
+    """Non-blank lines of stream, stripped"""
+    return [line.strip() for line in stream if line.strip()]
+
+
+def cmd_add(core, args, out):
+    descriptions = read_lines(sys.stdin) if args.words == ['-'] else [' '.join(args.words)]
+    for description in descriptions:
+        task = core.add_task(description)
+        print(f"Added {format_task(task)}", file=out)
+
+
+def mark_tasks(core, task_ids, outcome, out):
+    """Mark the current task, or the given tasks as one action"""
+    if task_ids == ['-']:
+        task_ids = read_lines(sys.stdin)
+    if not task_ids:
+        if core.current_task is None:
+            raise CommandError("No tasks in the queue")
+        task = core.mark_done() if outcome == 'done' else core.mark_skip()
+        print(f"{outcome.capitalize()}: {format_task(task)}", file=out)
+        return
+
+    missing = [task_id for task_id in task_ids if core.get_task(task_id) is None]
+    if missing:
+        raise CommandError(f"Unknown task ID: {', '.join(missing)}")
+    if outcome == 'done':
+        count = core.mark_done_tasks(task_ids)
+    else:
+        count = core.mark_skip_tasks(task_ids)
+    print(f"{outcome.capitalize()}: {count} tasks", file=out)
+
+
+def cmd_done(core, args, out):
+    mark_tasks(core, args.task_ids, 'done', out)
+
+
+def cmd_skip(core, args, out):
+    mark_tasks(core, args.task_ids, 'skip', out)
+
+
+def cmd_list(core, args, out):
+    for task in core.scheduled_tasks():
+        print(format_task(task), file=out)
+
+
+def cmd_plan(core, args, out):
+    missing = [task_id for task_id in args.task_ids if core.get_task(task_id) is None]
+    if missing:
+        raise CommandError(f"Unknown task ID: {', '.join(missing)}")
+    due = None if args.due == 'none' else args.due
+    try:
+        count = core.plan_tasks(args.task_ids, args.priority, due)
+    except ValueError as e:
+        raise CommandError(str(e))
+    print(f"Planned: {count} tasks", file=out)
+
+
+def cmd_undo(core, args, out):
+    for undone in range(args.count):
+        if not core.undo():
+            if undone == 0:
+                raise CommandError("Nothing to undo")
+            break
+        print("Undone", file=out)
+
+
+def cmd_stats(core, args, out):
+    statistics = core.statistics
+    lines = [
+        f"Tasks: {len(core.tasks)}",
+        f"Daily Average: {core.calculate_daily_average():.2f} tasks/day",
+        f"Weekly Average: {core.calculate_weekly_average():.2f} tasks/week",
+        f"Monthly Average: {core.calculate_monthly_average():.2f} tasks/month",
+        f"Total Completed: {statistics['total_done']}",
+        f"Total Skipped: {statistics['total_skipped']}",
+        "",
+        "Recent Daily Counts:"
+    ]
+    for date, count in core.recent_days(7):
+        lines.append(f"{format_day(date, '%A')} ({format_day(date, '%Y-%m-%d')}): {count} tasks")
+    print('\n'.join(lines), file=out)
+
+
+def cmd_export(core, args, out):
+    if os.path.splitext(args.file)[1].lower() in todo_io.FORMATS:
+        try:
+            rows, _ = todo_io.run(todo_io.export_file(core, args.file))
+        except OSError as e:
+            raise CommandError(f"Export failed: {e}")
+        print(f"Exported {len(core.tasks)} tasks and {rows - len(core.tasks)} events to {args.file}", file=out)
+        return
+    data = core.snapshot()
+    if args.file == '-':
+        json.dump(data, out, indent=2, default=json_default)
+        print(file=out)
+    else:
+        with open(args.file, 'w') as f:
+            json.dump(data, f, indent=2, default=json_default)
+        print(f"Exported {len(data['tasks'])} tasks to {args.file}", file=out)
+
+
+def cmd_import(core, args, out):
+    try:
+        imported, _ = todo_io.run(todo_io.import_file(core, args.file))
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Import failed: {e}")
+    print(f"Imported {imported} tasks from {args.file}", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='todo', description="ToDo list from the command line")
+    parser.add_argument('--data', default=DATA_FILE,
+                        help="data file (a .db file uses the SQLite backend), or todo://host:port of a "
+                             "todo_sync server")
+    parser.add_argument('--schedule', choices=SCHEDULES, default=ROTATION,
+                        help="how the current task is chosen: the front of the queue (default) "
+                             "or by priority, due day and skips")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    add = commands.add_parser('add', help="add a task ('-' reads one description per line from stdin)")
+    add.add_argument('words', nargs='+')
+    add.set_defaults(run=cmd_add)
+
+    for name, run, verb in (('done', cmd_done, 'mark done'), ('skip', cmd_skip, 'skip')):
+        command = commands.add_parser(
+            name, help=f"{verb} the current task, or the given task IDs ('-' reads them from stdin)")
+        command.add_argument('task_ids', nargs='*')
+        command.set_defaults(run=run)
+
+    commands.add_parser('list', help="show the queue, current task first").set_defaults(run=cmd_list)
+
+    plan = commands.add_parser('plan', help="set the priority and due day of tasks")
+    plan.add_argument('task_ids', nargs='+')
+    plan.add_argument('--priority', type=int, default=0, help="higher comes first (default 0)")
+    plan.add_argument('--due', default='none', help="due day as YYYY-MM-DD, or none (default)")
+    plan.set_defaults(run=cmd_plan)
+
+    undo = commands.add_parser('undo', help="undo the last actions")
+    undo.add_argument('count', nargs='?', type=int, default=1)
+    undo.set_defaults(run=cmd_undo)
+
+    commands.add_parser('stats', help="show averages and recent days").set_defaults(run=cmd_stats)
+
+    export = commands.add_parser(
+        'export', help="write the data as JSON ('-' for stdout), or stream it to a .csv or .jsonl file")
+    export.add_argument('file', nargs='?', default='-')
+    export.set_defaults(run=cmd_export)
+
+    import_ = commands.add_parser('import', help="append the tasks and history of a .csv or .jsonl file")
+    import_.add_argument('file')
+    import_.set_defaults(run=cmd_import)
+
+    commands.add_parser('-', help="read one command per line from stdin, on the --data and --schedule given before it")
+    return parser
+
+
+def parse_script(parser, lines):
+    """Parse one command per line, exit with a usage error before anything runs
+
+    Every line runs on the data file and schedule given before '-', so a
+    line setting its own is an error rather than silently ignored.
+    """
+    commands = []
+    for line in lines:
+        # Without defaults for them, the options are only set when the line gives them
+        args = parser.parse_args(shlex.split(line), argparse.Namespace(data=None, schedule=None))
+        if args.data is not None or args.schedule is not None:
+            parser.error(f"--data and --schedule go before '-', not on its lines: {line}")
+        if args.command == '-' or getattr(args, 'words', getattr(args, 'task_ids', None)) == ['-']:
+            parser.error(f"stdin input cannot be nested: {line}")
+        commands.append(args)
+    return commands
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    commands = [args]
+    if args.command == '-':
+        commands = parse_script(parser, read_lines(sys.stdin))
+
+    core = TodoCore(args.data, schedule=args.schedule)
+    core.load_data()
+    try:
+        for command in commands:
+            command.run(core, command, out)
+    except CommandError as e:
+        print(f"todo: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # Keep the journal (no compaction), so the actions stay undoable
+        core.save_data()
+        core.storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,845 @@
+import os
+import weakref
+from datetime import datetime
+from todo_history import HISTORY_LIMIT, UndoLog
+from todo_queue import TaskIdAllocator, TaskQueue
+from todo_schedule import PRIORITY, ROTATION, SCHEDULES, PriorityScheduler
+from todo_search import SearchIndex
+from todo_stats import (DailyCounts, EventLog, TaskStats, day_date, day_ordinal, day_timestamp, timestamp,
+                        timestamp_day, week_key)
+from todo_storage import AUTOSAVE_DELAY, BackgroundWriter, open_storage
+from todo_task import FrozenTasks, Task
+
+# Set data file path relative to script location
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(BASE_DIR, 'todo_data.json')
+
+
+def empty_statistics():
+    """Return a fresh statistics structure"""
+    return {
+        'daily': {},
+        'weekly': {},
+        'monthly': {},
+        'total_done': 0,
+        'total_skipped': 0
+    }
+
+
+def plan_of(task):
+    """(priority, due day) of a task"""
+    return (task.get('priority', 0), task.get('due'))
+
+
+def checked_plan(priority, due):
+    """(priority, due) after checking them, ValueError for a non-integer priority or bad day"""
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError(f"Priority must be a whole number, not {priority!r}")
+    if due:
+        try:
+            due = day_date(day_ordinal(str(due))).isoformat()
+        except ValueError:
+            raise ValueError(f"Due day must be a YYYY-MM-DD date, not {due!r}") from None
+    return (priority, due or None)
+
+
+class TodoCore:
+    """Task queue, statistics and persistence without any GUI dependency"""
+
+    def __init__(self, data_file=DATA_FILE, history_limit=HISTORY_LIMIT, storage=None, schedule=ROTATION):
+        self.data_file = data_file
+        self.storage = storage if storage is not None else open_storage(data_file)
+        self.schedule = schedule  # How the current task is chosen, see todo_schedule
+
+        # Data structures
+        self.tasks = TaskQueue()
+        self.ids = TaskIdAllocator()
+        self.history = UndoLog(history_limit)  # For undo/redo functionality
+        self.statistics = empty_statistics()
+        # (undo log entry, undone, journal record) of each action taken here that refresh() has
+        # not merged with the other instances' records yet, oldest first
+        self._unmerged = []
+        # Old -> new ID of tasks in the records the last refresh() or merge_records() applied that
+        # took a new ID, since another instance had taken theirs first
+        self.renamed = {}
+        # FrozenTasks of snapshots not written yet, each gone once its writer lets go of it
+        self._frozen = weakref.WeakSet()
+        self._reset_indexes()
+
+    # Statistics indexes (numpy arrays) are built on first use, so a session
+    # that never queries them, like most command-line calls, skips numpy
+
+    def _reset_indexes(self, event_columns=None):
+        """Drop the indexes, to be rebuilt from the loaded data when next used"""
+        self._daily = None
+        self._events = None
+        self._task_stats = None
+        self._search_index = None
+        self._scheduler = None
+        self._event_columns = event_columns  # Loaded event log, until indexed
+        self._pending_events = []  # (time, task_id, outcome, step) since load, until indexed
+
+    @property
+    def daily(self):
+        """Array index over statistics['daily']"""
+        if self._daily is None:
+            self._daily = DailyCounts(self.statistics['daily'])
+        return self._daily
+
+    @property
+    def events(self):
+        """Every done/skip with its time"""
+        if self._events is None:
+            events = EventLog(self._event_columns)
+            for time, task_id, outcome, step in self._pending_events:
+                if step > 0:
+                    events.append(time, task_id, outcome)
+                else:
+                    events.remove(time, task_id, outcome)
+            # Data files without an event log get one event per daily count
+            events.backfill_daily(self.statistics['daily'])
+            # Older versions never filled the weekly and monthly buckets
+            self.statistics['weekly'] = events.rollup('week')
+            self.statistics['monthly'] = events.rollup('month')
+            self._events = events
+            self._event_columns, self._pending_events = None, []
+        return self._events
+
+    @property
+    def task_stats(self):
+        """Per-task rows in task ID order"""
+        if self._task_stats is None:
+            self._task_stats = TaskStats(self.tasks)
+        return self._task_stats
+
+    @property
+    def search_index(self):
+        """Word index over the task descriptions"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.tasks)
+        return self._search_index
+
+    @property
+    def scheduler(self):
+        """Priority heap over the tasks, used by the PRIORITY schedule"""
+        if self._scheduler is None:
+            self._scheduler = PriorityScheduler(self.tasks)
+        return self._scheduler
+
+    def set_schedule(self, schedule):
+        """Switch between ROTATION and PRIORITY choice of the current task"""
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule {schedule!r}, expected one of {', '.join(SCHEDULES)}")
+        self.schedule = schedule
+
+    # Primitive mutations; every action and its undo/redo goes through these
+
+    def _insert_task(self, index, task):
+        self.tasks.insert(index, task)
+
+    def _remove_task(self, index):
+        return self.tasks.pop(index)
+
+    def _keep(self, task):
+        """Have the snapshots being written keep task as it is, before it changes"""
+        for frozen in self._frozen:
+            frozen.keep(task)
+
+    def _set_description(self, index, description):
+        task = self.tasks[index]
+        self._keep(task)
+        task['description'] = description
+        if self._task_stats is not None:
+            self._task_stats.update(task)
+        if self._search_index is not None:
+            self._search_index.add(task)
+
+    def _add_task(self, index, task):
+        """Insert a new (or undeleted) task and claim its ID"""
+        self.ids.claim(task['task_id'])
+        self._insert_task(index, task)
+        if self._task_stats is not None:
+            self._task_stats.update(task)
+        if self._search_index is not None:
+            self._search_index.add(task)
+        if self._scheduler is not None:
+            self._scheduler.push(task, front=index == 0)
+
+    def _delete_task(self, index):
+        """Remove a task for good and release its ID"""
+        task_id = self._remove_task(index)['task_id']
+        self.ids.release(task_id)
+        if self._task_stats is not None:
+            self._task_stats.remove(task_id)
+        if self._search_index is not None:
+            self._search_index.remove(task_id)
+        if self._scheduler is not None:
+            self._scheduler.remove(task_id)
+
+    def _set_plan(self, index, plan):
+        """Set a task's (priority, due day); the defaults (0, None) are left out of the task"""
+        task = self.tasks[index]
+        self._keep(task)
+        priority, due = plan
+        for key, value in (('priority', priority), ('due', due)):
+            if value:
+                task[key] = value
+            else:
+                task.pop(key, None)
+        if self._scheduler is not None:
+            self._scheduler.update(task)
+
+    def _count(self, task, outcome, day, time, step):
+        """Add step (+1 or -1) to a task's done/skip counters, the totals and the event log"""
+        self._keep(task)
+        task['completed_count' if outcome == 'done' else 'skipped_count'] += step
+        self._record_event(task['task_id'], outcome, day, time, step)
+        if self._task_stats is not None:
+            self._task_stats.update(task)
+        if self._scheduler is not None:
+            # A done/skip sends the task to the back of the line, undoing it brings it back
+            self._scheduler.push(task, front=step < 0)
+
+    def _record_event(self, task_id, outcome, day, time, step):
+        """Add (step 1) or drop (step -1) one done/skip in the totals, day buckets and event log"""
+        if outcome == 'done':
+            ordinal = day_ordinal(day)
+            buckets = [('daily', day)]
+            if self._events is not None:
+                # Until then, indexing the event log rolls them up
+                buckets += [('weekly', week_key(ordinal)), ('monthly', day[:7])]
+            for key, bucket in buckets:
+                counts = self.statistics[key]
+                counts[bucket] = counts.get(bucket, 0) + step
+                if counts[bucket] <= 0:
+                    del counts[bucket]
+            if self._daily is not None:
+                self._daily.add(ordinal, step)
+            self.statistics['total_done'] += step
+        else:
+            self.statistics['total_skipped'] += step
+        if self._events is None:
+            self._pending_events.append((time, task_id, outcome, step))
+        elif step > 0:
+            self._events.append(time, task_id, outcome)
+        else:
+            self._events.remove(time, task_id, outcome)
+
+    def _import(self, tasks, events):
+        """Append Task records (whose IDs are free) and (time, task_id, outcome) events"""
+        for task in tasks:
+            self.ids.claim(task['task_id'])
+        self.tasks.extend(tasks)
+        # Rebuilt on next use, which also tells displays to redraw every row
+        self._task_stats = None
+        if self._search_index is not None:
+            for task in tasks:
+                self._search_index.add(task)
+        if self._scheduler is not None:
+            for task in tasks:
+                self._scheduler.push(task)
+        for time, task_id, outcome in events:
+            self._record_event(task_id, outcome, timestamp_day(time), time, 1)
+
+    def _apply(self, entry):
+        """Perform the action described by an undo log entry"""
+        action = entry[0]
+        if action == 'batch':
+            for part in entry[1]:
+                self._apply(part)
+        elif action == 'add':
+            _, index, task = entry
+            self._add_task(index, task)
+        elif action == 'edit':
+            _, index, old, new = entry
+            self._set_description(index, new)
+        elif action == 'plan':
+            _, index, old, new = entry
+            self._set_plan(index, new)
+        elif action == 'delete':
+            _, index, task = entry
+            self._delete_task(index)
+        elif action == 'move':
+            _, old_index, new_index = entry
+            self._insert_task(new_index, self._remove_task(old_index))
+        elif action in ('done', 'skip'):
+            _, index, task, day, time = entry
+            self._remove_task(index)
+            self._count(task, action, day, time, 1)
+            self._insert_task(len(self.tasks), task)
+        elif action == 'import':
+            _, tasks, events = entry
+            self._import(tasks, events)
+        elif action == 'event':
+            _, task_id, outcome, day, time = entry
+            self._record_event(task_id, outcome, day, time, 1)
+
+    def _revert(self, entry):
+        """Reverse the action described by an undo log entry"""
+        action = entry[0]
+        if action == 'batch':
+            for part in reversed(entry[1]):
+                self._revert(part)
+        elif action == 'add':
+            _, index, task = entry
+            self._delete_task(index)
+        elif action == 'edit':
+            _, index, old, new = entry
+            self._set_description(index, old)
+        elif action == 'plan':
+            _, index, old, new = entry
+            self._set_plan(index, old)
+        elif action == 'delete':
+            _, index, task = entry
+            self._add_task(index, task)
+        elif action == 'move':
+            _, old_index, new_index = entry
+            self._insert_task(old_index, self._remove_task(new_index))
+        elif action in ('done', 'skip'):
+            _, index, task, day, time = entry
+            # The last task, unless another instance's actions were merged since
+            self._remove_task(self.tasks.index_of(task['task_id']))
+            self._count(task, action, day, time, -1)
+            self._insert_task(index, task)
+        elif action == 'event':
+            _, task_id, outcome, day, time = entry
+            self._record_event(task_id, outcome, day, time, -1)
+
+    def _do(self, entry):
+        self._apply(entry)
+        self.history.record(entry)
+        self._log(entry)
+
+    def _do_batch(self, task_ids, make_entry, shifts=True):
+        """Apply make_entry(index, task) to each task as one undo step and one journal record
+
+        Tasks are processed in queue order and found in a single pass over
+        the queue; unknown task IDs are ignored. With shifts, each part
+        takes its task out of place (done/skip move it to the end, delete
+        removes it), so the tasks after it move up by one. Returns the
+        number of tasks changed.
+        """
+        wanted = set(task_ids)
+        positions = [(index, task) for index, task in enumerate(self.tasks) if task['task_id'] in wanted]
+        parts = []
+        for processed, (index, task) in enumerate(positions):
+            part = make_entry(index - processed if shifts else index, task)
+            self._apply(part)
+            parts.append(part)
+        if parts:
+            entry = ('batch', parts)
+            self.history.record(entry)
+            self._log(entry)
+        return len(parts)
+
+    def _encode(self, entry, undo=False):
+        """Turn an undo log entry into a compact journal record
+
+        Tasks are copied into dicts of the JSON layout, since the record may
+        still be waiting for a BackgroundWriter when later actions change the task.
+        """
+        action, index = entry[0], entry[1]
+        if action == 'batch':
+            record = {'a': action, 'b': [self._encode(part) for part in entry[1]]}
+            if undo:
+                record['u'] = 1
+            return record
+        if action == 'import':
+            return {'a': action, 'tasks': [task.to_dict() for task in entry[1]], 'events': entry[2]}
+        record = {'a': action, 'i': index}
+        if action == 'event':
+            # A done/skip of a task that is gone, which is decoded as one again
+            _, task_id, outcome, day, time = entry
+            record = {'a': outcome, 'i': len(self.tasks), 'id': task_id, 'd': day, 'ts': time}
+        elif action in ('add', 'delete'):
+            record['t'] = entry[2].to_dict()
+        elif action in ('edit', 'plan'):
+            record['old'], record['new'] = entry[2], entry[3]
+            record['id'] = self.tasks[index]['task_id']
+        elif action == 'move':
+            record['j'] = entry[2]
+            # Logged after the move (or its undo) was made
+            record['id'] = self.tasks[index if undo else entry[2]]['task_id']
+        elif action in ('done', 'skip'):
+            record['id'], record['d'], record['ts'] = entry[2]['task_id'], entry[3], entry[4]
+        if undo:
+            record['u'] = 1
+        return record
+
+    def _decode(self, record, undo=False):
+        """Turn a journal record back into an undo log entry for the current state, or None
+
+        Tasks are found by ID where the record has one, since another
+        instance's records in between may have moved them. A done/skip of a
+        task that is gone (deleted elsewhere meanwhile) still counts in the
+        statistics, as an 'event' entry; any other record about such a task
+        gives None.
+        """
+        action, index = record['a'], record['i']
+        if action in ('add', 'delete'):
+            task = Task.from_dict(record['t'])
+            if (action == 'add') == undo:
+                # Takes the task out
+                return (action, self.tasks.index_of(task.task_id), task) if task.task_id in self.tasks else None
+            if task.task_id in self.tasks:
+                # Two instances added a task under the same ID at the same moment
+                self.renamed[task.task_id] = task['task_id'] = self.ids.allocate()
+            return (action, min(index, len(self.tasks)), task)
+        task_id = record.get('id')
+        if task_id is not None and task_id not in self.tasks:
+            if action in ('done', 'skip'):
+                return ('event', task_id, action, record['d'], record.get('ts', day_timestamp(record['d'])))
+            return None
+        # Records written before edits and moves carried the task ID go by position
+        current = index if task_id is None else self.tasks.index_of(task_id)
+        if action in ('edit', 'plan'):
+            return (action, current, record['old'], record['new'])
+        last = len(self.tasks) - 1
+        if action == 'move':
+            return (action, min(index, last), current) if undo else (action, current, min(record['j'], last))
+        # A redone done/skip moves the task to the end, an undone one moves it back to index
+        task = self.tasks[current]
+        # Records written before the event log have no time, use the start of the day
+        return (action, min(index, last) if undo else current, task, record['d'],
+                record.get('ts', day_timestamp(record['d'])))
+
+    def _replay(self, record, undo=False):
+        """Apply (or with undo, reverse) one journal record
+
+        Parts of a batch are decoded one at a time, since each refers to
+        the queue as the previous part left it. Returns the undo log entry
+        that was applied (or reversed), or None when the record had nothing
+        left to apply.
+        """
+        undo = undo or bool(record.get('u'))
+        if record['a'] == 'import':
+            tasks = [Task.from_dict(task) for task in record['tasks']]
+            renamed = {}
+            for task in tasks:
+                if task.task_id in self.tasks:
+                    # Imported by two instances at the same moment
+                    renamed[task.task_id] = task['task_id'] = self.ids.allocate()
+            self.renamed.update(renamed)
+            entry = ('import', tasks, [(time, renamed.get(task_id, task_id), outcome)
+                                       for time, task_id, outcome in record['events']])
+            self._apply(entry)
+            return entry
+        if record['a'] == 'batch':
+            parts = [self._replay(part, undo) for part in (reversed(record['b']) if undo else record['b'])]
+            parts = [part for part in parts if part is not None]
+            if undo:
+                parts.reverse()
+            return ('batch', parts) if parts else None
+        entry = self._decode(record, undo)
+        if entry is None:
+            return None
+        if undo:
+            self._revert(entry)
+        else:
+            self._apply(entry)
+        return entry
+
+    def _log(self, entry, undo=False):
+        record = self._encode(entry, undo)
+        if self.storage.merged_seq is not None:
+            self._unmerged.append((entry, undo, record))
+        self.storage.append(record)
+        if self.storage.needs_compaction:
+            self.compact()
+
+    def refresh(self):
+        """Merge the actions other instances (app windows, the command line) saved since the last call
+
+        Cheap when nothing changed: the storage compares a version number.
+        Records are applied by task ID in journal order, the order a fresh
+        load applies them in: this instance's own actions written after the
+        first of the new records (or not written yet) are taken back and
+        applied again after the records written before them (see _rebase).
+        So instances working on one file end up with the same queue, the
+        same counts and the same edits. The undo history is cleared when
+        anything was merged, since its entries refer to queue positions.
+        When records were compacted away before they could be read (or the
+        backend cannot tell what changed), the data file is loaded again.
+        Returns whether anything changed.
+        """
+        self.renamed = {}
+        changes = self.storage.changes()
+        if changes is None:
+            self.load_data()
+            return True
+        if changes:
+            self._rebase(changes)
+            self.history.clear()
+        if self._unmerged:
+            # Those up to merged_seq are in their place in the journal order now
+            newest = self.storage.merged_seq
+            self._unmerged = [item for item in self._unmerged if item[2].get('s', newest + 1) > newest]
+        return bool(changes)
+
+    def _rebase(self, changes):
+        """Apply other instances' records (in journal order) among this instance's unmerged ones"""
+        first = changes[0]['s']
+        keep = len(self._unmerged)
+        # Records written here get their number when the storage writes them, so later ones have none yet
+        while keep and self._unmerged[keep - 1][2].get('s', first + 1) > first:
+            keep -= 1
+        later = self._unmerged[keep:]
+        if any(record['a'] == 'import' for _, _, record in later):
+            # An import is not taken back; a load replays the journal in order
+            self.load_data()
+            return
+        del self._unmerged[keep:]
+        for entry, undone, _ in reversed(later):
+            if undone:
+                self._apply(entry)
+            else:
+                self._revert(entry)
+        own = {id(record) for _, _, record in later}
+        for record in sorted(changes + [record for _, _, record in later],
+                             key=lambda record: record.get('s', float('inf'))):
+            entry = self._replay(record)
+            if id(record) in own and entry is not None:
+                self._unmerged.append((entry, bool(record.get('u')), record))
+
+    def merge_records(self, records):
+        """Apply journal records another instance wrote and log them here, as refresh applies them
+
+        For a todo_sync server, which owns the queue and takes its clients'
+        actions as records. Returns renamed.
+        """
+        self.renamed = {}
+        for record in records:
+            self._replay(record)
+            self.storage.append(dict(record))
+        if records:
+            self.history.clear()
+        if self.storage.needs_compaction:
+            self.compact()
+        return self.renamed
+
+    def add_task(self, description):
+        """Add new task to the end of the queue and return it"""
+        # Other instances' tasks first, so the new ID is free everywhere
+        self.refresh()
+        task = Task.new(self.ids.allocate(), description, datetime.now())
+        self._do(('add', len(self.tasks), task))
+        return task
+
+    def edit_task(self, index, description):
+        """Change the description of the task at index"""
+        self._do(('edit', index, self.tasks[index]['description'], description))
+
+    def delete_task(self, index):
+        """Remove the task at index and return it"""
+        task = self.tasks[index]
+        self._do(('delete', index, task))
+        return task
+
+    def move_task(self, old_index, new_index):
+        """Move the task at old_index so it ends up at new_index"""
+        if old_index != new_index:
+            self._do(('move', old_index, new_index))
+
+    def plan_task(self, index, priority=0, due=None):
+        """Set the priority (higher first) and due day ('YYYY-MM-DD' or None) of the task at index"""
+        task = self.tasks[index]
+        self._do(('plan', index, plan_of(task), checked_plan(priority, due)))
+
+    def plan_tasks(self, task_ids, priority=0, due=None):
+        """Set the priority and due day of many tasks as one action, return how many"""
+        plan = checked_plan(priority, due)
+        return self._do_batch(task_ids, lambda index, task: ('plan', index, plan_of(task), plan), shifts=False)
+
+    def mark_done(self, index=None):
+        """Mark task at index (current task by default) as done and move to end"""
+        if not self.tasks:
+            return None
+        if index is None:
+            index = self.current_index()
+
+        task = self.tasks[index]
+        now = datetime.now()
+        self._do(('done', index, task, now.strftime('%Y-%m-%d'), timestamp(now)))
+        return task
+
+    def mark_skip(self, index=None):
+        """Mark task at index (current task by default) as skipped and move to end"""
+        if not self.tasks:
+            return None
+        if index is None:
+            index = self.current_index()
+
+        task = self.tasks[index]
+        now = datetime.now()
+        self._do(('skip', index, task, now.strftime('%Y-%m-%d'), timestamp(now)))
+        return task
+
+    def mark_done_tasks(self, task_ids):
+        """Mark many tasks done (moving each to the end) as one action, return how many"""
+        now = datetime.now()
+        day, time = now.strftime('%Y-%m-%d'), timestamp(now)
+        return self._do_batch(task_ids, lambda index, task: ('done', index, task, day, time))
+
+    def mark_skip_tasks(self, task_ids):
+        """Mark many tasks skipped (moving each to the end) as one action, return how many"""
+        now = datetime.now()
+        day, time = now.strftime('%Y-%m-%d'), timestamp(now)
+        return self._do_batch(task_ids, lambda index, task: ('skip', index, task, day, time))
+
+    def delete_tasks(self, task_ids):
+        """Delete many tasks as one action, return how many"""
+        return self._do_batch(task_ids, lambda index, task: ('delete', index, task))
+
+    def prefix_tasks(self, task_ids, prefix):
+        """Put prefix in front of many task descriptions as one action, return how many"""
+        return self._do_batch(task_ids, lambda index, task: (
+            'edit', index, task['description'], prefix + task['description']), shifts=False)
+
+    def import_tasks(self, tasks, events=(), renamed=None):
+        """Append imported tasks and past (time, task_id, outcome) events, return how many tasks
+
+        This is one chunk of an import (see todo_io): a single journal record
+        that cannot be undone, so the undo history is cleared. Task counters
+        are taken as given; events only add to the history and totals. Tasks
+        whose ID is taken get a new one, recorded in renamed (old -> new ID,
+        shared by all chunks of one import) so later events follow them.
+        """
+        renamed = {} if renamed is None else renamed
+        self.refresh()
+        tasks = [Task.from_dict(task) for task in tasks]
+        taken = set()
+        for task in tasks:
+            task_id = task['task_id']
+            if task_id in self.tasks or task_id in taken:
+                renamed[task_id] = task['task_id'] = self.ids.allocate()
+                while task['task_id'] in taken:
+                    task['task_id'] = renamed[task_id] = self.ids.allocate()
+            taken.add(task['task_id'])
+        events = [(time, renamed.get(task_id, task_id), outcome) for time, task_id, outcome in events]
+        entry = ('import', tasks, events)
+        self._apply(entry)
+        self.history.clear()
+        self._log(entry)
+        return len(tasks)
+
+    def undo(self):
+        """Undo last action, return True if anything changed"""
+        # Merging another instance's actions clears the history: their tasks may have taken these IDs
+        merged = self.refresh()
+        entry = self.history.pop_undo()
+        if entry is None:
+            return merged
+        self._revert(entry)
+        self._log(entry, undo=True)
+        return True
+
+    def redo(self):
+        """Redo last undone action, return True if anything changed"""
+        # As in undo
+        merged = self.refresh()
+        entry = self.history.pop_redo()
+        if entry is None:
+            return merged
+        self._apply(entry)
+        self._log(entry)
+        return True
+
+    @property
+    def current_task(self):
+        """Task to do next (the front of the queue unless scheduling by priority), or None"""
+        if self.schedule == PRIORITY:
+            task_id = self.scheduler.peek()
+            return None if task_id is None else self.tasks.get(task_id)
+        return self.tasks[0] if self.tasks else None
+
+    def current_index(self):
+        """Queue position of the current task, or None"""
+        if not self.tasks:
+            return None
+        if self.schedule == PRIORITY:
+            return self.tasks.index_of(self.scheduler.peek())
+        return 0
+
+    def scheduled_tasks(self):
+        """Tasks in the order the schedule will make them current"""
+        if self.schedule == PRIORITY:
+            return [self.tasks.get(task_id) for task_id in self.scheduler.ordered()]
+        return list(self.tasks)
+
+    def get_task(self, task_id):
+        """Task with task_id, or None"""
+        return self.tasks.get(task_id)
+
+    def index_of(self, task_id):
+        """Current queue position of the task with task_id"""
+        return self.tasks.index_of(task_id)
+
+    def search(self, query):
+        """IDs of the tasks matching query (see SearchIndex) in queue order, or None without a query"""
+        if not query.strip():
+            return None  # Without building the index
+        matches = self.search_index.search(query)
+        if matches is None:
+            return None
+        return self.tasks.in_order(matches)
+
+    def recent_days(self, count):
+        """Return (date, done count) for the last count days, newest first"""
+        counts = self.daily.recent(count).tolist()
+        first = self.daily.today - count + 1
+        return [(day_date(first + i), counts[i]) for i in range(count - 1, -1, -1)]
+
+    def calculate_daily_average(self):
+        """Calculate daily average for last 30 days (over the days with any task done)"""
+        total, days = self.daily.window(30)
+        return total / max(days, 1)
+
+    def calculate_weekly_average(self):
+        """Calculate weekly average"""
+        return self.calculate_daily_average() * 7
+
+    def calculate_monthly_average(self):
+        """Calculate monthly average"""
+        return self.calculate_daily_average() * 30
+
+    def rollup(self, period, outcome='done', task_id=None):
+        """{period label: count} of done or skipped events per hour, day, week or month"""
+        return self.events.rollup(period, outcome, task_id)
+
+    def skip_rates(self, period, task_id=None):
+        """{period label: share of done/skip events that were skips}"""
+        return self.events.skip_rates(period, task_id)
+
+    def task_trend(self, task_id, period='week'):
+        """{period label: (done, skipped)} for one task"""
+        return self.events.trend(task_id, period)
+
+    def recent_months(self, count):
+        """Return (month, done, skipped) for the last count months with events, newest first"""
+        now = datetime.now()
+        month = now.year * 12 + now.month - count
+        months, done, skipped = self.events.summary('month', since=timestamp(datetime(month // 12, month % 12 + 1, 1)))
+        return list(zip(months, done.tolist(), skipped.tolist()))[::-1]
+
+    def sorted_tasks(self):
+        """Tasks sorted by task_id for consistent order (A, B, C, D...)"""
+        return [self.tasks.get(task_id) for task_id in self.task_stats.ids]
+
+    def snapshot(self):
+        """Copy of the data that later actions will not mutate (tasks as Task copies)"""
+        return {
+            'tasks': [task.copy() for task in self.tasks],
+            'statistics': self._statistics_copy(self.events.to_columns())
+        }
+
+    def frozen_snapshot(self):
+        """snapshot() without copying every task and event up front, what compact() writes
+
+        The tasks are a FrozenTasks, copied as they are written (an action
+        changing one first has it keep a copy), and the event columns numpy
+        copies; json_default and write_snapshot take both. So taking it costs
+        a few milliseconds for 100,000 tasks, and the copying happens on
+        whichever thread writes it.
+        """
+        tasks = FrozenTasks(list(self.tasks))
+        self._frozen.add(tasks)
+        return {'tasks': tasks, 'statistics': self._statistics_copy(self.events.frozen_columns())}
+
+    def _statistics_copy(self, events):
+        # Taken after self.events, since building that index refreshes weekly/monthly
+        statistics = dict(self.statistics)
+        for key in ('daily', 'weekly', 'monthly'):
+            statistics[key] = dict(statistics[key])
+        statistics['events'] = events
+        return statistics
+
+    def write_in_background(self, delay=AUTOSAVE_DELAY):
+        """Hand all further disk writes to a worker thread (see BackgroundWriter)"""
+        if not isinstance(self.storage, BackgroundWriter):
+            self.storage = BackgroundWriter(self.storage, delay)
+        return self.storage
+
+    def save_data(self):
+        """Make sure every action so far is on disk, raises OSError on failure"""
+        self.storage.flush()
+
+    def compact(self, background=True):
+        """Fold the journal into a fresh snapshot of the data file"""
+        self.storage.compact(self.frozen_snapshot, background)
+
+    def close(self):
+        """Write a final snapshot and release the data files"""
+        # Other instances' latest actions belong in the snapshot, or it is not written
+        self.storage.wait()
+        self.refresh()
+        self.compact(background=False)
+        self.storage.close()
+
+    def load_data(self):
+        """Load the data file snapshot and replay the journal on top of it"""
+        # Finish queued writes first, the writer needs the lock for them
+        self.storage.wait()
+        with self.storage.file_lock:
+            self._load()
+
+    def _load(self):
+        """load_data with the storage locked"""
+        self._unmerged = []
+        try:
+            data = self.storage.load_snapshot()
+            if data is not None:
+                tasks = data.get('tasks', [])
+                self.statistics = data.get('statistics', empty_statistics())
+
+                # Older data files stored the totals as empty dicts
+                for key in ('total_done', 'total_skipped'):
+                    if not isinstance(self.statistics.get(key), int):
+                        self.statistics[key] = 0
+                self.statistics.setdefault('daily', {})
+                # Rolled up from the event log once it is indexed
+                self.statistics['weekly'], self.statistics['monthly'] = {}, {}
+                self._reset_indexes(self.statistics.pop('events', None))
+
+                if hasattr(tasks, 'task_ids'):
+                    # Binary snapshot: blocks of tasks are decoded when first used
+                    self.tasks = TaskQueue()
+                    self.tasks.extend_lazy(tasks.task_ids, tasks.load)
+                    self.ids.reset(tasks.task_ids)
+                else:
+                    # Ensure existing tasks have task_id and completion counts (for backward compatibility)
+                    for i, task in enumerate(tasks):
+                        if 'task_id' not in task:
+                            task_id = chr(65 + i) if i < 26 else f"Task{i+1}"
+                            task['task_id'] = task_id
+                        if 'completed_count' not in task:
+                            task['completed_count'] = 0
+                        if 'skipped_count' not in task:
+                            task['skipped_count'] = 0
+                    tasks = [Task.from_dict(task) for task in tasks]
+                    self.tasks = TaskQueue(tasks)
+                    self.ids.reset(task.task_id for task in tasks)
+
+        except Exception as e:
+            print(f"Failed to load data: {str(e)}")
+            self.tasks = TaskQueue()
+            self.ids.reset(())
+            self.statistics = empty_statistics()
+            self._reset_indexes()
+
+        # Actions not yet folded into the snapshot stay undoable, so a later
+        # session (e.g. the command line) can undo what an earlier one did
+        self.history.clear()
+        try:
+            for record in self.storage.replay():
+                entry = self._replay(record)
+                if record.get('u'):
+                    self.history.pop_undo()
+                elif entry is None:
+                    continue
+                elif entry[0] == 'import':
+                    self.history.clear()
+                else:
+                    self.history.record(entry)
+        except Exception as e:
+            print(f"Failed to replay journal: {str(e)}")
+            self.history.clear()
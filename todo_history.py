@@ -0,0 +1,56 @@
+from collections import deque
+
+# Default number of undoable steps kept, None keeps every step
+HISTORY_LIMIT = 50
+
+
+class UndoLog:
+    """Undo/redo stacks of action deltas
+
+    Each entry is a small tuple ``(action, *args)`` that describes only what
+    the action changed, so every step costs the same memory regardless of
+    how many tasks exist. The undo stack is a ring buffer: once ``limit``
+    entries are stored the oldest one is dropped in O(1).
+    """
+
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.limit = limit
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def __len__(self):
+        return len(self.undo_stack)
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def record(self, entry):
+        """Store a new action, which invalidates anything that could be redone"""
+        self.undo_stack.append(entry)
+        self.redo_stack.clear()
+
+    def pop_undo(self):
+        """Move the newest action to the redo stack and return it (or None)"""
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def pop_redo(self):
+        """Move the newest undone action back to the undo stack and return it (or None)"""
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def clear(self):
+        """Forget all undo/redo steps"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
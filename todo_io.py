@@ -0,0 +1,252 @@
+"""Streaming import and export of tasks and their done/skip history
+
+Files are CSV or JSON Lines (picked by extension) with one row per task,
+followed by one row per done/skip event:
+
+    type,task_id,description,created,completed_count,skipped_count,time,outcome,priority,due
+    task,A,Water the plants,2024-01-01T09:00:00,3,1,,,2,2024-01-05
+    event,A,,,,,2024-01-02T08:15:00,done,,
+
+In JSON Lines each row is an object with the same keys (empty columns are
+left out; task keys outside the columns above are kept). Events without a
+task_id are history from data that only had per-day counts.
+
+Both directions work on CHUNK_SIZE rows at a time: export streams the
+queue and the event log to the file, and import parses the file line by
+line and hands each chunk to ``TodoCore.import_tasks``, so the raw file is
+never held in memory. Import reads the file twice: the first pass only
+checks every row, so a bad row leaves the queue as it was. import_file and
+export_file are generators yielding progress after every chunk, which lets
+the GUI keep its window responsive and show a progress bar; ``run`` drains
+one when progress is not needed. Both yield (rows so far, fraction done)
+pairs.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+
+from todo_stats import day_date, day_ordinal, EPOCH_ORDINAL, timestamp
+
+# Rows parsed (or written) between progress updates and core inserts
+CHUNK_SIZE = 10000
+
+COLUMNS = ('type', 'task_id', 'description', 'created', 'completed_count', 'skipped_count', 'time', 'outcome',
+           'priority', 'due')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+def file_format(path):
+    """'csv' or 'jsonl' by the extension of path, ValueError for anything else"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"unsupported file type {extension or path!r}, use .csv or .jsonl")
+    return FORMATS[extension]
+
+
+def format_time(seconds):
+    """ISO date and time for an event timestamp"""
+    day = day_date(EPOCH_ORDINAL + seconds // 86400)
+    seconds %= 86400
+    return f"{day.isoformat()}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def parse_time(value):
+    """Event timestamp from an ISO date/time or a whole number of seconds"""
+    if is_int(value) or isinstance(value, str) and value.isdigit():
+        return int(value)
+    if not isinstance(value, str):
+        raise ValueError(f"time must be an ISO date/time or whole seconds, not {value!r}")
+    return timestamp(datetime.fromisoformat(value))
+
+
+def is_int(value):
+    # JSON true/false load as bools, which are ints too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def run(steps):
+    """Drain an import_file/export_file generator, return its last progress"""
+    progress = None
+    for progress in steps:
+        pass
+    return progress
+
+
+# Export
+
+def task_row(task):
+    row = {'type': 'task'}
+    row.update(task)
+    return row
+
+
+def event_row(seconds, task_id, outcome):
+    row = {'type': 'event', 'time': format_time(seconds), 'outcome': outcome}
+    if task_id is not None:
+        row['task_id'] = task_id
+    return row
+
+
+def export_rows(core):
+    """Every task in queue order, then every event oldest first"""
+    for task in core.tasks:
+        yield task_row(task)
+    events = core.events
+    for start in range(0, len(events), CHUNK_SIZE):
+        for seconds, task_id, outcome in events.rows(start, start + CHUNK_SIZE):
+            yield event_row(seconds, task_id, outcome)
+
+
+def export_file(core, path):
+    """Write all tasks and events to path; yields (rows written, fraction done)"""
+    kind = file_format(path)
+    total = len(core.tasks) + len(core.events)
+    written = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        if kind == 'csv':
+            writer = csv.DictWriter(f, COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(row):
+                f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n')
+        for row in export_rows(core):
+            write(row)
+            written += 1
+            if written % CHUNK_SIZE == 0:
+                yield written, written / total
+    os.replace(tmp_path, path)
+    yield written, 1.0
+
+
+# Import
+
+def read_lines(f, counter):
+    """Decoded lines of a binary file, adding the bytes read to counter[0]"""
+    for number, line in enumerate(f):
+        counter[0] += len(line)
+        text = line.decode('utf-8')
+        # Spreadsheet programs often start CSV files with a byte order mark
+        yield text.lstrip('\ufeff') if number == 0 else text
+
+
+def read_rows(lines, kind):
+    """(line number, row dict) pairs from CSV or JSON Lines text lines"""
+    if kind == 'csv':
+        reader = csv.reader(lines)
+        columns = [(index, key) for index, key in enumerate(next(reader, [])) if key in COLUMNS]
+        end = reader.line_num
+        for values in reader:
+            # A quoted value can span lines, number the row by its first
+            yield end + 1, {key: values[index] for index, key in columns if index < len(values) and values[index]}
+            end = reader.line_num
+    else:
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"line {number}: {e}") from None
+                if not isinstance(row, dict):
+                    raise ValueError(f"line {number}: expected a JSON object, not {line.strip()}")
+                yield number, row
+
+
+def parse_task(row):
+    """Task dict in the data file layout from an import row (which it reuses)"""
+    task = row
+    task.pop('type', None)
+    if not task.get('task_id'):
+        raise ValueError(f"task row without a task_id: {row}")
+    task['task_id'] = parse_id(task['task_id'])
+    description = task.get('description', '')
+    if not isinstance(description, str):
+        raise ValueError(f"description must be text, not {description!r}")
+    task['description'] = description
+    for key in ('completed_count', 'skipped_count'):
+        task[key] = parse_int(task, key)
+    if 'priority' in task:
+        task['priority'] = parse_int(task, 'priority')
+    if task.get('due'):
+        task['due'] = day_date(day_ordinal(str(task['due']))).isoformat()
+    return task
+
+
+def parse_id(value):
+    """Task ID from an import row, which may have it as a number"""
+    if not isinstance(value, str) and not is_int(value):
+        raise ValueError(f"task_id must be text or a number, not {value!r}")
+    return str(value)
+
+
+def parse_int(row, key):
+    """row[key] (0 when missing) as an int, from a whole number or its text"""
+    value = row.get(key, 0)
+    try:
+        if is_int(value) or isinstance(value, str):
+            return int(value)
+    except ValueError:
+        pass
+    raise ValueError(f"{key} must be a whole number, not {value!r}")
+
+
+def parse_event(row):
+    """(time, task_id, outcome) from an import row"""
+    outcome = row.get('outcome')
+    if outcome not in ('done', 'skip') or 'time' not in row:
+        raise ValueError(f"event row needs a time and an outcome of done or skip: {row}")
+    task_id = row.get('task_id')
+    return parse_time(row['time']), None if task_id is None else parse_id(task_id), outcome
+
+
+def parse_row(row):
+    """('task', task dict) or ('event', (time, task_id, outcome)) from an import row"""
+    row_type = row.get('type', 'task')
+    if row_type == 'task':
+        return row_type, parse_task(row)
+    if row_type == 'event':
+        return row_type, parse_event(row)
+    raise ValueError(f"unknown row type {row_type!r}")
+
+
+def import_file(core, path):
+    """Append the tasks and events of path to core
+
+    Yields (tasks imported, fraction of the work done) after every chunk;
+    the first half is checking the file, during which a ValueError leaves
+    core untouched. Task IDs that are already in use get new IDs (events
+    follow them), and importing clears the undo history; see
+    TodoCore.import_tasks.
+    """
+    kind = file_format(path)
+    size = max(os.path.getsize(path), 1)
+    counter = [0]
+    with open(path, 'rb') as f:
+        for number, (line, row) in enumerate(read_rows(read_lines(f, counter), kind), 1):
+            try:
+                parse_row(row)
+            except ValueError as e:
+                raise ValueError(f"line {line}: {e}") from None
+            if number % CHUNK_SIZE == 0:
+                yield 0, counter[0] / size / 2
+
+    counter = [0]
+    renamed = {}
+    imported = 0
+    tasks, events = [], []
+    with open(path, 'rb') as f:
+        for _, row in read_rows(read_lines(f, counter), kind):
+            row_type, parsed = parse_row(row)
+            (tasks if row_type == 'task' else events).append(parsed)
+            if len(tasks) + len(events) >= CHUNK_SIZE:
+                imported += core.import_tasks(tasks, events, renamed)
+                tasks, events = [], []
+                yield imported, 0.5 + counter[0] / size / 2
+        if tasks or events:
+            imported += core.import_tasks(tasks, events, renamed)
+    # Fold the import records into a fresh snapshot
+    core.compact()
+    yield imported, 1.0
@@ -0,0 +1,146 @@
+"""Opt-in timing of app actions, redraws and disk writes
+
+Profiler.instrument wraps methods of an object so every call is timed
+while the profiler is enabled; when it is not, a wrapped call costs one
+extra function call. Each timed call is kept as a span (name, category,
+start, duration, thread and, with allocation tracking on, the net bytes
+allocated according to tracemalloc) and added to per-name totals. Spans
+can be written as a Chrome trace (chrome://tracing or Perfetto), where
+nested calls show as a flame graph per thread.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Spans kept for the trace export; older ones are dropped
+TRACE_LIMIT = 200000
+
+# Recent spans of a category kept for the performance panel
+RECENT_LIMIT = 60
+
+# Environment variable turning profiling on at startup ('alloc' also tracks allocations)
+PROFILE_ENV = 'TODO_PROFILE'
+
+
+class Profiler:
+    """Collects timed spans of instrumented methods"""
+
+    def __init__(self):
+        self.enabled = False
+        self.allocations = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all spans and totals"""
+        with self.lock:
+            self.spans = deque(maxlen=TRACE_LIMIT)  # (name, category, start ns, duration ns, thread, bytes)
+            self.totals = {}  # name -> [calls, total ns, max ns, net bytes]
+            self.recent = {}  # category -> deque of (name, duration ns)
+            self.thread_names = {}
+
+    def start(self, allocations=False):
+        self.enabled = True
+        self.track_allocations(allocations)
+
+    def stop(self):
+        self.enabled = False
+        self.track_allocations(False)
+
+    def track_allocations(self, on):
+        """Record net allocations per span
+
+        tracemalloc makes every call several times slower, and counts the
+        allocations of all threads, so spans include the background writer's.
+        """
+        if on and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not on and self.allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.allocations = on
+
+    def start_from_environment(self):
+        """Start when PROFILE_ENV is set, returns whether it was"""
+        setting = os.environ.get(PROFILE_ENV, '')
+        if setting:
+            self.start(allocations=setting == 'alloc')
+        return bool(setting)
+
+    def instrument(self, target, names, category, prefix=''):
+        """Replace the methods names of target with timed wrappers, recorded as prefix + name
+
+        Wraps on the object itself, so calls through self are timed too, and
+        so are callbacks bound afterwards (button commands, after() calls).
+        """
+        for name in names:
+            setattr(target, name, self.wrap(getattr(target, name), prefix + name, category))
+
+    def wrap(self, function, name, category):
+        profiler = self
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            allocations = profiler.allocations and tracemalloc.is_tracing()
+            memory = tracemalloc.get_traced_memory()[0] if allocations else 0
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                allocated = tracemalloc.get_traced_memory()[0] - memory if allocations else 0
+                profiler.record(name, category, start, duration, allocated)
+        return timed
+
+    def record(self, name, category, start, duration, allocated=0):
+        thread = threading.get_ident()
+        with self.lock:
+            self.spans.append((name, category, start, duration, thread, allocated))
+            totals = self.totals.get(name)
+            if totals is None:
+                totals = self.totals[name] = [0, 0, 0, 0]
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] = max(totals[2], duration)
+            totals[3] += allocated
+            recent = self.recent.get(category)
+            if recent is None:
+                recent = self.recent[category] = deque(maxlen=RECENT_LIMIT)
+            recent.append((name, duration))
+            if thread not in self.thread_names:
+                self.thread_names[thread] = threading.current_thread().name
+
+    def recent_spans(self, category):
+        """(name, duration in ms) of the latest spans of category, oldest first"""
+        with self.lock:
+            return [(name, duration / 1e6) for name, duration in self.recent.get(category, ())]
+
+    def summary(self):
+        """(name, calls, total ms, mean ms, max ms, net KB) per name, most total time first"""
+        with self.lock:
+            rows = [(name, calls, total / 1e6, total / calls / 1e6, longest / 1e6, allocated / 1024)
+                    for name, (calls, total, longest, allocated) in self.totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def export_chrome_trace(self, path):
+        """Write the spans as Chrome trace JSON (complete events in microseconds), return their count"""
+        pid = os.getpid()
+        with self.lock:
+            spans = list(self.spans)
+            thread_names = dict(self.thread_names)
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread, 'args': {'name': name}}
+                  for thread, name in thread_names.items()]
+        for name, category, start, duration, thread, allocated in spans:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                     'ts': start / 1000, 'dur': duration / 1000}
+            if allocated:
+                event['args'] = {'allocated_bytes': allocated}
+            events.append(event)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(spans)
@@ -0,0 +1,354 @@
+import heapq
+import re
+
+# Tasks per block; blocks split when they grow past twice this size
+BLOCK_SIZE = 512
+
+LETTER_IDS = [chr(65 + i) for i in range(26)]  # A, B, C, ...
+NUMBERED_ID = re.compile(r'Task(\d+)$')
+
+
+class TaskQueue:
+    """Ordered task container for the rotation queue
+
+    Tasks are stored in a list of small blocks with a Fenwick tree over the
+    block sizes, so moving the current task to the back (pop(0) + append)
+    only touches the first and last block, and positional lookup, insert and
+    removal cost O(log(n / BLOCK_SIZE) + BLOCK_SIZE) instead of shifting the
+    whole list. A task_id -> block map gives stable handles: index_of()
+    finds a task's current position no matter how the queue was reordered.
+
+    The container supports the list operations the app uses (len, iteration,
+    indexing and slicing, insert, pop, append). It holds todo_task.Task
+    records and reads their task_id attribute directly.
+
+    Blocks added with extend_lazy hold placeholders until a task in them is
+    first touched, then are filled by their loader, so a queue loaded from
+    a binary snapshot decodes only the blocks that are looked at.
+    """
+
+    def __init__(self, tasks=(), block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = []
+        self._block_of = {}  # task_id -> block holding it
+        self._lazy = {}  # id(block) -> loader returning its tasks, until loaded
+        self._len = 0
+        self.extend(tasks)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from self._loaded(block)
+
+    def __contains__(self, task_id):
+        return task_id in self._block_of
+
+    def __eq__(self, other):
+        if isinstance(other, (TaskQueue, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TaskQueue({list(self)!r})"
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return list(self.iter_from(start, max(stop - start, 0)))
+        block_index, offset = self._locate(self._normalize(index))
+        return self._loaded(self._blocks[block_index])[offset]
+
+    def iter_from(self, start, count=None):
+        """Yield up to count tasks starting at position start"""
+        if start >= self._len or count == 0:
+            return
+        block_index, offset = self._locate(start)
+        for block in self._blocks[block_index:]:
+            for task in self._loaded(block)[offset:]:
+                yield task
+                if count is not None:
+                    count -= 1
+                    if count == 0:
+                        return
+            offset = 0
+
+    def get(self, task_id):
+        """Task with task_id, or None"""
+        block = self._block_of.get(task_id)
+        if block is None:
+            return None
+        for task in self._loaded(block):
+            if task.task_id == task_id:
+                return task
+
+    def index_of(self, task_id):
+        """Current position of the task with task_id, ValueError if missing"""
+        block = self._block_of.get(task_id)
+        if block is None:
+            raise ValueError(f"{task_id} is not in the queue")
+        block_index = self._block_index[id(block)]
+        for offset, task in enumerate(self._loaded(block)):
+            if task.task_id == task_id:
+                return self._prefix(block_index) + offset
+
+    def in_order(self, task_ids):
+        """task_ids (all in the queue) sorted by queue position
+
+        Groups the IDs by block and scans only the blocks holding one, so
+        a few IDs cost a few block scans and many cost one pass.
+        """
+        wanted = {}
+        for task_id in task_ids:
+            wanted.setdefault(id(self._block_of[task_id]), set()).add(task_id)
+        ordered = []
+        for block in self._blocks:
+            in_block = wanted.get(id(block))
+            if in_block:
+                ordered.extend(task.task_id for task in self._loaded(block) if task.task_id in in_block)
+        return ordered
+
+    def append(self, task):
+        """Add task to the back of the queue"""
+        if not self._blocks:
+            self._blocks.append([])
+            self._reindex()
+        self._insert_into(len(self._blocks) - 1, len(self._blocks[-1]), task)
+
+    def extend(self, tasks):
+        """Append many tasks, filling whole blocks at a time"""
+        tasks = list(tasks)
+        if not tasks:
+            return
+        if self._blocks and len(self._blocks[-1]) < self.block_size:
+            room = self.block_size - len(self._blocks[-1])
+            for task in tasks[:room]:
+                self.append(task)
+            tasks = tasks[room:]
+        for start in range(0, len(tasks), self.block_size):
+            block = tasks[start:start + self.block_size]
+            self._blocks.append(block)
+            for task in block:
+                self._block_of[task.task_id] = block
+        self._len += len(tasks)
+        self._reindex()
+
+    def extend_lazy(self, task_ids, load):
+        """Append len(task_ids) tasks that load(start, stop) decodes when first needed
+
+        start and stop count from the first of these tasks.
+        """
+        if not task_ids:
+            return
+        for start in range(0, len(task_ids), self.block_size):
+            stop = min(start + self.block_size, len(task_ids))
+            block = [None] * (stop - start)
+            self._blocks.append(block)
+            self._lazy[id(block)] = lambda start=start, stop=stop: load(start, stop)
+            self._block_of.update(dict.fromkeys(task_ids[start:stop], block))
+        self._len += len(task_ids)
+        self._reindex()
+
+    def insert(self, index, task):
+        """Insert task so it ends up at position index"""
+        index = max(0, min(self._len, index if index >= 0 else self._len + index))
+        if index == self._len:
+            self.append(task)
+            return
+        block_index, offset = self._locate(index)
+        self._insert_into(block_index, offset, task)
+
+    def pop(self, index=-1):
+        """Remove and return the task at index"""
+        block_index, offset = self._locate(self._normalize(index))
+        block = self._loaded(self._blocks[block_index])
+        task = block.pop(offset)
+        del self._block_of[task.task_id]
+        self._len -= 1
+        if block:
+            self._add(block_index, -1)
+        else:
+            del self._blocks[block_index]
+            self._reindex()
+        return task
+
+    def remove(self, task_id):
+        """Remove and return the task with task_id"""
+        return self.pop(self.index_of(task_id))
+
+    def clear(self):
+        self._blocks = []
+        self._block_of = {}
+        self._lazy = {}
+        self._len = 0
+        self._reindex()
+
+    def _normalize(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("task index out of range")
+        return index
+
+    def _loaded(self, block):
+        """block, after filling it in if it was added by extend_lazy"""
+        if self._lazy:
+            load = self._lazy.pop(id(block), None)
+            if load is not None:
+                block[:] = load()
+        return block
+
+    def _insert_into(self, block_index, offset, task):
+        block = self._loaded(self._blocks[block_index])
+        block.insert(offset, task)
+        self._block_of[task.task_id] = block
+        self._len += 1
+        if len(block) > 2 * self.block_size:
+            # Split the block in half
+            tail = block[self.block_size:]
+            del block[self.block_size:]
+            self._blocks.insert(block_index + 1, tail)
+            for moved in tail:
+                self._block_of[moved.task_id] = tail
+            self._reindex()
+        else:
+            self._add(block_index, 1)
+
+    # Fenwick tree over block sizes
+
+    def _reindex(self):
+        """Rebuild the Fenwick tree and block positions after blocks changed"""
+        tree = [0] * (len(self._blocks) + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent <= len(self._blocks):
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._block_index = {id(block): i for i, block in enumerate(self._blocks)}
+
+    def _add(self, block_index, delta):
+        i = block_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, block_index):
+        """Number of tasks in the blocks before block_index"""
+        total = 0
+        i = block_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index):
+        """(block index, offset) of position index"""
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = position + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                position = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return position, index
+
+
+class TaskIdAllocator:
+    """Hands out task IDs: the first free letter A-Z, then Task1, Task2, ...
+
+    Instead of collecting every ID in use on each add, free letters sit in
+    a min-heap and numbered IDs in use in a set, with a pointer below which
+    every number is taken except those released since (kept in a second
+    min-heap), so the lowest free ID is still picked first. The pointer
+    only moves forward, past numbers in use, so allocation is O(log n)
+    amortized however large the numbers in the data file are. Heap entries
+    for IDs that were claimed again are skipped lazily.
+    """
+
+    def __init__(self, used_ids=()):
+        self.reset(used_ids)
+
+    def reset(self, used_ids):
+        """Rebuild the free lists from the IDs currently in use
+
+        The lists are built on the next allocate/claim/release: scanning
+        every ID is the slowest part of loading a large data file, and
+        sessions that only mark or list tasks never need them.
+        """
+        self._used_ids = list(used_ids)
+
+    def _build(self):
+        used_ids = set(self._used_ids)
+        self._used_ids = None
+        self._free_letters = [i for i, letter in enumerate(LETTER_IDS) if letter not in used_ids]
+        self._free = set(self._free_letters)  # Already sorted, so a valid heap
+        # Same test as _key without a regex match per ID, which dominated loading large files
+        self._numbers = {int(task_id[4:]) for task_id in used_ids
+                         if task_id[4:].isdecimal() and task_id.startswith('Task')
+                         and task_id[4] != '0'}
+        self._lowest = 1  # No free number below this one but those in _released
+        self._released = []
+
+    def _key(self, task_id):
+        """0-25 for letters, -N for TaskN, None for other IDs"""
+        if len(task_id) == 1 and 'A' <= task_id <= 'Z':
+            return ord(task_id) - 65
+        match = NUMBERED_ID.match(task_id)
+        if match and match.group(1)[0] != '0':
+            return -int(match.group(1))
+        return None
+
+    def allocate(self):
+        """Claim and return the next ID"""
+        if self._used_ids is not None:
+            self._build()
+        while self._free_letters:
+            index = heapq.heappop(self._free_letters)
+            if index in self._free:
+                self._free.discard(index)
+                return LETTER_IDS[index]
+        numbers = self._numbers
+        while self._released:
+            number = heapq.heappop(self._released)
+            if number not in numbers:
+                numbers.add(number)
+                return f"Task{number}"
+        number = self._lowest
+        while number in numbers:
+            number += 1
+        numbers.add(number)
+        self._lowest = number + 1
+        return f"Task{number}"
+
+    def claim(self, task_id):
+        """Mark task_id as used (a deleted task came back through undo/redo)"""
+        if self._used_ids is not None:
+            self._build()
+        key = self._key(task_id)
+        if key is None:
+            return
+        if key < 0:
+            self._numbers.add(-key)
+        else:
+            self._free.discard(key)
+
+    def release(self, task_id):
+        """Return task_id to the free list"""
+        if self._used_ids is not None:
+            self._build()
+        key = self._key(task_id)
+        if key is None:
+            return
+        if key >= 0:
+            if key not in self._free:
+                self._free.add(key)
+                heapq.heappush(self._free_letters, key)
+        elif -key in self._numbers:
+            self._numbers.discard(-key)
+            if -key < self._lowest:
+                heapq.heappush(self._released, -key)
@@ -0,0 +1,118 @@
+"""Choosing the current task: plain rotation or a priority heap
+
+With the default ROTATION schedule the current task is the front of the
+queue, and done/skip move it to the back. With PRIORITY the current task
+is the top of a PriorityScheduler heap instead; done/skip still move the
+task to the back of the queue, which the task list keeps showing.
+"""
+import heapq
+
+from todo_stats import day_ordinal
+
+ROTATION = 'rotation'
+PRIORITY = 'priority'
+SCHEDULES = (ROTATION, PRIORITY)
+
+# Share of a rotation a task that is always skipped is moved forward by
+SKIP_BOOST = 0.5
+
+NO_DUE = float('inf')
+
+
+def due_ordinal(task):
+    """Ordinal of the task's due day, or NO_DUE"""
+    due = task.get('due')
+    return day_ordinal(due) if due else NO_DUE
+
+
+def plan_label(task):
+    """' [priority 2, due 2024-01-05]' for a task with a priority or due day, else ''"""
+    parts = []
+    if task.get('priority'):
+        parts.append(f"priority {task['priority']}")
+    if task.get('due'):
+        parts.append(f"due {task['due']}")
+    return f" [{', '.join(parts)}]" if parts else ''
+
+
+class PriorityScheduler:
+    """Heap of the tasks keyed on priority, due day and place in the rotation
+
+    The task with the highest ``priority`` comes first, then the one due
+    soonest (tasks without ``due`` last), then the one that has waited
+    longest since it was last done or skipped. That last part is a ticket
+    taken when the task joins the back of the line, moved forward by its
+    skip rate times SKIP_BOOST of the number of tasks (but never ahead of
+    the next task with the same priority and due day), so tasks that are
+    often skipped come back sooner without coming straight back.
+
+    Entries are lists [-priority, due ordinal, ticket, task_id]. A changed
+    task gets a new entry and the old one is left in the heap, recognised
+    as stale because it is no longer the task's entry in ``entries``; the
+    heap is rebuilt when stale entries outnumber live ones. peek, push and
+    remove are O(log n) amortized.
+    """
+
+    def __init__(self, tasks=()):
+        self.entries = {}  # task_id -> its live heap entry
+        self.heap = []
+        for ticket, task in enumerate(tasks):
+            entry = self._entry(task, ticket - self._boost(task, len(tasks)))
+            self.entries[task['task_id']] = entry
+            self.heap.append(entry)
+        heapq.heapify(self.heap)
+        self.low = min((entry[2] for entry in self.heap), default=0)
+        self.high = len(self.heap)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _entry(task, ticket):
+        return [-task.get('priority', 0), due_ordinal(task), ticket, task['task_id']]
+
+    @staticmethod
+    def _boost(task, count):
+        handled = task['completed_count'] + task['skipped_count']
+        return task['skipped_count'] / handled * count * SKIP_BOOST if handled else 0
+
+    def push(self, task, front=False):
+        """(Re)insert a task at the back of the line, or with front, ahead of every ticket"""
+        if front:
+            self.low -= 1
+            self._add(self._entry(task, self.low))
+            return
+        self.entries.pop(task['task_id'], None)
+        entry = self._entry(task, self.high - self._boost(task, len(self.entries)))
+        self.high += 1
+        # Never straight back ahead of the task that is next in its class
+        top = self.heap[0] if self.peek() is not None else None
+        if top is not None and top[:2] == entry[:2] and entry[2] <= top[2]:
+            entry[2] = top[2] + 0.5
+        self.low = min(self.low, entry[2])
+        self._add(entry)
+
+    def update(self, task):
+        """Re-key a task whose priority or due day changed, keeping its place in line"""
+        self._add(self._entry(task, self.entries[task['task_id']][2]))
+
+    def remove(self, task_id):
+        self.entries.pop(task_id, None)
+
+    def _add(self, entry):
+        self.entries[entry[3]] = entry
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = list(self.entries.values())
+            heapq.heapify(self.heap)
+
+    def peek(self):
+        """ID of the task to do next, or None when there are none"""
+        heap = self.heap
+        while heap and self.entries.get(heap[0][3]) is not heap[0]:
+            heapq.heappop(heap)
+        return heap[0][3] if heap else None
+
+    def ordered(self):
+        """Every task ID, next first (sorts the whole heap)"""
+        return [entry[3] for entry in sorted(self.entries.values())]
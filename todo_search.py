@@ -0,0 +1,93 @@
+"""Word and prefix search over task descriptions"""
+import bisect
+import re
+
+WORD = re.compile(r'\w+')
+
+
+def words(text):
+    """Distinct lowercase words of text"""
+    return set(WORD.findall(text.lower()))
+
+
+class SearchIndex:
+    """Inverted index from the words of task descriptions to task IDs
+
+    postings maps each word to the set of IDs of the tasks containing it,
+    and vocabulary keeps the words sorted, so the tasks with a word
+    starting with a prefix are the union of one bisect range of postings.
+    add() and remove() patch only the words of one task, so the index
+    follows every add, edit, delete and undo instead of being rebuilt.
+
+    A query matches the tasks that have, for every word of the query, a
+    word starting with it; the word still being typed matches as a prefix.
+    """
+
+    def __init__(self, tasks=()):
+        self.postings = {}
+        self.task_words = {}  # task_id -> its words, to patch on edit/remove
+        for task in tasks:
+            task_id = task['task_id']
+            task_words = self.task_words[task_id] = words(task['description'])
+            for word in task_words:
+                posting = self.postings.get(word)
+                if posting is None:
+                    self.postings[word] = {task_id}
+                else:
+                    posting.add(task_id)
+        self.vocabulary = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.task_words)
+
+    def add(self, task):
+        """Index a new task, or re-index one whose description changed"""
+        task_id = task['task_id']
+        old = self.task_words.get(task_id, set())
+        new = words(task['description'])
+        for word in old - new:
+            self._discard(word, task_id)
+        for word in new - old:
+            posting = self.postings.get(word)
+            if posting is None:
+                self.postings[word] = {task_id}
+                bisect.insort(self.vocabulary, word)
+            else:
+                posting.add(task_id)
+        self.task_words[task_id] = new
+
+    def remove(self, task_id):
+        """Drop a task from the index"""
+        for word in self.task_words.pop(task_id, ()):
+            self._discard(word, task_id)
+
+    def _discard(self, word, task_id):
+        posting = self.postings[word]
+        posting.discard(task_id)
+        if not posting:
+            del self.postings[word]
+            del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+
+    def prefixed(self, prefix):
+        """IDs of the tasks with a word starting with prefix (do not mutate the result)"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        stop = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        if stop - start == 1:
+            return self.postings[self.vocabulary[start]]
+        matches = set()
+        for word in self.vocabulary[start:stop]:
+            matches |= self.postings[word]
+        return matches
+
+    def search(self, query):
+        """IDs of the tasks matching every word of query, or None for a query without words"""
+        query_words = words(query)
+        if not query_words:
+            return None
+        candidates = sorted((self.prefixed(word) for word in query_words), key=len)
+        matches = set(candidates[0])
+        for posting in candidates[1:]:
+            if not matches:
+                break
+            matches &= posting
+        return matches
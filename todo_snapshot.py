@@ -0,0 +1,285 @@
+"""Binary snapshot format for large data files
+
+Holds the same data as the JSON snapshot (tasks, per-day done counts, the
+event log, the totals and the journal sequence number) in fixed-width
+little-endian sections, so loading does not parse any text it does not
+need:
+
+    header    magic b'TODOSNAP', format version (u32), metadata length (u32)
+    metadata  JSON object: counts, section offsets, totals, journal_seq
+    strings   string count + 1 end offsets (u64), then the UTF-8 text of
+              every distinct string; task IDs come first, in queue order
+    tasks     one 32-byte record per task: string indexes of the ID,
+              description, created time and extra keys (as JSON), then
+              the done and skipped counts (i64 each)
+    daily     (day since 1970-01-01 as i32, done count as i64) pairs
+    events    times (i64), task codes (i32), outcomes (i8) and the string
+              indexes of the event log task IDs (u32)
+
+read_snapshot memory-maps the file and only decodes the task IDs, the
+daily counts and the event columns up front; the task dicts are built one
+block at a time by SnapshotTasks.load the first time the queue touches
+them (see TaskQueue.extend_lazy), so the current task and the visible rows
+are ready before the rest of the file is read.
+
+Version 1 files, which held the counts as u32, are still read.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from todo_stats import day_date, day_ordinal, EPOCH_ORDINAL
+from todo_task import Task
+
+MAGIC = b'TODOSNAP'
+VERSION = 2
+
+HEADER = struct.Struct('<8sII')
+TASK_RECORD = struct.Struct('<IIIIqq')
+DAILY_RECORD = struct.Struct('<iq')
+
+# Task and daily record layouts of each readable format version
+RECORDS = {
+    1: (struct.Struct('<IIIIII'), struct.Struct('<iI')),
+    VERSION: (TASK_RECORD, DAILY_RECORD),
+}
+
+NO_STRING = 0xFFFFFFFF  # String index of a missing created time or extra keys
+
+TASK_KEYS = ('task_id', 'description', 'created', 'completed_count', 'skipped_count')
+
+
+def _pack(typecode, values):
+    """Little-endian bytes of an array of values"""
+    packed = array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, data):
+    """array of values from little-endian bytes"""
+    unpacked = array(typecode)
+    unpacked.frombytes(data)
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return unpacked
+
+
+class StringTable:
+    """Collects distinct strings for writing, index by first use"""
+
+    def __init__(self):
+        self.index = {}
+
+    def add(self, text):
+        if text is None:
+            return NO_STRING
+        index = self.index.get(text)
+        if index is None:
+            index = self.index[text] = len(self.index)
+        return index
+
+    def to_bytes(self):
+        encoded = [text.encode('utf-8') for text in self.index]
+        ends = [0]
+        for text in encoded:
+            ends.append(ends[-1] + len(text))
+        return _pack('Q', ends) + b''.join(encoded)
+
+
+def write_snapshot(path, data):
+    """Write data (in the JSON data file layout) to path as a binary snapshot
+
+    Like atomic_write_json, writes a temp file and renames it over path.
+    """
+    tasks = list(data.get('tasks', []))
+    statistics = data.get('statistics', {})
+    events = statistics.get('events') or {'task_ids': [], 'time': [], 'task': [], 'outcome': []}
+
+    strings = StringTable()
+    for task in tasks:
+        strings.add(task['task_id'])  # IDs first, so they decode as one run
+    records = bytearray()
+    for task in tasks:
+        created = task.get('created')
+        # Anything else, including a missing or non-text created time, goes in the extra keys
+        extra = {key: value for key, value in task.items()
+                 if key not in TASK_KEYS or key == 'created' and not isinstance(created, str)}
+        completed, skipped = task.get('completed_count', 0), task.get('skipped_count', 0)
+        try:
+            records += TASK_RECORD.pack(
+                strings.add(task['task_id']), strings.add(task['description']),
+                strings.add(created if isinstance(created, str) else None),
+                strings.add(json.dumps(extra) if extra else None),
+                completed, skipped)
+        except struct.error:
+            raise ValueError(f"Task {task['task_id']}: done/skipped counts {completed!r}, {skipped!r} "
+                             "are not 64-bit integers") from None
+
+    try:
+        daily = b''.join(DAILY_RECORD.pack(day_ordinal(day) - EPOCH_ORDINAL, count)
+                         for day, count in sorted(statistics.get('daily', {}).items()))
+    except struct.error:
+        raise ValueError("Daily done counts must be 64-bit integers") from None
+    event_ids = [strings.add(task_id) for task_id in events['task_ids']]
+    sections = [
+        ('strings', strings.to_bytes()),
+        ('tasks', bytes(records)),
+        ('daily', daily),
+        ('event_time', _pack('q', events['time'])),
+        ('event_task', _pack('i', events['task'])),
+        ('event_outcome', _pack('b', events['outcome'])),
+        ('event_ids', _pack('I', event_ids)),
+    ]
+
+    metadata = {
+        'tasks': len(tasks),
+        'strings': len(strings.index),
+        'events': len(events['time']),
+        'total_done': statistics.get('total_done', 0),
+        'total_skipped': statistics.get('total_skipped', 0),
+        'journal_seq': data.get('journal_seq', 0),
+        'sections': {},
+    }
+    # Section offsets are relative to the end of the metadata and 8-byte aligned
+    offset = 0
+    for name, payload in sections:
+        metadata['sections'][name] = [offset, len(payload)]
+        offset += len(payload) + (-len(payload) % 8)
+    header_json = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+    header_json += b' ' * (-(HEADER.size + len(header_json)) % 8)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(header_json)))
+        f.write(header_json)
+        for name, payload in sections:
+            f.write(payload)
+            f.write(b'\0' * (-len(payload) % 8))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotTasks:
+    """The task records of a mapped snapshot, decoded into Task records on demand
+
+    Iterating yields every task, so code that expects the list of the JSON
+    layout works unchanged; task_ids and load() let the queue hold the
+    tasks undecoded.
+    """
+
+    def __init__(self, buffer, start, count, offsets, text_start, task_ids, record=TASK_RECORD):
+        self.buffer = buffer
+        self.record = record
+        self.start = start
+        self.count = count
+        self.offsets = offsets
+        self.text_start = text_start
+        self.task_ids = task_ids
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start in range(0, self.count, 1024):
+            yield from self.load(start, min(start + 1024, self.count))
+
+    def close(self):
+        """Unmap the file; tasks not loaded yet can no longer be"""
+        self.buffer.close()
+
+    def string(self, index):
+        if index == NO_STRING:
+            return None
+        offsets = self.offsets
+        return str(self.buffer[self.text_start + offsets[index]:self.text_start + offsets[index + 1]], 'utf-8')
+
+    def load(self, start, stop):
+        """Fresh Task records for positions start to stop"""
+        string = self.string
+        task_ids = self.task_ids
+        tasks = []
+        record = self.record
+        records = self.buffer[self.start + start * record.size:self.start + stop * record.size]
+        for position, (_, description, created, extra, completed, skipped) in enumerate(
+                record.iter_unpack(records), start):
+            task = Task(task_ids[position], string(description), completed_count=completed, skipped_count=skipped)
+            if created != NO_STRING:
+                task['created'] = string(created)
+            if extra != NO_STRING:
+                for key, value in json.loads(string(extra)).items():
+                    task[key] = value
+            tasks.append(task)
+        return tasks
+
+
+def is_snapshot(path):
+    """Whether path starts with the binary snapshot magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_snapshot(path):
+    """Map path and return its data in the JSON layout, with lazily decoded tasks
+
+    The map stays open while any task is still undecoded; ValueError for
+    a file that is not a snapshot of a known version.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, metadata_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a binary snapshot")
+    if version not in RECORDS:
+        raise ValueError(f"{path} has snapshot format version {version}, expected {VERSION}")
+    task_record, daily_record = RECORDS[version]
+    metadata = json.loads(buffer[HEADER.size:HEADER.size + metadata_size])
+    base = HEADER.size + metadata_size
+
+    def section(name):
+        offset, size = metadata['sections'][name]
+        return base + offset, size
+
+    strings_start, _ = section('strings')
+    text_start = strings_start + (metadata['strings'] + 1) * 8
+    offsets = _unpack('Q', buffer[strings_start:text_start])
+    count = metadata['tasks']
+    id_text = buffer[text_start:text_start + offsets[count]]
+    if id_text.isascii():
+        # One decode and a slice per ID, instead of a decode per ID
+        id_text = id_text.decode('ascii')
+        task_ids = [id_text[offsets[i]:offsets[i + 1]] for i in range(count)]
+    else:
+        task_ids = [str(id_text[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(count)]
+    tasks_start, _ = section('tasks')
+    tasks = SnapshotTasks(buffer, tasks_start, count, offsets, text_start, task_ids, task_record)
+
+    daily_start, daily_size = section('daily')
+    daily = {day_date(EPOCH_ORDINAL + day).isoformat(): done
+             for day, done in daily_record.iter_unpack(buffer[daily_start:daily_start + daily_size])}
+
+    def column(name, typecode):
+        start, size = section(name)
+        return _unpack(typecode, buffer[start:start + size])
+
+    events = {
+        'task_ids': [tasks.string(index) for index in column('event_ids', 'I')],
+        'time': column('event_time', 'q'),
+        'task': column('event_task', 'i'),
+        'outcome': column('event_outcome', 'b'),
+    }
+    return {
+        'tasks': tasks,
+        'statistics': {
+            'daily': daily,
+            'total_done': metadata['total_done'],
+            'total_skipped': metadata['total_skipped'],
+            'events': events,
+        },
+        'journal_seq': metadata['journal_seq'],
+    }
@@ -0,0 +1,496 @@
+"""Day-indexed statistics for the ToDo app"""
+import bisect
+import functools
+import heapq
+from datetime import date
+
+# Rolling windows (days ending today) whose totals are kept up to date
+WINDOWS = (7, 30, 90, 365)
+
+# Extra days allocated past the last one in use, so new days rarely reallocate
+SLACK_DAYS = 64
+
+# datetime64[D] values count days from 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# numpy is imported when the first store is built rather than on import, so
+# importing the core (and the GUI) stays fast; see benchmark.py startup
+np = None
+
+
+def load_numpy():
+    """Import numpy on first use"""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def day_ordinal(day):
+    """Ordinal of a 'YYYY-MM-DD' day key"""
+    return date.fromisoformat(day).toordinal()
+
+
+@functools.lru_cache(maxsize=1024)
+def day_date(ordinal):
+    """date for a day ordinal"""
+    return date.fromordinal(ordinal)
+
+
+@functools.lru_cache(maxsize=1024)
+def format_day(day, fmt):
+    """day.strftime(fmt), cached since the same days are shown on every redraw"""
+    return day.strftime(fmt)
+
+
+class DailyCounts:
+    """Done counts per day in an array indexed by day ordinal
+
+    counts[i] is the count for day ordinal origin + i. The total and the
+    number of active days (days with at least one task done) of each
+    rolling window in WINDOWS are adjusted on every add(), so averages and
+    recent-day lookups are O(1) with no date formatting or dict scans. When
+    the date changes the windows are recomputed from the array in one
+    vectorized pass. The {'YYYY-MM-DD': count} map stored in the data file
+    is loaded with load().
+    """
+
+    def __init__(self, daily=None, today=None):
+        load_numpy()
+        self.today = today if today is not None else date.today().toordinal()
+        self.load(daily or {})
+
+    def load(self, daily):
+        """Replace all counts with those of a {'YYYY-MM-DD': count} map"""
+        start = self.today - max(WINDOWS)
+        end = self.today + 1
+        if daily:
+            # numpy parses the ISO day keys itself
+            ordinals = np.array(list(daily), dtype='datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+            values = np.fromiter(daily.values(), dtype=np.int64, count=len(daily))
+            start = min(start, int(ordinals.min()))
+            end = max(end, int(ordinals.max()) + 1)
+        self.origin = start
+        self.counts = np.zeros(end - start + SLACK_DAYS, dtype=np.int64)
+        if daily:
+            self.counts[ordinals - start] = np.maximum(values, 0)
+        self._recompute()
+
+    def _recompute(self):
+        """Recompute every window total from the array"""
+        self.totals = {}
+        self.active = {}
+        for days in WINDOWS:
+            window = self.range(self.today - days + 1, self.today + 1)
+            self.totals[days] = int(window.sum())
+            self.active[days] = int(np.count_nonzero(window))
+
+    def _ensure(self, ordinal):
+        """Grow the array so that it covers ordinal"""
+        if ordinal < self.origin:
+            pad = max(self.origin - ordinal, len(self.counts))
+            self.counts = np.concatenate((np.zeros(pad, dtype=np.int64), self.counts))
+            self.origin -= pad
+        elif ordinal >= self.origin + len(self.counts):
+            grow = max(ordinal - self.origin - len(self.counts) + SLACK_DAYS, len(self.counts))
+            self.counts = np.concatenate((self.counts, np.zeros(grow, dtype=np.int64)))
+
+    def roll(self, today=None):
+        """Move the windows to end on today, if the date changed"""
+        if today is None:
+            today = date.today().toordinal()
+        if today != self.today:
+            self.today = today
+            self._ensure(today)
+            self._recompute()
+
+    def range(self, start, stop):
+        """Counts for day ordinals start to stop - 1, oldest first"""
+        lo, hi = start - self.origin, stop - self.origin
+        if 0 <= lo and hi <= len(self.counts):
+            return self.counts[lo:hi]
+        result = np.zeros(stop - start, dtype=np.int64)
+        src_lo, src_hi = max(lo, 0), min(hi, len(self.counts))
+        if src_lo < src_hi:
+            result[src_lo - lo:src_hi - lo] = self.counts[src_lo:src_hi]
+        return result
+
+    def get(self, ordinal):
+        """Count for one day ordinal"""
+        index = ordinal - self.origin
+        if 0 <= index < len(self.counts):
+            return int(self.counts[index])
+        return 0
+
+    def add(self, ordinal, step):
+        """Add step to a day's count (never going below 0)"""
+        self.roll()
+        self._ensure(ordinal)
+        index = ordinal - self.origin
+        old = int(self.counts[index])
+        new = max(old + step, 0)
+        self.counts[index] = new
+        age = self.today - ordinal
+        if age >= 0:
+            for days in WINDOWS:
+                if age < days:
+                    self.totals[days] += new - old
+                    self.active[days] += (new > 0) - (old > 0)
+
+    def window(self, days):
+        """(total, active days) over the last days days including today"""
+        self.roll()
+        if days in self.totals:
+            return self.totals[days], self.active[days]
+        window = self.range(self.today - days + 1, self.today + 1)
+        return int(window.sum()), int(np.count_nonzero(window))
+
+    def recent(self, count):
+        """Counts of the last count days, oldest first"""
+        self.roll()
+        return self.range(self.today - count + 1, self.today + 1)
+
+
+# Outcome codes used in the event log
+OUTCOMES = ('done', 'skip')
+
+# Rollup periods and the numpy datetime unit their bucket numbers count in
+PERIOD_UNITS = {'hour': 'h', 'day': 'D', 'week': 'D', 'month': 'M'}
+
+
+def timestamp(moment):
+    """Seconds from 1970-01-01 to a naive datetime, in local wall-clock time like the day keys"""
+    return (moment.toordinal() - EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def day_timestamp(day):
+    """timestamp of the start of a 'YYYY-MM-DD' day"""
+    return (day_ordinal(day) - EPOCH_ORDINAL) * 86400
+
+
+def timestamp_day(seconds):
+    """'YYYY-MM-DD' day key of a timestamp"""
+    return format_day(day_date(EPOCH_ORDINAL + seconds // 86400), '%Y-%m-%d')
+
+
+def week_key(ordinal):
+    """'YYYY-MM-DD' of the Monday starting the week of a day ordinal"""
+    return format_day(day_date(ordinal - day_date(ordinal).weekday()), '%Y-%m-%d')
+
+
+class EventLog:
+    """Every done/skip as a row of three columns: time, task and outcome
+
+    The columns are numpy arrays (seconds as int64, an int32 code into
+    task_ids, an int8 index into OUTCOMES) grown by doubling, so append is
+    amortized O(1). Rollups bin whole columns with np.bincount, which takes
+    a few milliseconds for a million events. Events imported from data that
+    only had per-day counts have task code -1.
+    """
+
+    def __init__(self, columns=None):
+        load_numpy()
+        self.load(columns)
+
+    def load(self, columns=None):
+        """Replace all events with those of a to_columns() dict"""
+        columns = columns or {}
+        self.task_ids = list(columns.get('task_ids', []))
+        self.codes = {task_id: code for code, task_id in enumerate(self.task_ids)}
+        self._allocate(np.asarray(columns.get('time', []), dtype=np.int64),
+                       np.asarray(columns.get('task', []), dtype=np.int32),
+                       np.asarray(columns.get('outcome', []), dtype=np.int8))
+
+    def backfill_daily(self, daily):
+        """Add undated-task done events for counts in a daily map the log does not cover
+
+        Data written before the event log only has per-day done counts.
+        """
+        labels, done, _ = self.summary('day')
+        logged = dict(zip(labels, done.tolist()))
+        missing = {day: count - logged.get(day, 0) for day, count in daily.items() if count > logged.get(day, 0)}
+        if not missing:
+            return
+        days = np.array(list(missing), dtype='datetime64[D]').astype(np.int64)
+        times = np.repeat(days * 86400, np.fromiter(missing.values(), dtype=np.int64, count=len(missing)))
+        self._allocate(np.concatenate((self.times[:self.size], times)),
+                       np.concatenate((self.tasks[:self.size], np.full(len(times), -1, dtype=np.int32))),
+                       np.concatenate((self.outcomes[:self.size], np.zeros(len(times), dtype=np.int8))))
+
+    def _allocate(self, times, tasks, outcomes):
+        self.size = len(times)
+        capacity = max(1024, 2 * self.size)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.tasks = np.zeros(capacity, dtype=np.int32)
+        self.outcomes = np.zeros(capacity, dtype=np.int8)
+        self.times[:self.size] = times
+        self.tasks[:self.size] = tasks
+        self.outcomes[:self.size] = outcomes
+
+    def to_columns(self):
+        """Plain lists for the data file"""
+        return {
+            'task_ids': list(self.task_ids),
+            'time': self.times[:self.size].tolist(),
+            'task': self.tasks[:self.size].tolist(),
+            'outcome': self.outcomes[:self.size].tolist()
+        }
+
+    def frozen_columns(self):
+        """to_columns() with copies of the numpy columns in place of the lists, for a snapshot"""
+        return {
+            'task_ids': list(self.task_ids),
+            'time': self.times[:self.size].copy(),
+            'task': self.tasks[:self.size].copy(),
+            'outcome': self.outcomes[:self.size].copy()
+        }
+
+    def __len__(self):
+        return self.size
+
+    def _code(self, task_id):
+        if task_id is None:
+            return -1
+        code = self.codes.get(task_id)
+        if code is None:
+            code = self.codes[task_id] = len(self.task_ids)
+            self.task_ids.append(task_id)
+        return code
+
+    def append(self, time, task_id, outcome):
+        """Record one event"""
+        if self.size == len(self.times):
+            for name in ('times', 'tasks', 'outcomes'):
+                column = getattr(self, name)
+                setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+        self.times[self.size] = time
+        self.tasks[self.size] = self._code(task_id)
+        self.outcomes[self.size] = OUTCOMES.index(outcome)
+        self.size += 1
+
+    def rows(self, start=0, stop=None):
+        """(time, task_id or None, outcome) for events start to stop - 1, oldest first"""
+        stop = self.size if stop is None else min(stop, self.size)
+        task_ids = self.task_ids
+        return [(time, task_ids[code] if code >= 0 else None, OUTCOMES[outcome])
+                for time, code, outcome in zip(self.times[start:stop].tolist(), self.tasks[start:stop].tolist(),
+                                               self.outcomes[start:stop].tolist())]
+
+    def remove(self, time, task_id, outcome):
+        """Drop the latest event matching time, task and outcome (an undone action)"""
+        code, outcome = self.codes.get(task_id, -1), OUTCOMES.index(outcome)
+        last = self.size - 1
+        if last >= 0 and self.times[last] == time and self.tasks[last] == code and self.outcomes[last] == outcome:
+            # Undo almost always removes the newest event
+            self.size = last
+            return
+        matches = np.flatnonzero((self.times[:self.size] == time) & (self.tasks[:self.size] == code)
+                                 & (self.outcomes[:self.size] == outcome))
+        if len(matches):
+            index = matches[-1]
+            for column in (self.times, self.tasks, self.outcomes):
+                column[index:self.size - 1] = column[index + 1:self.size]
+            self.size -= 1
+
+    def summary(self, period, task_id=None, since=None):
+        """(labels, done counts, skip counts) per non-empty period bucket, oldest first
+
+        Labels are 'YYYY-MM-DDTHH' for hours, 'YYYY-MM-DD' for days and weeks
+        (the Monday) and 'YYYY-MM' for months. task_id limits the events to
+        one task and since (a timestamp) to those at or after it.
+        """
+        if period not in PERIOD_UNITS:
+            raise ValueError(f"unknown period {period!r}")
+        times = self.times[:self.size]
+        outcomes = self.outcomes[:self.size]
+        mask = None
+        if task_id is not None:
+            mask = self.tasks[:self.size] == self.codes.get(task_id, -2)
+        if since is not None:
+            mask = times >= since if mask is None else mask & (times >= since)
+        if mask is not None:
+            times, outcomes = times[mask], outcomes[mask]
+        if not len(times):
+            return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Bin by hour or day over the whole column, then merge the (few) used
+        # days into weeks or months
+        buckets = times // (3600 if period == 'hour' else 86400)
+        first = buckets.min()
+        buckets -= first
+        size = int(buckets.max()) + 1
+        # One pass counts both outcomes: bin 2 * bucket + outcome
+        counts = np.bincount(buckets * len(OUTCOMES) + outcomes, minlength=size * len(OUTCOMES))
+        counts = counts.reshape(size, len(OUTCOMES))
+        total = counts.sum(axis=1)
+        used = np.flatnonzero(total)
+        keys, total, skipped = used + first, total[used], counts[used, OUTCOMES.index('skip')]
+        if period == 'week':
+            # 1970-01-01 was a Thursday; weeks start on Monday
+            keys = keys - (keys + 3) % 7
+        elif period == 'month':
+            keys = keys.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if period in ('week', 'month'):
+            keys, groups = np.unique(keys, return_inverse=True)
+            total = np.bincount(groups, weights=total).astype(np.int64)
+            skipped = np.bincount(groups, weights=skipped).astype(np.int64)
+
+        labels = np.datetime_as_string(keys.astype(f'datetime64[{PERIOD_UNITS[period]}]'))
+        return labels.tolist(), total - skipped, skipped
+
+    def rollup(self, period, outcome='done', task_id=None, since=None):
+        """{label: count} of one outcome per period bucket"""
+        labels, done, skipped = self.summary(period, task_id, since)
+        counts = done if outcome == 'done' else skipped
+        return {label: count for label, count in zip(labels, counts.tolist()) if count}
+
+    def skip_rates(self, period, task_id=None, since=None):
+        """{label: share of events that were skips} per period bucket"""
+        labels, done, skipped = self.summary(period, task_id, since)
+        return dict(zip(labels, (skipped / (done + skipped)).tolist()))
+
+    def trend(self, task_id, period):
+        """{label: (done, skipped)} per period bucket for one task"""
+        labels, done, skipped = self.summary(period, task_id)
+        return dict(zip(labels, zip(done.tolist(), skipped.tolist())))
+
+
+class TaskStats:
+    """Per-task done/skip counts and success rates, ordered by task ID
+
+    ids is kept sorted with bisect, so adding or removing a task costs
+    O(log n) comparisons (plus a memmove) instead of re-sorting all tasks
+    on every redraw. rows caches (description, done, skipped, success rate)
+    per task. Task IDs whose row was added, changed or removed since the
+    last take_changes() are collected in changed, so a display can update
+    just those rows.
+
+    The counts are also kept in numpy arrays indexed by a slot per task
+    (slots of deleted tasks are reused), so rankings and histograms over
+    all tasks are vectorized.
+    """
+
+    def __init__(self, tasks=()):
+        load_numpy()
+        self.load(tasks)
+
+    def load(self, tasks):
+        """Rebuild from all tasks"""
+        self.rows = {task['task_id']: self._row(task) for task in tasks}
+        self.ids = sorted(self.rows)
+        self.changed = set()
+        self.reloaded = True  # Everything changed
+
+        self.slot_ids = list(self.rows)  # Slot -> task_id, None when free
+        self.slots = {task_id: slot for slot, task_id in enumerate(self.slot_ids)}
+        self.free_slots = []
+        capacity = max(64, 2 * len(self.slot_ids))
+        self.done = np.zeros(capacity, dtype=np.int64)
+        self.skipped = np.zeros(capacity, dtype=np.int64)
+        self.live = np.zeros(capacity, dtype=bool)
+        rows = list(self.rows.values())
+        self.done[:len(rows)] = [row[1] for row in rows]
+        self.skipped[:len(rows)] = [row[2] for row in rows]
+        self.live[:len(rows)] = True
+
+    def _row(self, task):
+        completed = task['completed_count']
+        skipped = task['skipped_count']
+        total = completed + skipped
+        rate = (completed / total * 100) if total > 0 else 0
+        return task['description'], completed, skipped, rate
+
+    def _slot(self, task_id):
+        slot = self.slots.get(task_id)
+        if slot is not None:
+            return slot
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.slot_ids[slot] = task_id
+        else:
+            slot = len(self.slot_ids)
+            self.slot_ids.append(task_id)
+            if slot == len(self.done):
+                self.done, self.skipped, self.live = (
+                    np.concatenate((column, np.zeros_like(column))) for column in (self.done, self.skipped, self.live))
+        self.slots[task_id] = slot
+        self.live[slot] = True
+        return slot
+
+    def update(self, task):
+        """Add a task or refresh its row after its description or counts changed"""
+        task_id = task['task_id']
+        if task_id not in self.rows:
+            bisect.insort(self.ids, task_id)
+        row = self.rows[task_id] = self._row(task)
+        slot = self._slot(task_id)
+        self.done[slot], self.skipped[slot] = row[1], row[2]
+        self.changed.add(task_id)
+
+    def remove(self, task_id):
+        """Drop a deleted task"""
+        if self.rows.pop(task_id, None) is not None:
+            del self.ids[bisect.bisect_left(self.ids, task_id)]
+            slot = self.slots.pop(task_id)
+            self.slot_ids[slot] = None
+            self.live[slot] = False
+            self.free_slots.append(slot)
+            self.changed.add(task_id)
+
+    def rank(self, task_id):
+        """Position of task_id in ID order"""
+        return bisect.bisect_left(self.ids, task_id)
+
+    def take_changes(self):
+        """Return (reloaded, changed task IDs) since the last call and reset both"""
+        reloaded, changed = self.reloaded, self.changed
+        self.reloaded, self.changed = False, set()
+        return reloaded, changed
+
+    def counts(self, task_ids):
+        """(done, skipped) arrays for task_ids"""
+        slots = [self.slots[task_id] for task_id in task_ids]
+        return self.done[slots], self.skipped[slots]
+
+    def top(self, count, key='done', largest=True):
+        """Up to count task IDs with the most (or least) done, or the highest (or lowest) skip rate
+
+        Skip rates only rank tasks that were done or skipped at least once.
+        Ties are broken by task ID.
+        """
+        size = len(self.slot_ids)
+        done, skipped, live = self.done[:size], self.skipped[:size], self.live[:size]
+        if key == 'done':
+            values = done.astype(float)
+        elif key == 'skip_rate':
+            total = done + skipped
+            values = np.divide(skipped, total, out=np.zeros(size), where=total > 0)
+            live = live & (total > 0)
+        else:
+            raise ValueError(f"unknown ranking {key!r}")
+        if not largest:
+            values = -values
+        candidates = np.flatnonzero(live)
+        if len(candidates) > count:
+            # Partial selection: O(n) instead of sorting every task. Tasks
+            # tied with the last one picked compete by task ID.
+            threshold = values[candidates][np.argpartition(-values[candidates], count - 1)[count - 1]]
+            above = candidates[values[candidates] > threshold].tolist()
+            tied = candidates[values[candidates] == threshold].tolist()
+            tied_ids = heapq.nsmallest(count - len(above), (self.slot_ids[slot] for slot in tied))
+            candidates = above + [self.slots[task_id] for task_id in tied_ids]
+        else:
+            candidates = candidates.tolist()
+        candidates.sort(key=lambda slot: (-values[slot], self.slot_ids[slot]))
+        return [self.slot_ids[slot] for slot in candidates]
+
+    def rate_histogram(self, bins=10):
+        """(labels, task counts) of tasks by success rate, plus tasks with no done/skip yet"""
+        live = self.live[:len(self.slot_ids)]
+        done, skipped = self.done[:len(live)][live], self.skipped[:len(live)][live]
+        total = done + skipped
+        active = total > 0
+        counts, edges = np.histogram(done[active] * 100 / total[active], bins=bins, range=(0, 100))
+        labels = [f"{edges[i]:.0f}-{edges[i + 1]:.0f}%" for i in range(bins)] + ['none']
+        return labels, counts.tolist() + [int(np.count_nonzero(~active))]
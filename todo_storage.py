@@ -0,0 +1,1137 @@
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+from itertools import repeat
+from todo_queue import TaskIdAllocator
+from todo_snapshot import is_snapshot, read_snapshot, write_snapshot
+from todo_stats import OUTCOMES
+from todo_task import json_default
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Journal records written before a background compaction is started
+COMPACT_EVERY = 500
+
+# Seconds without new actions before the background writer syncs to disk,
+# and the longest a record waits for a sync while actions keep coming
+AUTOSAVE_DELAY = 0.5
+AUTOSAVE_MAX_DELAY = 2.0
+
+# Seconds between the background writer's checks for records other instances saved
+POLL_INTERVAL = 0.5
+
+# Seconds between attempts to take a VersionLock held by another process (Windows)
+LOCK_RETRY = 0.01
+
+# Data files with these extensions use the SQLite backend
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Data files with these extensions keep their snapshot in the binary format
+BINARY_EXTENSIONS = ('.todo',)
+
+# "Data files" starting with this are the address of a todo_sync server (todo://host:port)
+SYNC_SCHEME = 'todo://'
+
+TASK_COLUMNS = ('task_id', 'description', 'created', 'completed_count', 'skipped_count')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    position REAL NOT NULL,
+    description TEXT NOT NULL,
+    created TEXT,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    skipped_count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_position ON tasks(position);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    day TEXT,
+    task_id TEXT,
+    outcome TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    time INTEGER
+);
+CREATE INDEX IF NOT EXISTS events_day ON events(day, outcome);
+CREATE INDEX IF NOT EXISTS events_task ON events(task_id, outcome);
+"""
+
+
+def open_storage(data_file, **options):
+    """Pick the storage backend for data_file by its extension, or a sync server's address"""
+    if data_file.startswith(SYNC_SCHEME):
+        # Only clients of a sync server need its sockets and threads
+        from todo_sync import RemoteStorage
+        return RemoteStorage(data_file, **options)
+    extension = os.path.splitext(data_file)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SqliteStorage(data_file, **options)
+    if extension in BINARY_EXTENSIONS:
+        return BinarySnapshotStorage(data_file, **options)
+    return JournalStorage(data_file, **options)
+
+
+def atomic_write_json(path, data, **dump_args):
+    """Write data as JSON to a temp file and rename it over path
+
+    The rename is atomic, so a crash leaves either the old or the new file
+    in place, never a truncated one.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, **dump_args)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def file_identity(path):
+    """(device, inode) of the file at path, None when there is none"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def read_records(path, offset=0):
+    """Complete journal records of path from offset on, and the offset after the last one"""
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            offset += len(line)
+    return records, offset
+
+
+def first_seq(path):
+    """Number of the first record in the journal at path, None when it has none (or there is no file)
+
+    Tells journal files apart where an inode cannot, since it is reused:
+    a journal started after a compaction begins after the compacted records.
+    """
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    try:
+        return json.loads(line)['s'] if line.endswith(b'\n') else None
+    except ValueError:
+        return None
+
+
+def take(order, index, task_id):
+    """Remove task_id from the list order, normally found at index; False when it is not there
+
+    Another instance may have moved or removed the task since the record was written.
+    """
+    if index < len(order) and order[index] == task_id:
+        del order[index]
+        return True
+    if task_id in order:
+        order.remove(task_id)
+        return True
+    return False
+
+
+class VersionLock:
+    """Lock on a file shared by every process using a data file, holding its version
+
+    The version is the sequence number of the newest journal record, so
+    comparing it with the last record read is a cheap check for records
+    written elsewhere. The file also counts the compactions, so one whose
+    snapshot is written in the background can tell whether another one
+    went ahead meanwhile. The lock is held around each journal write and
+    compaction. It is re-entrant within a thread and also keeps out the
+    other threads of this process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock, returns False when blocking is off and someone else holds it"""
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            try:
+                locked = self._lock_file(blocking)
+            except BaseException:
+                self.thread_lock.release()
+                raise
+            if not locked:
+                self.thread_lock.release()
+                return False
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self._unlock_file()
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _lock_file(self, blocking):
+        if self._file is None:
+            self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            return True
+        # msvcrt locks byte ranges; the first byte stands for the whole file
+        while True:
+            self._file.seek(0)
+            try:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(LOCK_RETRY)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self):
+        """(version, generation) stored in the file, zeros for a new file"""
+        self._file.seek(0)
+        fields = [int(field) if field.isdigit() else 0 for field in self._file.read(64).split()]
+        return (fields + [0, 0])[:2]
+
+    def version(self):
+        """Stored version, 0 for a new file; call with the lock held"""
+        return self._read()[0]
+
+    def generation(self):
+        """Number of compactions that went ahead; call with the lock held"""
+        return self._read()[1]
+
+    def set_version(self, version, generation=None):
+        """Store version (and generation, by default the stored one); call with the lock held"""
+        if generation is None:
+            generation = self.generation()
+        self._file.truncate(0)
+        self._file.write(f"{version} {generation}".encode())
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None and self.depth == 0:
+            self._file.close()
+            self._file = None
+
+
+class JournalStorage:
+    """JSON snapshot plus an append-only journal of actions
+
+    Every action is appended to ``<data file>.journal`` as one compact JSON
+    line tagged with a sequence number, so saving costs O(change) instead of
+    rewriting the whole data file. The journal is fsync'd every
+    ``sync_every`` records (and on ``flush``), so a crash loses at most the
+    last unsynced batch.
+
+    Once ``compact_every`` records have accumulated, the active journal is
+    rotated and a background thread writes a fresh snapshot (tagged with
+    the last sequence number it contains) via write-to-temp + atomic
+    rename, then deletes the rotated journal. On load, records already
+    covered by the snapshot are skipped, so a crash at any point during
+    compaction is harmless.
+
+    Several processes (app windows, the command line) can share the files.
+    Records are written under a VersionLock on ``<data file>.lock`` and
+    numbered after the newest record of any of them, so the journal holds
+    one sequence of everyone's actions, and changes() returns the records
+    written since the last call for TodoCore.refresh to merge. A compaction
+    only goes ahead when its snapshot includes every record in the journal,
+    and keeps the compacted journal as ``.journal.old`` so that another
+    instance that has not read all of it yet can finish.
+    """
+
+    def __init__(self, data_file, sync_every=1, compact_every=COMPACT_EVERY):
+        self.data_file = data_file
+        base = os.path.splitext(data_file)[0]
+        self.journal_file = base + '.journal'
+        self.rotated_file = self.journal_file + '.1'
+        self.previous_file = self.journal_file + '.old'
+        self.file_lock = VersionLock(base + '.lock')
+        self.sync_every = sync_every
+        self.compact_every = compact_every
+
+        self.seq = 0  # Sequence number of the newest record written here or read
+        self.unsynced = 0
+        self.since_compact = 0
+        self._journal = None
+        self._journal_identity = None
+        self._compactor = None
+
+        self.own = set()  # Sequence numbers of records written here, until a compaction covers them
+        self.covered = 0  # Newest record in the last snapshot written here
+        # changes() reads on after merged_seq, at (first record number of the journal, offset)
+        self.merged_seq = 0
+        self._read_from = (None, 0)
+
+    def load_snapshot(self):
+        """Return the snapshot dict, or None when there is no data file"""
+        self.seq = 0  # The whole journal is replayed on top of no data file
+        if not os.path.exists(self.data_file):
+            return None
+        with open(self.data_file, 'r') as f:
+            data = json.load(f)
+        self.seq = data.get('journal_seq', 0)
+        return data
+
+    def replay(self):
+        """Yield journal records not yet included in the snapshot, oldest first
+
+        Call with the lock held (as TodoCore.load_data does), so no other
+        instance writes or compacts halfway through.
+        """
+        snapshot_seq = self.covered = self.seq
+        self._read_from = (None, 0)
+        for path in (self.rotated_file, self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                good_end = 0
+                first = None
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    good_end += len(line)
+                    if first is None:
+                        first = record['s']
+                    if record['s'] <= snapshot_seq:
+                        continue
+                    self.seq = record['s']
+                    self.since_compact += 1
+                    yield record
+                torn = f.seek(0, os.SEEK_END) > good_end
+            if torn:
+                # Torn write from a crash; drop it so new records start on a fresh line
+                os.truncate(path, good_end)
+            if path == self.journal_file:
+                self._read_from = (first, good_end)
+        with self.file_lock:
+            self.seq = self.merged_seq = max(self.seq, self.file_lock.version())
+
+    def append(self, record):
+        """Append one action record to the journal, numbered after the newest record of any instance"""
+        with self.file_lock:
+            if self._journal is not None and file_identity(self.journal_file) != self._journal_identity:
+                # Another instance compacted it
+                self._journal.close()
+                self._journal = None
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a')
+                stat = os.fstat(self._journal.fileno())
+                self._journal_identity = (stat.st_dev, stat.st_ino)
+            self.seq = max(self.seq, self.file_lock.version()) + 1
+            record['s'] = self.seq
+            self._journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+            # Readable by the other instances once the lock is released; the fsync can wait
+            self._journal.flush()
+            self.file_lock.set_version(self.seq)
+            self.own.add(self.seq)
+        self.unsynced += 1
+        self.since_compact += 1
+        if self.unsynced >= self.sync_every:
+            self.flush()
+
+    def flush(self):
+        """Force journal records to disk"""
+        if self._journal is not None and self.unsynced:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self.unsynced = 0
+            # Closed between bursts of records, since Windows cannot rename an
+            # open file when another instance compacts
+            self._journal.close()
+            self._journal = None
+
+    def changes(self):
+        """Records other instances wrote since the last load or call, oldest first
+
+        Returns [] straight away when the version shows no new records, or
+        only records written here, or when another instance holds the lock
+        (call again later). Returns None when some records cannot be read
+        any more, because they were compacted into a snapshot this instance
+        has not loaded; the data file then has to be loaded again.
+        """
+        if not self.file_lock.acquire(blocking=False):
+            return []
+        try:
+            version = self.file_lock.version()
+            # Those up to covered are in a snapshot written here, so they are all this instance's
+            wanted = {seq for seq in range(max(self.merged_seq, self.covered) + 1, version + 1)
+                      if seq not in self.own}
+            if wanted:
+                changes = self._read_changes(wanted)
+                if len(changes) < len(wanted):
+                    return None
+            else:
+                # Nothing to read; the next read starts further back and skips these
+                changes = []
+            self.seq = max(self.seq, version)
+            self.merged_seq = max(self.merged_seq, version)
+            return changes
+        finally:
+            self.file_lock.release()
+
+    def _read_changes(self, wanted):
+        """Records numbered in the set wanted, read on from where the last read stopped"""
+        first, offset = self._read_from
+        current = first_seq(self.journal_file)
+        records = {}
+        if first is None or current != first:
+            # Compacted by another instance since (or there was no journal yet): finish the
+            # journal being read, then read the ones started after it from the beginning
+            for path in (self.previous_file, self.rotated_file):
+                kept = first_seq(path)
+                if kept is not None and (first is None or kept >= first):
+                    for record in read_records(path, offset if kept == first else 0)[0]:
+                        records[record['s']] = record
+            offset = 0
+        if current is not None:
+            new, offset = read_records(self.journal_file, offset)
+            for record in new:
+                records[record['s']] = record
+        self._read_from = (current, offset)
+        return [records[seq] for seq in sorted(records) if seq in wanted]
+
+    @property
+    def needs_compaction(self):
+        return self.since_compact >= self.compact_every and not self.compacting
+
+    @property
+    def compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def compact(self, snapshot, background=True, merged=None):
+        """Write snapshot() (the state after the last record) as the new data file
+
+        merged is the newest record of other instances that the snapshot
+        includes (by default the last one changes() returned). When others
+        wrote records after it, the snapshot would lose them, so the journal
+        is left alone until the next compaction. The dict returned by
+        snapshot must not be mutated afterwards when compacting in the
+        background.
+        """
+        self.wait()
+        self.flush()
+        self.since_compact = 0
+        merged = self.merged_seq if merged is None else merged
+        with self.file_lock:
+            version = self.file_lock.version()
+            if any(seq not in self.own for seq in range(max(merged, self.covered) + 1, version + 1)):
+                return
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.journal_file):
+                if os.path.exists(self.rotated_file):
+                    # A crashed compaction left this behind, keep its records
+                    with open(self.rotated_file, 'a') as rotated, open(self.journal_file, 'r') as active:
+                        rotated.write(active.read())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.rotated_file)
+
+            data = snapshot()
+            data['journal_seq'] = self.covered = max(version, self.seq)
+            self.own = {seq for seq in self.own if seq > self.covered}
+            # Lets the writing step notice another instance compacting in between
+            generation = self.file_lock.generation() + 1
+            self.file_lock.set_version(version, generation)
+        if background:
+            self._compactor = threading.Thread(target=self._write_snapshot, args=(data, generation), daemon=True)
+            self._compactor.start()
+        else:
+            self._write_snapshot(data, generation)
+
+    def _write_snapshot(self, data, generation):
+        with self.file_lock:
+            if self.file_lock.generation() != generation:
+                return  # Superseded by another instance's compaction, which included these records
+            self.write_data_file(data)
+            if os.path.exists(self.rotated_file):
+                os.replace(self.rotated_file, self.previous_file)
+
+    def write_data_file(self, data):
+        atomic_write_json(self.data_file, data, separators=(',', ':'), default=json_default)
+
+    def import_data(self, data):
+        """Replace the data file (and drop the journal) with data in the JSON layout"""
+        self.wait()
+        with self.file_lock:
+            self.compact(lambda: dict(data), background=False, merged=self.file_lock.version())
+
+    def wait(self):
+        """Block until a running background compaction has finished"""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self):
+        """Flush and close the journal"""
+        self.wait()
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.file_lock.close()
+
+
+class BinarySnapshotStorage(JournalStorage):
+    """JournalStorage with the snapshot in the binary format of todo_snapshot
+
+    The snapshot is memory-mapped on load and its tasks are decoded as the
+    queue first touches them. A JSON data file under a binary extension is
+    still read, and written in the binary format on the next compaction.
+    """
+
+    def __init__(self, data_file, **options):
+        super().__init__(data_file, **options)
+        self._mapped = None
+
+    def load_snapshot(self):
+        self.seq = 0
+        if not os.path.exists(self.data_file):
+            return None
+        if not is_snapshot(self.data_file):
+            return super().load_snapshot()
+        data = read_snapshot(self.data_file)
+        self._mapped = data['tasks']
+        self.seq = data['journal_seq']
+        return data
+
+    def write_data_file(self, data):
+        # A snapshot copies every task, so nothing reads the old map any more;
+        # unmap it, since Windows cannot replace a mapped file
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        write_snapshot(self.data_file, data)
+
+
+class SqliteStorage:
+    """SQLite database with one row per task and one per done/skip event
+
+    Tasks are keyed by ``task_id`` and kept in queue order by a sparse
+    ``position`` column, so moving a task only rewrites that task's row.
+    Events are indexed by day for the daily totals and by task for undo.
+    Every action record is applied as a small UPDATE/INSERT and committed
+    every ``sync_every`` records; the database runs in WAL mode.
+
+    Days or totals imported from JSON data without per-event detail are
+    stored as events with a count and a NULL task_id (or day). Events
+    without a time are placed at the start of their day.
+
+    Other processes can use the database at the same time: SQLite locks it
+    for each write, counters are updated in place and tasks are found by
+    ID, so their actions and these merge. changes() notices their commits
+    through ``PRAGMA data_version``.
+    """
+
+    needs_compaction = False
+
+    # SQLite does its own locking between processes
+    file_lock = contextlib.nullcontext()
+    merged_seq = None  # Every action is applied to the tables in place, so there is nothing to order
+
+    def __init__(self, data_file, sync_every=1):
+        self.data_file = data_file
+        self.sync_every = sync_every
+        self.unsynced = 0
+        # Held while the connection is in use, so changes() can run on another thread
+        self.conn_lock = threading.Lock()
+        self.data_version = None
+        self.stale = False  # A task added here took another ID, so the tables differ from what was loaded
+        # BackgroundWriter moves the writes to its worker thread; the
+        # connection is only ever used by one thread at a time
+        self.conn = sqlite3.connect(data_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        # Databases created before events had a time
+        if 'time' not in [row[1] for row in self.conn.execute('PRAGMA table_info(events)')]:
+            self.conn.execute('ALTER TABLE events ADD COLUMN time INTEGER')
+
+    def load_snapshot(self):
+        """Return all tasks in queue order plus statistics, or None when empty"""
+        self.data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        self.stale = False
+        tasks = []
+        for row in self.conn.execute(
+                f"SELECT {', '.join(TASK_COLUMNS)}, extra FROM tasks ORDER BY position"):
+            task = dict(zip(TASK_COLUMNS, row))
+            if task['created'] is None:
+                del task['created']  # Missing, or kept among the extra keys when not text
+            extra = row[-1]
+            if extra:
+                task.update(json.loads(extra))
+            tasks.append(task)
+        if not tasks and self.conn.execute('SELECT 1 FROM events LIMIT 1').fetchone() is None:
+            return None
+        return {'tasks': tasks, 'statistics': self.statistics()}
+
+    def statistics(self):
+        """Statistics in the JSON layout, aggregated with indexed queries"""
+        totals = dict(self.conn.execute(
+            'SELECT outcome, SUM(count) FROM events GROUP BY outcome'))
+        return {
+            'daily': self.daily_counts(),
+            'weekly': {},
+            'monthly': {},
+            'total_done': totals.get('done', 0),
+            'total_skipped': totals.get('skip', 0),
+            'events': self.event_columns()
+        }
+
+    def event_columns(self):
+        """Dated events in the EventLog column layout, one row per counted event
+
+        The columns are packed arrays (8, 4 and 1 bytes per event), not
+        lists of ints, since a row with a count (a day imported without
+        per-event detail) stands for that many events.
+        """
+        task_ids, codes = [], {}
+        times, tasks, outcomes = array('q'), array('i'), array('b')
+        for seconds, task_id, outcome, count in self.conn.execute(
+                "SELECT COALESCE(time, CAST(strftime('%s', day) AS INTEGER)), task_id, outcome, count"
+                " FROM events WHERE day IS NOT NULL ORDER BY id"):
+            if task_id is None:
+                code = -1
+            elif task_id in codes:
+                code = codes[task_id]
+            else:
+                code = codes[task_id] = len(task_ids)
+                task_ids.append(task_id)
+            outcome = OUTCOMES.index(outcome)
+            if count == 1:
+                times.append(seconds)
+                tasks.append(code)
+                outcomes.append(outcome)
+            else:
+                times.extend(repeat(seconds, count))
+                tasks.extend(repeat(code, count))
+                outcomes.extend(repeat(outcome, count))
+        return {'task_ids': task_ids, 'time': times, 'task': tasks, 'outcome': outcomes}
+
+    def daily_counts(self, outcome='done'):
+        """Map of day to count"""
+        return dict(self.conn.execute(
+            'SELECT day, SUM(count) FROM events WHERE outcome = ? AND day IS NOT NULL GROUP BY day',
+            (outcome,)))
+
+    def replay(self):
+        """Every action is already applied to the tables"""
+        return iter(())
+
+    def changes(self):
+        """[] when no other connection committed since the load or last call, else None (load again)
+
+        Also [] while the connection is busy writing, to be asked again later.
+        """
+        if self.stale:
+            return None
+        if not self.conn_lock.acquire(blocking=False):
+            return []
+        try:
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        finally:
+            self.conn_lock.release()
+        changed = self.data_version is not None and version != self.data_version
+        self.data_version = version
+        return None if changed else []
+
+    def _task_id_at(self, index):
+        row = self.conn.execute(
+            'SELECT task_id FROM tasks ORDER BY position LIMIT 1 OFFSET ?', (index,)).fetchone()
+        return row[0]
+
+    def _position_for(self, index, exclude=None):
+        """Position that puts a task at index among the other tasks"""
+        rows = [row[0] for row in self.conn.execute(
+            'SELECT position FROM tasks WHERE task_id IS NOT ? ORDER BY position LIMIT 2 OFFSET ?',
+            (exclude, max(index - 1, 0)))]
+        if not rows:
+            return 0.0 if index == 0 else self._end_position(exclude)
+        if index == 0:
+            return rows[0] - 1.0
+        if len(rows) == 1:
+            return rows[0] + 1.0
+        position = (rows[0] + rows[1]) / 2
+        if position in rows:
+            # Ran out of float precision between neighbours, spread everything out
+            self._renumber()
+            return self._position_for(index, exclude)
+        return position
+
+    def _end_position(self, exclude=None):
+        row = self.conn.execute(
+            'SELECT MAX(position) FROM tasks WHERE task_id IS NOT ?', (exclude,)).fetchone()
+        return 0.0 if row[0] is None else row[0] + 1.0
+
+    def _renumber(self):
+        task_ids = [row[0] for row in self.conn.execute('SELECT task_id FROM tasks ORDER BY position')]
+        self.conn.executemany('UPDATE tasks SET position = ? WHERE task_id = ?',
+                              [(float(i), task_id) for i, task_id in enumerate(task_ids)])
+
+    def _insert_task(self, position, task):
+        self._insert_tasks([(position, task)])
+
+    def _insert_tasks(self, placed):
+        """Insert (position, task) pairs"""
+        rows = []
+        for position, task in placed:
+            created = task.get('created')
+            # Like the binary snapshot, keeps a created time that is not text among the extra keys
+            extra = {key: value for key, value in task.items()
+                     if key not in TASK_COLUMNS or key == 'created' and not isinstance(created, str)}
+            rows.append((task['task_id'], position, task['description'],
+                         created if isinstance(created, str) else None,
+                         task.get('completed_count', 0), task.get('skipped_count', 0),
+                         json.dumps(extra) if extra else None))
+        self.conn.executemany(
+            'INSERT INTO tasks (task_id, position, description, created, completed_count, skipped_count, extra)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _insert_events(self, events):
+        """Insert (time, task_id, outcome) events"""
+        self.conn.executemany('INSERT INTO events (day, task_id, outcome, time) VALUES (?, ?, ?, ?)',
+                              [(time.strftime('%Y-%m-%d', time.gmtime(seconds)), task_id, outcome, seconds)
+                               for seconds, task_id, outcome in events])
+
+    def _set_plan(self, task_id, plan):
+        """Store a task's (priority, due day) among its extra keys"""
+        row = self.conn.execute('SELECT extra FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        extra = json.loads(row[0]) if row and row[0] else {}
+        for key, value in zip(('priority', 'due'), plan):
+            if value:
+                extra[key] = value
+            else:
+                extra.pop(key, None)
+        self.conn.execute('UPDATE tasks SET extra = ? WHERE task_id = ?',
+                          (json.dumps(extra) if extra else None, task_id))
+
+    def _free_id(self):
+        """The task ID TodoCore would give a new task"""
+        ids = TaskIdAllocator()
+        ids.reset(row[0] for row in self.conn.execute('SELECT task_id FROM tasks'))
+        return ids.allocate()
+
+    def _move(self, task_id, position):
+        self.conn.execute('UPDATE tasks SET position = ? WHERE task_id = ?', (position, task_id))
+
+    def append(self, record):
+        """Apply one action record (see TodoCore._encode) to the tables"""
+        with self.conn_lock:
+            self._apply(record, bool(record.get('u')))
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.flush()
+
+    def _apply(self, record, undo, order=None):
+        """Apply one record; inside a batch, order is the task_id list kept in queue order"""
+        action = record['a']
+        if action == 'import':
+            start = self._end_position()
+            self._insert_tasks([(start + i, task) for i, task in enumerate(record['tasks'])])
+            self._insert_events(record['events'])
+            return
+        if action == 'batch':
+            # Positions found with OFFSET queries cost O(n) per part, so the
+            # parts are placed in an in-memory copy of the queue order and
+            # the positions are rewritten once at the end
+            order = [row[0] for row in self.conn.execute('SELECT task_id FROM tasks ORDER BY position')]
+            # Parts refer to the queue as the previous part left it
+            for part in (reversed(record['b']) if undo else record['b']):
+                self._apply(part, undo, order)
+            self.conn.executemany('UPDATE tasks SET position = ? WHERE task_id = ?',
+                                  [(float(i), task_id) for i, task_id in enumerate(order)])
+            return
+        index = record['i']
+        if action in ('add', 'delete'):
+            task = record['t']
+            if (action == 'add') == bool(undo):
+                self.conn.execute('DELETE FROM tasks WHERE task_id = ?', (task['task_id'],))
+                if order is not None:
+                    take(order, index, task['task_id'])
+            else:
+                if self.conn.execute('SELECT 1 FROM tasks WHERE task_id = ?', (task['task_id'],)).fetchone():
+                    # Another instance added a task under the same ID first
+                    task = dict(task, task_id=self._free_id())
+                    self.stale = True
+                if order is not None:
+                    self._insert_task(0.0, task)
+                    order.insert(index, task['task_id'])
+                else:
+                    self._insert_task(self._position_for(index), task)
+        elif action == 'edit':
+            task_id = record.get('id') or (order[index] if order is not None else self._task_id_at(index))
+            self.conn.execute('UPDATE tasks SET description = ? WHERE task_id = ?',
+                              (record['old'] if undo else record['new'], task_id))
+        elif action == 'plan':
+            task_id = record.get('id') or (order[index] if order is not None else self._task_id_at(index))
+            self._set_plan(task_id, record['old'] if undo else record['new'])
+        elif action == 'move':
+            old_index, new_index = (record['j'], index) if undo else (index, record['j'])
+            if order is not None:
+                task_id = record.get('id') or order[old_index]
+                if take(order, old_index, task_id):
+                    order.insert(new_index, task_id)
+            else:
+                task_id = record.get('id') or self._task_id_at(old_index)
+                self._move(task_id, self._position_for(new_index, exclude=task_id))
+        elif action in ('done', 'skip'):
+            task_id, day = record['id'], record['d']
+            column = 'completed_count' if action == 'done' else 'skipped_count'
+            if undo:
+                self.conn.execute(f'UPDATE tasks SET {column} = {column} - 1 WHERE task_id = ?', (task_id,))
+                self.conn.execute(
+                    'DELETE FROM events WHERE id = (SELECT MAX(id) FROM events'
+                    ' WHERE task_id = ? AND outcome = ? AND day = ?)', (task_id, action, day))
+                if order is not None:
+                    if take(order, len(order) - 1, task_id):
+                        order.insert(index, task_id)
+                else:
+                    self._move(task_id, self._position_for(index, exclude=task_id))
+            else:
+                self.conn.execute(f'UPDATE tasks SET {column} = {column} + 1 WHERE task_id = ?', (task_id,))
+                self.conn.execute('INSERT INTO events (day, task_id, outcome, time) VALUES (?, ?, ?, ?)',
+                                  (day, task_id, action, record.get('ts')))
+                if order is not None:
+                    if take(order, index, task_id):
+                        order.append(task_id)
+                else:
+                    self._move(task_id, self._end_position(exclude=task_id))
+
+    def flush(self):
+        """Commit pending writes"""
+        if self.unsynced:
+            with self.conn_lock:
+                self.conn.commit()
+            self.unsynced = 0
+
+    def compact(self, snapshot, background=True, merged=None):
+        """Commit and fold the WAL back into the database file"""
+        self.flush()
+        if not background:
+            with self.conn_lock:
+                self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def wait(self):
+        pass
+
+    def close(self):
+        """Commit and close the database"""
+        self.flush()
+        with self.conn_lock:
+            self.conn.close()
+
+    def import_data(self, data):
+        """Replace the database contents with data in the JSON layout"""
+        with self.conn:
+            self.conn.execute('DELETE FROM tasks')
+            self.conn.execute('DELETE FROM events')
+            self._insert_tasks([(float(position), task) for position, task in enumerate(data.get('tasks', []))])
+
+            statistics = data.get('statistics', {})
+            events = statistics.get('events', {'task_ids': [], 'time': [], 'task': [], 'outcome': []})
+            task_ids = events['task_ids']
+            rows = [(time.strftime('%Y-%m-%d', time.gmtime(seconds)), task_ids[code] if code >= 0 else None,
+                     OUTCOMES[outcome], seconds)
+                    for seconds, code, outcome in zip(events['time'], events['task'], events['outcome'])]
+            self.conn.executemany('INSERT INTO events (day, task_id, outcome, time) VALUES (?, ?, ?, ?)', rows)
+            dated = {outcome: sum(1 for row in rows if row[2] == outcome) for outcome in OUTCOMES}
+            # Totals not covered by a dated event are kept as undated events
+            undated = {
+                'done': statistics.get('total_done', 0) - dated['done'],
+                'skip': statistics.get('total_skipped', 0) - dated['skip']
+            }
+            for outcome, count in undated.items():
+                if isinstance(count, int) and count > 0:
+                    self.conn.execute('INSERT INTO events (outcome, count) VALUES (?, ?)', (outcome, count))
+
+
+class BackgroundWriter:
+    """Runs a storage backend's disk writes on a worker thread
+
+    Has the interface TodoCore uses, so it can stand in for JournalStorage
+    or SqliteStorage (see TodoCore.write_in_background). append() and
+    compact() only queue work, so the calling (Tk) thread never waits on
+    disk I/O; records must not be mutated after they are appended. The
+    worker writes records as they arrive but syncs (fsync or commit) only
+    once no record came for ``delay`` seconds, or ``max_delay`` after the
+    oldest unsynced one, so a burst of actions costs one sync. Compaction
+    snapshots are taken by the caller, so they match the queued records,
+    and copied and written by the worker (see TodoCore.frozen_snapshot).
+
+    Reads run on the worker too. It asks the storage for other instances'
+    records every ``poll_every`` seconds (and on wait()) and keeps them,
+    so changes() hands them over without touching the disk (or the
+    network); loading the data file is queued and waited for like a
+    sync, with the storage's lock taken by the worker.
+
+    status() reports pending writes, the time of the last completed sync
+    and the last error, for a status bar to poll.
+    """
+
+    # The worker takes the storage's lock around a load itself
+    file_lock = contextlib.nullcontext()
+
+    def __init__(self, storage, delay=AUTOSAVE_DELAY, max_delay=AUTOSAVE_MAX_DELAY, poll_every=POLL_INTERVAL):
+        self.storage = storage
+        self.delay = delay
+        self.max_delay = max_delay
+        self.poll_every = poll_every
+        storage.sync_every = float('inf')  # The worker decides when to sync
+        self.compact_every = getattr(storage, 'compact_every', None)
+        self.since_compact = 0
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = 0  # Queued or unsynced records
+        self.saved_at = None
+        self.error = None
+        # Polled by the worker until changes() takes them: records of other
+        # instances, whether the data file must be loaded again, and the
+        # storage's merged_seq after the last poll
+        self.incoming = []
+        self.reload = False
+        self.polled_seq = self.merged_seq = storage.merged_seq
+        self.replayed = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def load_snapshot(self):
+        """Load the data file on the worker, after the queued writes (see TodoCore.load_data)
+
+        The journal records to replay are read along with it, under the
+        same lock, for replay() to return.
+        """
+        return self._call(self._load)
+
+    def _load(self):
+        with self.storage.file_lock:
+            data = self.storage.load_snapshot()
+            self.replayed = list(self.storage.replay())
+        with self.lock:
+            self.incoming = []
+            self.reload = False
+            self.polled_seq = self.merged_seq = self.storage.merged_seq
+        return data
+
+    def replay(self):
+        replayed, self.replayed = self.replayed, []
+        return iter(replayed)
+
+    def changes(self):
+        """Records of other instances the worker has read since the last call (see JournalStorage.changes)
+
+        None when the data file has to be loaded again. Never waits for
+        the worker.
+        """
+        with self.lock:
+            if self.reload:
+                self.incoming = []
+                self.reload = False
+                return None
+            changes, self.incoming = self.incoming, []
+            # Only records handed over count as merged (see TodoCore.refresh)
+            self.merged_seq = self.polled_seq
+        return changes
+
+    def _poll(self):
+        """Read other instances' records on the worker and keep them for changes()"""
+        try:
+            changes = self.storage.changes()
+        except Exception:
+            return  # Nothing new this time; the next poll tries again
+        with self.lock:
+            if changes is None:
+                self.reload = True
+            elif not self.reload:
+                self.incoming += changes
+                self.polled_seq = self.storage.merged_seq
+
+    @property
+    def needs_compaction(self):
+        return self.compact_every is not None and self.since_compact >= self.compact_every
+
+    def append(self, record):
+        """Queue one action record"""
+        with self.lock:
+            self.pending += 1
+        self.since_compact += 1
+        self.queue.put(('append', record))
+
+    def flush(self):
+        """Sync everything queued so far and wait for it, raises OSError on failure"""
+        self._request('sync', None, wait=True)
+        if self.error is not None:
+            raise OSError(self.error)
+
+    def sync(self):
+        """Ask the worker to sync now without waiting for it"""
+        self._request('sync', None)
+
+    def compact(self, snapshot, background=True):
+        """Take the snapshot now (which copies nothing up front) and have the worker write it"""
+        data = snapshot()
+        # Records of other instances merged so far are in the snapshot
+        merged = self.merged_seq
+        self.since_compact = 0
+        self._request('compact', (data, merged), wait=not background)
+
+    def wait(self):
+        """Block until all queued work is done and the records other instances saved so far are read"""
+        self._request('poll', None, wait=True)
+
+    def close(self):
+        """Finish the queued work, close the storage and stop the worker, raises OSError on failure"""
+        if self.thread.is_alive():
+            self._request('close', None, wait=True)
+            self.thread.join()
+        if self.error is not None:
+            raise OSError(self.error)
+
+    def status(self):
+        """(pending records, datetime of the last sync, last error message or None)"""
+        with self.lock:
+            return self.pending, self.saved_at, self.error
+
+    def _request(self, operation, argument, wait=False):
+        done = threading.Event() if wait else None
+        self.queue.put((operation, (argument, done)))
+        if done is not None:
+            done.wait()
+
+    def _call(self, function):
+        """Run function on the worker after the queued work and return its result (or raise its error)"""
+        outcome = {}
+        self._request('call', (function, outcome), wait=True)
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _run(self):
+        unsynced = 0
+        oldest = last = None
+        next_poll = None if self.poll_every is None else time.monotonic() + self.poll_every
+        while True:
+            deadlines = [] if next_poll is None else [next_poll]
+            if unsynced:
+                deadlines.append(min(last + self.delay, oldest + self.max_delay))
+            timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            try:
+                operation, argument = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                if next_poll is not None and time.monotonic() >= next_poll:
+                    self._poll()
+                    next_poll = time.monotonic() + self.poll_every
+                    continue
+                operation, argument = 'sync', (None, None)
+
+            if operation == 'append':
+                try:
+                    self.storage.append(argument)
+                except Exception as e:
+                    self._synced(0, str(e))
+                unsynced += 1
+                last = time.monotonic()
+                if oldest is None:
+                    oldest = last
+                continue
+            argument, done = argument
+            try:
+                if operation == 'compact':
+                    data, merged = argument
+                    self.storage.compact(lambda: data, background=False, merged=merged)
+                self.storage.flush()
+                if operation == 'close':
+                    self.storage.close()
+                self._synced(unsynced, None)
+            except Exception as e:
+                self._synced(unsynced, str(e))
+            unsynced = 0
+            oldest = last = None
+            if operation == 'call':
+                function, outcome = argument
+                try:
+                    outcome['result'] = function()
+                except Exception as e:
+                    outcome['error'] = e
+            elif operation == 'poll':
+                self.storage.wait()
+                self._poll()
+            if done is not None:
+                done.set()
+            if operation == 'close':
+                return
+
+    def _synced(self, count, error):
+        with self.lock:
+            self.pending -= count
+            self.error = error
+            if error is None:
+                self.saved_at = datetime.now()
+
+
+def migrate(source, destination):
+    """One-shot copy of a data file (and its journal) into another, backends picked by extension
+
+    Converts between JSON, binary snapshot (.todo) and SQLite (.db) data
+    files in any direction.
+    """
+    from todo_core import TodoCore
+
+    core = TodoCore(source)
+    core.load_data()
+    storage = open_storage(destination)
+    storage.import_data(core.snapshot())
+    storage.close()
+    return len(core.tasks)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != 'migrate':
+        sys.exit("usage: python todo_storage.py migrate <source data file> <destination data file>")
+    print(f"Migrated {migrate(sys.argv[2], sys.argv[3])} tasks to {sys.argv[3]}")
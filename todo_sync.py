@@ -0,0 +1,506 @@
+"""Local sync server sharing one task queue between app windows and scripts
+
+The server owns the data file: it loads it into a TodoCore and applies
+what its clients send. Start it, then give the app or the command line its
+address instead of a data file:
+
+    python todo_sync.py todo_data.json              # todo://127.0.0.1:8765
+    python todo.py todo://127.0.0.1:8765
+    python todo_cli.py --data todo://127.0.0.1:8765 add Water the plants
+
+The protocol is one JSON object per line over a TCP connection that a
+client keeps open:
+
+    {"op": "snapshot"}                    -> {"op": "snapshot", "version": 7, "data": {...}}
+    {"op": "append", "records": [...]}    -> {"op": "ack", "seqs": [8, 9], "reload": false}
+                                             {"op": "error", "error": "...", "count": 2}
+    {"op": "ping", "id": 3}               -> {"op": "pong", "id": 3}
+
+Records are the journal records TodoCore writes (see todo_storage), so a
+client applies its actions at once and sends a batch of them; the server
+merges them by task ID (TodoCore.merge_records), numbers them and pushes
+them to every other client as {"op": "changes", "records": [...]}. Every
+connection sees the same order, so the clients' own and other records
+merge like journal records of instances sharing a data file (see
+TodoCore.refresh). A client whose new task got another ID, because a
+task of another client took the ID first, is told to reload ("reload" in
+the acknowledgement). The server is a single asyncio loop, so hundreds of
+idle or busy clients cost a socket each; one that stops reading is
+disconnected and loads a fresh snapshot when it reconnects.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from todo_core import DATA_FILE, TodoCore
+from todo_storage import SYNC_SCHEME, open_storage
+from todo_task import json_default
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Seconds after the last applied batch before the server syncs its data file
+SYNC_DELAY = 0.5
+
+# Longest message line the server reads (a batch of records, e.g. an import)
+MAX_MESSAGE = 64 * 1024 * 1024
+
+# Bytes a client may leave unread before the server disconnects it
+MAX_BACKLOG = 16 * 1024 * 1024
+
+# Seconds a client waits for the server to connect, send a snapshot or acknowledge records
+REPLY_TIMEOUT = 10
+
+# Seconds between a client's attempts to reach a server it lost
+RECONNECT_INTERVAL = 1.0
+
+
+def encode(message):
+    """One protocol line"""
+    return json.dumps(message, separators=(',', ':'), default=json_default).encode() + b'\n'
+
+
+def parse_address(url):
+    """(host, port) of a todo://host:port address"""
+    host, _, port = url[len(SYNC_SCHEME):].rstrip('/').rpartition(':')
+    if not host:
+        return (port or HOST, PORT)
+    return (host, int(port))
+
+
+def renamed_record(record, renamed):
+    """record with the task IDs in renamed (old -> new ID) replaced"""
+    if not renamed:
+        return record
+    record = dict(record)
+    if record['a'] == 'batch':
+        record['b'] = [renamed_record(part, renamed) for part in record['b']]
+    elif 't' in record and (record['a'] != 'add' or record.get('u')):
+        # Not a new task
+        record['t'] = dict(record['t'], task_id=renamed.get(record['t']['task_id'], record['t']['task_id']))
+    if record.get('id') in renamed:
+        record['id'] = renamed[record['id']]
+    return record
+
+
+class SyncServer:
+    """Owns a TodoCore and shares its queue with RemoteStorage clients over asyncio streams"""
+
+    def __init__(self, core, sync_delay=SYNC_DELAY):
+        self.core = core
+        self.sync_delay = sync_delay
+        self.version = 0  # Number of the last record applied in this session
+        self.clients = set()  # StreamWriter of every connected client
+        self.handlers = set()  # Their handle_client tasks
+        self.server = None
+        self.loop = None
+        self._thread = None
+        self._sync_handle = None
+
+    async def start(self, host=HOST, port=PORT):
+        """Listen on host:port (0 picks a free port) and return the URL clients connect to"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_MESSAGE)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"{SYNC_SCHEME}{host}:{port}"
+
+    async def run(self, host=HOST, port=PORT):
+        """Serve until cancelled"""
+        url = await self.start(host, port)
+        print(f"Serving {self.core.data_file} on {url}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start_thread(self, host=HOST, port=0):
+        """Serve on a daemon thread with its own loop (for tests and benchmarks); returns the URL"""
+        started = threading.Event()
+        address = []
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            address.append(loop.run_until_complete(self.start(host, port)))
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return address[0]
+
+    def stop_thread(self):
+        """Stop a server started by start_thread and sync the data file"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.core.save_data()
+
+    async def close(self):
+        """Stop listening and disconnect every client"""
+        self.server.close()
+        for writer in self.clients:
+            writer.close()
+        # Each handler ends on the end of its stream
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_client(self, reader, writer):
+        """Answer one client's requests in order until it disconnects"""
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.clients.add(writer)
+        self.handlers.add(asyncio.current_task())
+        # Old -> new ID of the client's tasks that took another ID here, until it loads a snapshot
+        renamed = {}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.handle(line, writer, renamed)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Gone, or a line over MAX_MESSAGE
+        finally:
+            self.clients.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def handle(self, line, writer, renamed):
+        """Carry out one request line"""
+        try:
+            message = json.loads(line)
+            operation = message['op']
+        except (ValueError, KeyError, TypeError):
+            writer.write(encode({'op': 'error', 'error': "Malformed request", 'count': 0}))
+            return
+        if operation == 'snapshot':
+            renamed.clear()
+            writer.write(encode({'op': 'snapshot', 'version': self.version, 'data': self.core.snapshot()}))
+        elif operation == 'append':
+            self.append(message.get('records', []), writer, renamed)
+        elif operation == 'ping':
+            writer.write(encode({'op': 'pong', 'id': message.get('id')}))
+        else:
+            writer.write(encode({'op': 'error', 'error': f"Unknown operation {operation!r}", 'count': 0}))
+
+    def append(self, records, writer, renamed):
+        """Apply a client's records, acknowledge them and push them to the other clients
+
+        Records about a task of the client that took another ID here are
+        applied to that task, and the client is told to reload.
+        """
+        applied = []
+        error = None
+        reload = False
+        for record in records:
+            record = renamed_record(record, renamed)
+            try:
+                new_ids = self.core.merge_records([record])
+            except Exception as e:
+                error = f"Cannot apply record: {e}"
+                break
+            renamed.update(new_ids)
+            reload = reload or bool(new_ids)
+            self.version += 1
+            record['s'] = self.version
+            applied.append(record)
+        if applied:
+            writer.write(encode({'op': 'ack', 'seqs': [record['s'] for record in applied], 'reload': reload}))
+            self.push(applied, writer)
+            if self._sync_handle is None:
+                self._sync_handle = self.loop.call_later(self.sync_delay, self.sync)
+        if error is not None:
+            # The rest are dropped, and the client loads a fresh snapshot
+            writer.write(encode({'op': 'error', 'error': error, 'count': len(records) - len(applied)}))
+
+    def push(self, records, sender):
+        """Send records to every client but their sender"""
+        line = encode({'op': 'changes', 'records': records})
+        for client in list(self.clients):
+            if client is sender:
+                continue
+            if client.transport.get_write_buffer_size() > MAX_BACKLOG:
+                # Not reading: it starts over from a snapshot when it reconnects
+                self.clients.discard(client)
+                client.close()
+                continue
+            client.write(line)
+
+    def sync(self):
+        """Write what the last batches changed to disk"""
+        self._sync_handle = None
+        try:
+            self.core.save_data()
+        except OSError as e:
+            print(f"Failed to save data: {e}")
+
+
+class RemoteStorage:
+    """Storage backend on a SyncServer, used through a todo://host:port data file
+
+    Keeps one connection open, read by a daemon thread. append() collects
+    records and sends them as one batch every ``sync_every`` records or on
+    flush(), which waits for the server to acknowledge them (the
+    BackgroundWriter of the app flushes after a pause in the actions, so a
+    burst of them is one batch). changes() returns the other clients'
+    records the reader thread has received since the last call, in the
+    server's order, without waiting on the network. When the connection
+    is lost, the reader thread reconnects every RECONNECT_INTERVAL seconds
+    until the server is back; the next changes() then returns None so that
+    TodoCore loads a fresh snapshot.
+    """
+
+    needs_compaction = False
+
+    # The server orders the records; it also compacts its own data file
+    file_lock = contextlib.nullcontext()
+
+    def __init__(self, url, sync_every=1):
+        self.data_file = url
+        self.address = parse_address(url)
+        self.sync_every = sync_every
+        self.merged_seq = 0  # Newest record numbered by the server that changes() has returned or numbered
+        self.lock = threading.Condition()
+        self.send_lock = threading.Lock()  # The app sends batches from its writer thread
+        self.sock = None
+        self.connected = False
+        self.stale = False  # The server changed records of this client, so it has to load them again
+        self.error = None
+        self.unsent = []
+        self.sent = deque()  # Records sent, in order, until changes() numbers them
+        self.unacked = 0
+        self.incoming = deque()  # ('ack', seqs) and ('changes', records) in the server's order
+        self.pings = self.pong = 0
+        self._snapshot = None
+
+    def _open(self):
+        sock = socket.create_connection(self.address, timeout=REPLY_TIMEOUT)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _connect(self):
+        """Open a new connection on the calling thread and start its reader thread"""
+        sock = self._open()
+        with self.lock:
+            self._use(sock)
+        threading.Thread(target=self._read, args=(sock,), daemon=True).start()
+
+    def _use(self, sock):
+        """Switch to sock, dropping what the last connection had not finished (with the lock held)"""
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = sock
+        self.connected = True
+        self.error = None
+        self.unacked = 0
+        self.sent.clear()
+        self.incoming.clear()
+
+    def _read(self, sock):
+        """Reader thread: take in the server's messages, and reconnect whenever the connection is lost"""
+        while sock is not None:
+            self._receive(sock)
+            sock = self._reconnect(sock)
+
+    def _reconnect(self, lost):
+        """A new connection once the server is back, or None when the client closed or connected itself"""
+        with self.lock:
+            if self.sock is not lost:
+                return None
+            self.connected = False
+            self.lock.notify_all()
+        while True:
+            time.sleep(RECONNECT_INTERVAL)
+            with self.lock:
+                if self.sock is not lost:
+                    return None
+            try:
+                sock = self._open()
+            except OSError:
+                continue
+            with self.lock:
+                if self.sock is not lost:
+                    sock.close()
+                    return None
+                self._use(sock)
+                # What the server pushed meanwhile is lost, so the queue is loaded again
+                self.stale = True
+            return sock
+
+    def _receive(self, sock):
+        try:
+            for line in sock.makefile('rb'):
+                message = json.loads(line)
+                operation = message['op']
+                with self.lock:
+                    if operation == 'changes':
+                        self.incoming.append(('changes', message['records']))
+                    elif operation == 'ack':
+                        self.incoming.append(('ack', message['seqs']))
+                        self.unacked -= len(message['seqs'])
+                        # Its tasks show under other IDs on the server
+                        self.stale = self.stale or message.get('reload', False)
+                    elif operation == 'pong':
+                        self.pong = message['id']
+                    elif operation == 'snapshot':
+                        # Includes everything pushed before it
+                        self.incoming.clear()
+                        self._snapshot = message
+                    elif operation == 'error':
+                        self.error = message['error']
+                        self.unacked -= message['count']
+                        self.stale = True  # This client's state is off now, load it again
+                    self.lock.notify_all()
+        except (OSError, ValueError):
+            pass
+
+    def _send(self, message):
+        sock = self.sock
+        try:
+            with self.send_lock:
+                sock.sendall(encode(message))
+        except (OSError, AttributeError) as e:
+            with self.lock:
+                if self.sock is sock:
+                    self.connected = False
+            if sock is not None:
+                with contextlib.suppress(OSError):
+                    # Ends the reader thread's read, so it reconnects
+                    sock.shutdown(socket.SHUT_RDWR)
+            raise OSError(f"Lost the sync server: {e}") from None
+
+    def load_snapshot(self):
+        """Ask the server for its data, (re)connecting first"""
+        if self.connected:
+            self.flush()
+        else:
+            self._connect()
+        with self.lock:
+            self._snapshot = None
+        self._send({'op': 'snapshot'})
+        with self.lock:
+            if not self.lock.wait_for(lambda: self._snapshot is not None or not self.connected, REPLY_TIMEOUT):
+                raise OSError("The sync server did not send its data")
+            if self._snapshot is None:
+                raise OSError(f"Lost the sync server{': ' + self.error if self.error else ''}")
+            message, self._snapshot = self._snapshot, None
+            self.merged_seq = message['version']
+            self.stale = False
+        return message['data']
+
+    def replay(self):
+        """The snapshot is up to date"""
+        return iter(())
+
+    def changes(self):
+        """Records of other clients received since the last call, or None when a reload is due (see TodoCore.refresh)
+
+        Only takes what the reader thread has received. None after it
+        reconnected, and after the server gave a task added here another ID
+        or refused a record; [] while the server is away, to keep what is
+        shown until it is back.
+        """
+        changes = []
+        with self.lock:
+            if not self.connected:
+                return []
+            while self.incoming:
+                kind, items = self.incoming.popleft()
+                if kind == 'ack':
+                    for seq in items:
+                        self.sent.popleft()['s'] = seq
+                        self.merged_seq = seq
+                else:
+                    changes += items
+                    self.merged_seq = items[-1]['s']
+        return None if self.stale else changes
+
+    def append(self, record):
+        """Queue one action record for the next batch"""
+        self.unsent.append(record)
+        if len(self.unsent) >= self.sync_every:
+            self.flush()
+
+    def flush(self):
+        """Send the queued records and wait until the server has applied them"""
+        if self.unsent:
+            if not self.connected:
+                raise OSError("Not connected to the sync server")
+            records, self.unsent = self.unsent, []
+            with self.lock:
+                self.sent.extend(records)
+                self.unacked += len(records)
+            self._send({'op': 'append', 'records': records})
+        with self.lock:
+            if not self.lock.wait_for(lambda: self.unacked <= 0 or not self.connected, REPLY_TIMEOUT):
+                raise OSError("The sync server did not acknowledge the records")
+            if self.error is not None:
+                error, self.error = self.error, None  # Reported once; the reload makes up for it
+                raise OSError(error)
+            if self.unacked > 0:
+                raise OSError("Lost the sync server before it acknowledged the records")
+
+    def compact(self, snapshot, background=True, merged=None):
+        """The server compacts its data file"""
+
+    def wait(self):
+        """Block until everything the server pushed before now has arrived
+
+        E.g. a task another client added just before this one adds its
+        own; the next changes() returns it.
+        """
+        if not self.connected:
+            return
+        self.pings += 1
+        try:
+            self._send({'op': 'ping', 'id': self.pings})
+        except OSError:
+            return
+        with self.lock:
+            self.lock.wait_for(lambda: self.pong == self.pings or not self.connected, REPLY_TIMEOUT)
+
+    def close(self):
+        """Send the queued records and disconnect"""
+        try:
+            if self.connected:
+                self.flush()
+        finally:
+            with self.lock:
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+                self.connected = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='todo_sync', description="Share a ToDo data file with app windows "
+                                                                   "and scripts over a local connection")
+    parser.add_argument('data', nargs='?', default=DATA_FILE, help="data file the server owns")
+    parser.add_argument('--host', default=HOST, help=f"address to listen on (default {HOST}, this computer only)")
+    parser.add_argument('--port', type=int, default=PORT, help=f"port to listen on (default {PORT})")
+    args = parser.parse_args(argv)
+
+    # Synced by the server after each pause in the batches
+    core = TodoCore(args.data, storage=open_storage(args.data, sync_every=float('inf')))
+    core.load_data()
+    try:
+        asyncio.run(SyncServer(core).run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"todo_sync: {e}", file=sys.stderr)
+        return 1
+    finally:
+        core.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
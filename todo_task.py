@@ -0,0 +1,239 @@
+"""Compact in-memory task records
+
+A task in the data file is a JSON object with string keys:
+
+    {"task_id": "A", "description": "Water the plants",
+     "created": "2024-01-01T09:00:00.123456", "completed_count": 3, "skipped_count": 1}
+
+plus any other keys (priority, due, keys written by newer versions). As
+a Python dict that costs about 390 bytes per task: 184 for the dict, 75
+for the created string and the rest for the description and ID strings.
+Task keeps the same fields in slots (80 bytes), the task ID interned (the
+queue, the statistics and the search index all key on it) and the created
+time as integer microseconds since 1970 (32 bytes; naive, like the strings
+datetime.now().isoformat() writes), about 290 bytes per task in all, and
+a copy for a snapshot takes 88 bytes instead of 192. Other keys go in a
+dict that only exists when there are any.
+
+Task reads and writes like the dict it replaces (task['description'],
+task.get('due'), task['completed_count'] += 1, dict(task)), so code
+written for the JSON layout works unchanged, and to_dict() gives the JSON
+layout back: a created value that would not convert back to the same
+string (another format, a time zone, None) is kept as it was among the
+other keys. The four count and text fields are always present.
+"""
+import sys
+import threading
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MICROSECOND = timedelta(microseconds=1)
+
+MISSING = object()  # _created of a task without a created time in microseconds
+
+FIELDS = frozenset(('task_id', 'description', 'completed_count', 'skipped_count'))
+
+
+def created_micros(created):
+    """Microseconds since 1970 for an isoformat() string, or None when that would not be lossless"""
+    if not isinstance(created, str) or len(created) not in (19, 26) or created[10] != 'T':
+        return None
+    try:
+        moment = datetime.fromisoformat(created)
+    except ValueError:
+        return None
+    # isoformat() leaves out a zero fraction and uses 'T', so only those strings come back the same
+    if moment.tzinfo is not None or (len(created) == 26) != bool(moment.microsecond):
+        return None
+    return (((moment.toordinal() - EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60
+             + moment.second) * 1000000 + moment.microsecond)
+
+
+def created_text(micros):
+    """isoformat() string of a time in microseconds since 1970"""
+    return (EPOCH + micros * MICROSECOND).isoformat()
+
+
+class Task(Mapping):
+    """One task, stored in slots and read and written like its JSON object"""
+
+    __slots__ = ('task_id', 'description', '_created', 'completed_count', 'skipped_count', 'extra')
+
+    def __init__(self, task_id, description, created=MISSING, completed_count=0, skipped_count=0):
+        self.task_id = sys.intern(task_id)
+        self.description = description
+        self.completed_count = completed_count
+        self.skipped_count = skipped_count
+        self.extra = None  # Other keys, None while there are none
+        self._created = MISSING
+        if created is not MISSING:
+            self['created'] = created
+
+    @classmethod
+    def new(cls, task_id, description, created):
+        """Task created at the datetime created"""
+        task = cls(task_id, description)
+        task._created = (created - EPOCH) // MICROSECOND
+        return task
+
+    @classmethod
+    def from_dict(cls, data):
+        """Task from a dict in the JSON layout (which is not kept)"""
+        task = cls(data['task_id'], data['description'], completed_count=data.get('completed_count', 0),
+                   skipped_count=data.get('skipped_count', 0))
+        if len(data) != 4 + ('created' in data) or 'completed_count' not in data or 'skipped_count' not in data:
+            task.extra = {key: value for key, value in data.items() if key not in FIELDS and key != 'created'} or None
+        if 'created' in data:
+            task['created'] = data['created']
+        return task
+
+    @property
+    def created_time(self):
+        """Creation time as microseconds since 1970, or None when created is missing or not a plain time"""
+        return None if self._created is MISSING else self._created
+
+    def to_dict(self):
+        """The task in the JSON layout"""
+        data = {'task_id': self.task_id, 'description': self.description}
+        if self._created is not MISSING:
+            data['created'] = created_text(self._created)
+        elif self.extra and 'created' in self.extra:
+            data['created'] = self.extra['created']
+        data['completed_count'] = self.completed_count
+        data['skipped_count'] = self.skipped_count
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def copy(self):
+        task = Task.__new__(Task)
+        task.task_id = self.task_id
+        task.description = self.description
+        task._created = self._created
+        task.completed_count = self.completed_count
+        task.skipped_count = self.skipped_count
+        task.extra = dict(self.extra) if self.extra else None
+        return task
+
+    def __getitem__(self, key):
+        if key in FIELDS:
+            return getattr(self, key)
+        if key == 'created' and self._created is not MISSING:
+            return created_text(self._created)
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def get(self, key, default=None):
+        if key in FIELDS:
+            return getattr(self, key)
+        if key == 'created' and self._created is not MISSING:
+            return created_text(self._created)
+        return default if self.extra is None else self.extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key == 'task_id':
+            self.task_id = sys.intern(value)
+        elif key in FIELDS:
+            setattr(self, key, value)
+        elif key == 'created':
+            micros = created_micros(value)
+            if micros is None:
+                self._created = MISSING
+                self.extra = self.extra or {}
+                self.extra['created'] = value
+            else:
+                self._created = micros
+                if self.extra and 'created' in self.extra:
+                    del self.extra['created']
+                    self.extra = self.extra or None
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def pop(self, key, *default):
+        """Remove a key other than the four fields"""
+        if key == 'created' and self._created is not MISSING:
+            value, self._created = created_text(self._created), MISSING
+            return value
+        if self.extra and key in self.extra:
+            value = self.extra.pop(key)
+            if not self.extra:
+                self.extra = None
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in FIELDS:
+            return True
+        if key == 'created' and self._created is not MISSING:
+            return True
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        yield 'task_id'
+        yield 'description'
+        if self._created is not MISSING:
+            yield 'created'
+        yield 'completed_count'
+        yield 'skipped_count'
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return 4 + (self._created is not MISSING) + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+
+class FrozenTasks:
+    """Tasks in queue order as they were when it was made, copied only as they are read
+
+    Holds the live Task objects, so making one costs a list of references
+    instead of a copy of every task. Whoever changes a task in place calls
+    keep() first, which stores a copy of the task as it was. Iterating
+    yields copies (the kept one, or one of the untouched task), so it can
+    run on a writer thread while the queue goes on changing.
+    """
+
+    CHUNK = 1000  # Tasks copied per hold of the lock
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.kept = {}  # id(task) -> copy from before it changed; the list keeps the ids taken
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def keep(self, task):
+        with self.lock:
+            if id(task) not in self.kept:
+                self.kept[id(task)] = task.copy()
+
+    def __iter__(self):
+        for start in range(0, len(self.tasks), self.CHUNK):
+            with self.lock:
+                copies = [self.kept.get(id(task)) or task.copy() for task in self.tasks[start:start + self.CHUNK]]
+            yield from copies
+
+
+def json_default(value):
+    """default= hook for json.dump writing Task records as their JSON objects
+
+    FrozenTasks and numpy columns (of TodoCore.frozen_snapshot) are written
+    as lists.
+    """
+    if isinstance(value, Task):
+        return value.to_dict()
+    if isinstance(value, FrozenTasks):
+        return list(value)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")